@@ -1,8 +1,13 @@
+import weakref
+from collections import OrderedDict
+
 from constants import MARKET
 from games.kunh.constants import CHANCE
 
 
 class GameStateBase:
+    # subclasses without __slots__ still get a __dict__, compact ones list their own attributes
+    __slots__ = ('tree_size', 'parent', 'to_move', 'actions', 'value', '__weakref__')
 
     def __init__(self, parent, to_move, actions):
         self.tree_size = 1
@@ -28,3 +33,130 @@ class GameStateBase:
 
     def get_value(self):
         return self.value
+
+
+class History:
+    """ Persistent list: append returns a new history that shares this one as its prefix, so the nodes along a
+        path store one item each instead of a copy of the whole history.
+    """
+    __slots__ = ('parent', 'item', 'length')
+
+    def __init__(self, parent=None, item=None):
+        self.parent = parent
+        self.item = item
+        self.length = parent.length + 1 if parent is not None else 0
+
+    def append(self, item):
+        return History(self, item)
+
+    def to_list(self):
+        items = []
+        history = self
+        while history.length:
+            items.append(history.item)
+            history = history.parent
+        return items[::-1]
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return str(self.to_list())
+
+
+class LabelTable:
+    """ Stores each action label, action list and information set string of a tree once """
+
+    def __init__(self):
+        self.__labels = {}
+        self.__action_lists = {}
+
+    def label(self, label):
+        return self.__labels.setdefault(label, label)
+
+    def actions(self, labels):
+        """ A shared list of the labels, it must not be modified """
+        key = tuple(self.label(label) for label in labels)
+        return self.__action_lists.setdefault(key, list(key))
+
+
+class LazyExpansion:
+    """ Shared by the nodes of a lazily expanded game tree, whose children are built on the first play(action).
+        With max_expanded, once more than max_expanded nodes hold their children the least recently played
+        ones drop them again; they are rebuilt, identically, when played next.
+    """
+
+    def __init__(self, max_expanded=None):
+        self.max_expanded = max_expanded
+        self.expansions = 0
+        self.evictions = 0
+        self.__expanded = OrderedDict()
+
+    def touch(self, node):
+        if self.max_expanded is not None:
+            ref = self.__expanded.get(id(node))
+            if ref is not None and ref() is node:
+                self.__expanded.move_to_end(id(node))
+
+    def add(self, node):
+        self.expansions += 1
+        if self.max_expanded is None:
+            return
+        # a dead node's id may be reused
+        self.__expanded.pop(id(node), None)
+        self.__expanded[id(node)] = weakref.ref(node)
+        while len(self.__expanded) > self.max_expanded:
+            _, ref = self.__expanded.popitem(last=False)
+            evicted = ref()
+            if evicted is not None:
+                evicted.evict()
+                self.evictions += 1
+
+
+class InfoSetInterner:
+    """ Integer information set keys, built incrementally instead of formatting the whole history at every node.
+        A history is interned as its parent history's id plus the appended action, and a key as a
+        (prefix, history id, suffix) label, so describe(key) gives back the usual string
+        prefix + str(history) + suffix.
+    """
+    EMPTY_HISTORY = 0
+
+    def __init__(self):
+        self.__history_ids = {}
+        self.__histories = [None]
+        self.__key_ids = {}
+        self.__labels = []
+
+    def extend(self, history_id, action):
+        """ Id of the history history_id followed by action """
+        child = (history_id, action)
+        child_id = self.__history_ids.get(child)
+        if child_id is None:
+            child_id = self.__history_ids[child] = len(self.__histories)
+            self.__histories.append(child)
+        return child_id
+
+    def history(self, history_id):
+        actions = []
+        while history_id != self.EMPTY_HISTORY:
+            history_id, action = self.__histories[history_id]
+            actions.append(action)
+        return actions[::-1]
+
+    def key(self, prefix, history_id=None, suffix=''):
+        """ history_id None leaves the history out of the information set """
+        label = (prefix, history_id, suffix)
+        key = self.__key_ids.get(label)
+        if key is None:
+            key = self.__key_ids[label] = len(self.__labels)
+            self.__labels.append(label)
+        return key
+
+    def describe(self, key):
+        prefix, history_id, suffix = self.__labels[key]
+        if history_id is None:
+            return prefix + suffix
+        return prefix + str(self.history(history_id)) + suffix
+
+    def num_keys(self):
+        return len(self.__labels)
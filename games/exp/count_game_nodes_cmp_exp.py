@@ -1,6 +1,7 @@
 import csv
 import json
 import os
+import tracemalloc
 from datetime import datetime
 from math import ceil
 
@@ -13,6 +14,7 @@ from flash_crash_players_portfolio_per_attacker_cfr import PPAFlashCrashRootChan
 from ActionsManager import ActionsManager
 from split_game_cfr import SplitGameCFR
 from split_selector_game import SelectorRootChanceGameState
+from tree_size_estimator import TreeSizeEstimator
 from vanilla_cfr_runner import compute_cfr_equilibrium
 
 
@@ -42,6 +44,17 @@ def count_game_nodes_csv(root_generator, res_dir,  game_size_range, params, game
         for row in results:
             writer.writerow(row)
 
+def measure_bytes_per_node(build_root):
+    """ Memory the tree returned by build_root() holds, per node, as traced by tracemalloc """
+    tracemalloc.start()
+    try:
+        root = build_root()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return root.tree_size, retained / root.tree_size
+
+
 def setup_dir(game_name):
     dt = datetime.today()
     dt = str(dt).split(' ')[0]
@@ -71,6 +84,54 @@ def count_flash_crash_game_nodes():
 
 
 
+def count_flash_crash_bytes_per_node():
+    res_dir = setup_dir('flash_crash')
+    defender_budget = 2000000000
+    attacker_budgets = [4000000000, 6000000000]
+    results = []
+    for num_assets in range(3, 6):
+        _, network = gen_new_network(num_assets)
+        actions_mgr = ActionsManager(assets=network.assets, step_order_size=SysConfig.get("STEP_ORDER_SIZE"),
+                                     max_order_num=1)
+        tree_size, bytes_per_node = measure_bytes_per_node(
+            lambda: FlashCrashRootChanceGameState(actions_mgr, network, defender_budget, attacker_budgets))
+        results.append({'num_assets': num_assets, 'tree_size': tree_size, 'bytes_per_node': int(bytes_per_node)})
+
+    with open(res_dir + 'flash_crash_bytes_per_node.csv', 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=['num_assets', 'tree_size', 'bytes_per_node'])
+        writer.writeheader()
+        for row in results:
+            writer.writerow(row)
+
+
+def estimate_flash_crash_game_nodes(num_assets_range=range(3, 8)):
+    """ Like count_flash_crash_game_nodes, without building the games (see TreeSizeEstimator) """
+    res_dir = setup_dir('flash_crash')
+    exp_params = {'defender_budget': 2000000000,
+                  'attacker_budgets': [4000000000, 6000000000],
+                  'step_order_size': SysConfig.get("STEP_ORDER_SIZE"),
+                  'max_order_num': 1}
+    results = []
+    for num_assets in num_assets_range:
+        _, network = gen_new_network(num_assets)
+        actions_mgr = ActionsManager(assets=network.assets, step_order_size=exp_params['step_order_size'],
+                                     max_order_num=exp_params['max_order_num'],
+                                     attacker_budgets=exp_params['attacker_budgets'])
+        complete = TreeSizeEstimator(actions_mgr, network, exp_params['defender_budget'],
+                                     exp_params['attacker_budgets']).estimate()
+        split = TreeSizeEstimator(actions_mgr, network, exp_params['defender_budget']).estimate()
+        results.append({'num_assets': num_assets, 'vanilla_cfr': complete['nodes'], 'split_cfr': split['nodes'],
+                        'vanilla_cfr_inf_sets': complete['inf_sets'], 'split_cfr_inf_sets': split['inf_sets'],
+                        'exact': complete['exact'] and split['exact']})
+
+    with open(res_dir + 'flash_crash_estimated_game_nodes.csv', 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=['num_assets', 'vanilla_cfr', 'split_cfr', 'vanilla_cfr_inf_sets',
+                                                     'split_cfr_inf_sets', 'exact'])
+        writer.writeheader()
+        for row in results:
+            writer.writerow(row)
+
+
 def count_search_game_nodes():
     res_dir=setup_dir('search')
     exp_params = {'attacker_budgets':  [4,5,11]}
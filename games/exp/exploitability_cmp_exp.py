@@ -5,15 +5,30 @@ from datetime import datetime, time
 from math import ceil, floor
 
 from SysConfig import SysConfig
-from cfr import VanillaCFR
+from cfr import VanillaCFR, CFRPlus, DiscountedCFR
+from compiled_tree import CompiledTree
 from exp.network_generators import gen_new_network
 from exp.root_generators import FlashCrashRootGenerator, SearchRootGenerator
 from split_game_cfr import SplitGameCFR
+from vectorized_cfr import VectorizedCFR
 
+CFR_SOLVERS = {'vanilla': VanillaCFR, 'cfr_plus': CFRPlus, 'dcfr': DiscountedCFR}
 
-def compute_complete_game_equilibrium(complete_game_root, attacker_budgets, iterations):
-    vanilla_cfr = VanillaCFR(complete_game_root)
-    vanilla_cfr.run(iterations=iterations)
+
+def get_cfr_cls(params):
+    return CFR_SOLVERS[params.get('cfr_solver', 'vanilla')]
+
+
+def compute_complete_game_equilibrium(complete_game_root, attacker_budgets, iterations, cfr_cls=VanillaCFR,
+                                      exact_exploitability=False, checkpoint_path=None, checkpoint_every=100):
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        # continue a solve that was interrupted
+        vanilla_cfr = cfr_cls.resume(checkpoint_path, complete_game_root, track_imm_regret=not exact_exploitability)
+    else:
+        vanilla_cfr = cfr_cls(complete_game_root, track_imm_regret=not exact_exploitability)
+    if checkpoint_path:
+        vanilla_cfr.enable_checkpoints(checkpoint_path, every_iterations=checkpoint_every)
+    vanilla_cfr.run(iterations=iterations - vanilla_cfr.iteration)
     vanilla_cfr.compute_nash_equilibrium()
     defender_eq = vanilla_cfr.value_of_the_game()
     attackers_eq = {}
@@ -22,6 +37,10 @@ def compute_complete_game_equilibrium(complete_game_root, attacker_budgets, iter
     for attacker in attacker_budgets:
         attackers_eq[attacker] = root.children[str(attacker)].get_value()
         regrets[attacker] = vanilla_cfr.cumulative_regrets[root.children[str(attacker)].inf_set()]
+    if exact_exploitability:
+        exploitability = vanilla_cfr.exploitability()
+        return {'defender': defender_eq, 'attackers': attackers_eq, 'regrets': regrets,
+                'exploitability': exploitability}
     cumulative_pos_regret = vanilla_cfr.average_total_imm_regret(iterations)
 
     return {'defender':defender_eq, 'attackers':attackers_eq, 'regrets':regrets,
@@ -29,7 +48,7 @@ def compute_complete_game_equilibrium(complete_game_root, attacker_budgets, iter
 
 
 def get_split_cfr_exploitabilty(params, root_generator, iterations, main_game_iteration_portion):
-    split_game_cfr = SplitGameCFR()
+    split_game_cfr = SplitGameCFR(get_cfr_cls(params))
     root = root_generator.get_split_main_game_root()
 #    action_mgr = root_generator.get_split_game_action_mgr()
 
@@ -45,11 +64,27 @@ def get_split_cfr_exploitabilty(params, root_generator, iterations, main_game_it
 
 
 
-def get_complete_game_cfr_exp(comlete_game_root, attacker_budgets, iterations):
-    results = compute_complete_game_equilibrium(comlete_game_root, attacker_budgets, iterations)
+def get_complete_game_cfr_exp(comlete_game_root, attacker_budgets, iterations, cfr_cls=VanillaCFR,
+                              exact_exploitability=False):
+    results = compute_complete_game_equilibrium(comlete_game_root, attacker_budgets, iterations, cfr_cls,
+                                                exact_exploitability)
     return results['exploitability']
 
 
+def load_or_compile_tree(root_generator, tree_path):
+    """ The complete game as a memory-mapped CompiledTree, compiled and saved to tree_path on the first call
+        so later experiments on the same game skip building it """
+    if not os.path.exists(os.path.join(tree_path, 'layout.json')):
+        CompiledTree.compile(root_generator.get_complete_game_root(), keep_nodes=False).save(tree_path)
+    return CompiledTree.load(tree_path)
+
+
+def get_compiled_game_cfr_exp(tree, iterations):
+    cfr = VectorizedCFR(tree=tree, track_imm_regret=False)
+    cfr.run(iterations=iterations)
+    return cfr.exploitability()
+
+
 def iteration_portion_exp_csv(res_dir, defender_budget, attacker_budgets,
                         min_portion, max_portion, jump, num_assets,iterations_num, step_order_size, max_order_num,num_exp=10):
     portion = min_portion
@@ -100,7 +135,7 @@ def iteration_stats_csv_mult_exp(root_generator, res_dir, params, main_game_iter
             root_generator.gen_roots(game_size)
             split_cfr_exp = get_split_cfr_exploitabilty(params, root_generator, iterations_num, main_game_iteration_portion)
             vanilla_cfr_exp = get_complete_game_cfr_exp(root_generator.get_complete_game_root(),
-                                                        params['attacker_budgets'], iterations_num)
+                                                        params['attacker_budgets'], iterations_num, get_cfr_cls(params))
             iteration_regrets['split_'+str(game_size)] += split_cfr_exp
             iteration_regrets['vanilla_'+str(game_size)] += vanilla_cfr_exp
             iteration_regrets['nodes_touched_split_'+str(game_size)] += root_generator.split_root.tree_size*iterations_num
@@ -144,7 +179,7 @@ def iteration_stats_csv(root_generator, res_dir, params, main_game_iteration_por
         split_time = (datetime.now() - split_time).seconds
         complete_time = datetime.now()
         vanilla_cfr_exp = get_complete_game_cfr_exp(root_generator.get_complete_game_root(),
-                                                    params['attacker_budgets'], iterations_num)
+                                                    params['attacker_budgets'], iterations_num, get_cfr_cls(params))
         complete_time = (datetime.now() - complete_time).seconds
         iteration_regrets['split_'+str(game_size)] = split_cfr_exp
         iteration_regrets['vanilla_'+str(game_size)] = vanilla_cfr_exp
@@ -188,7 +223,7 @@ def iteration_stats_range_csv(root_generator, res_dir, params, main_game_iterati
                 root_generator.gen_roots(game_size)
                 split_cfr_exp = get_split_cfr_exploitabilty(params, root_generator, iterations_num, main_game_iteration_portion)
                 vanilla_cfr_exp = get_complete_game_cfr_exp(root_generator.get_complete_game_root(),
-                                                            params['attacker_budgets'], iterations_num)
+                                                            params['attacker_budgets'], iterations_num, get_cfr_cls(params))
                 iteration_regrets[iterations_num]['split_'+str(game_size)] += split_cfr_exp
                 iteration_regrets[iterations_num]['vanilla_'+str(game_size)] += vanilla_cfr_exp
                 iteration_regrets[iterations_num]['nodes_touched_split_'+str(game_size)] += root_generator.split_root.tree_size*iterations_num
@@ -251,7 +286,7 @@ def cmp_exploitability_csv(root_generator, res_dir, params, main_game_iteration_
                 root_generator.gen_roots(game_size)
                 split_cfr_exp = get_split_cfr_exploitabilty(params, root_generator, iterations_num, main_game_iteration_portion)
                 vanilla_cfr_exp = get_complete_game_cfr_exp(root_generator.get_complete_game_root(),
-                                                            params['attacker_budgets'], iterations_num)
+                                                            params['attacker_budgets'], iterations_num, get_cfr_cls(params))
                 split_bucket = init_bucket(root_generator.split_root.tree_size, iteration_regrets, iterations_num, game_size)
                 complete_bucket = init_bucket(root_generator.complete_root.tree_size, iteration_regrets, iterations_num, game_size)
 
@@ -306,7 +341,7 @@ def old_iteration_stats_csv(res_dir, root_generator, params, main_game_iteration
             root_generator.gen_roots(game_size)
             split_cfr_exp = get_split_cfr_exploitabilty(params, root_generator, iterations_num,
                                                         main_game_iteration_portion)
-            vanilla_cfr_exp = get_complete_game_cfr_exp(root_generator.get_complete_game_root(), params['attacker_budgets'], iterations_num)
+            vanilla_cfr_exp = get_complete_game_cfr_exp(root_generator.get_complete_game_root(), params['attacker_budgets'], iterations_num, get_cfr_cls(params))
             iteration_regrets[iterations_num]['split'] += split_cfr_exp
             iteration_regrets[iterations_num]['vanilla'] += vanilla_cfr_exp
             iterations_num += jump
@@ -343,7 +378,8 @@ def run_flash_crash_csv_exps():
                   #'attacker_budgets': [4000000000, 6000000000,  8000000000 ],
                   'attacker_budgets': [4000000000, 8000000000,  12000000000],
                   'step_order_size': SysConfig.get("STEP_ORDER_SIZE")*2 ,
-                  'max_order_num': 1}
+                  'max_order_num': 1,
+                  'cfr_solver': 'vanilla'}
 
     with open(res_dir+'params.json', 'w') as fp:
         json.dump(exp_params, fp)
@@ -385,7 +421,8 @@ def run_search_csv_exps():
                   'max_iterations': 10001,
                   'game_size': 6,
                   'jump': 1000,
-                  'attacker_budgets': [4, 5, 11]}
+                  'attacker_budgets': [4, 5, 11],
+                  'cfr_solver': 'vanilla'}
 
     with open(res_dir+'params.json', 'w') as fp:
         json.dump(exp_params, fp)
@@ -21,7 +21,7 @@ def gen_network_uniform_funds(game_config, num_assets, assets_file, dir_name):
                                                               num_assets=num_assets,
                                                               assets_file=assets_file,
                                                               mi_calc=ExponentialMarketImpactCalculator(config.impact_calc_constant))
-    network.save_to_file(dir_name+'network.json')
+    network.save_snapshot(dir_name+'network.npz')
 
     return  network
 
@@ -42,7 +42,7 @@ def gen_network_nonuniform_funds(game_config, num_assets, assets_file, dir_name,
                                                               num_assets=num_assets,
                                                               assets_file=assets_file,
                                                               mi_calc=ExponentialMarketImpactCalculator(game_config.impact_calc_constant))
-    network.save_to_file(dir_name+'network.json')
+    network.save_snapshot(dir_name+'network.npz')
 
     return  network
 
@@ -63,8 +63,23 @@ def gen_funds_parameters(num_low_risk, num_medium_risk, num_high_risk, game_conf
 
 
 def get_network_from_dir(dirname):
+    """ The network.npz snapshot of the directory, or its network.json when it has no snapshot """
     config = GameConfig()
-    return AssetFundsNetwork.load_from_file(dirname+'/network.json', ExponentialMarketImpactCalculator(config.impact_calc_constant))
+    mi_calc = ExponentialMarketImpactCalculator(config.impact_calc_constant)
+    if os.path.exists(dirname + '/network.npz'):
+        return AssetFundsNetwork.load_snapshot(dirname + '/network.npz', mi_calc)
+    return AssetFundsNetwork.load_from_file(dirname+'/network.json', mi_calc)
+
+
+def convert_network_files(root_dir='../../resources'):
+    """ Writes a network.npz snapshot next to every network.json under root_dir """
+    config = GameConfig()
+    for dirpath, _, filenames in os.walk(root_dir):
+        if 'network.json' in filenames:
+            network = AssetFundsNetwork.load_from_file(os.path.join(dirpath, 'network.json'),
+                                                       ExponentialMarketImpactCalculator(config.impact_calc_constant))
+            network.save_snapshot(os.path.join(dirpath, 'network.npz'))
+            print('converted ' + dirpath)
 
 
 def gen_new_network(num_assets, uniform = True, results_dir = '../../results/networks/'):
@@ -81,3 +96,7 @@ def gen_new_network(num_assets, uniform = True, results_dir = '../../results/net
         return dirname, gen_network_uniform_funds(config,  num_assets, 'C:\\research\\Flash Crash\\real market data\\assets.csv', dirname)
     else:
         return dirname, gen_network_nonuniform_funds(config,  num_assets, 'C:\\research\\Flash Crash\\real market data\\assets.csv', dirname, num_assets, 5, 5,5)
+
+
+if __name__ == "__main__":
+    convert_network_files()
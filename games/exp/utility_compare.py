@@ -93,33 +93,61 @@ def run_game_iterations(complete_root, complete_cfr,
     return avg_value
 
 
-def get_complete_game_cfr(root_generator, time_allocated):
-    vanilla_cfr = VanillaCFR(root_generator.complete_game_root)
-    iterations = vanilla_cfr.run_with_time_limit(time_allocated)
+def get_budget_kwargs(budget, amount):
+    # a budget is either wall-clock seconds or touched game nodes
+    return {'time_limit': amount} if budget == 'time' else {'nodes_limit': amount}
+
+
+def get_complete_game_cfr(root_generator, amount, budget='time', trace_interval=0):
+    vanilla_cfr = VanillaCFR(root_generator.get_complete_game_root())
+    iterations = vanilla_cfr.run_with_budget(trace_interval=trace_interval, **get_budget_kwargs(budget, amount))
     return vanilla_cfr, iterations
 
 
-def get_split_cfr(params, root_generator, time_allocated):
+def get_split_cfr(params, root_generator, amount, budget='time', trace_interval=0):
     split_game_cfr = SplitGameCFR()
     root = root_generator.get_split_main_game_root()
 
-    return split_game_cfr.run_with_time_limit(main_game_root=root, time_limit=time_allocated, attacker_types=params['attacker_budgets'],
-                                     attacks_in_budget_dict=root_generator.get_attack_costs(),
-                                     subgame_keys=root_generator.get_attack_keys())
+    return split_game_cfr.run_with_budget(main_game_root=root, attacker_types=params['attacker_budgets'],
+                                          attacks_in_budget_dict=root_generator.get_attack_costs(),
+                                          subgame_keys=root_generator.get_attack_keys(),
+                                          trace_interval=trace_interval, **get_budget_kwargs(budget, amount))
+
+
+def write_convergence_traces(file_name, budget_allocated, traces):
+    fieldnames = ['budget_allocated', 'algorithm', 'iteration', 'time', 'nodes_touched', 'exploitability']
+    with open(file_name, 'a', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        for algorithm, trace in traces.items():
+            for point in trace:
+                row = {'budget_allocated': budget_allocated, 'algorithm': algorithm}
+                row.update(point)
+                writer.writerow(row)
 
-def run_utility_cmp(root_generator, res_dir, params,
-                        min_time, max_time, jump, game_size, game_name):
 
+def run_utility_cmp(root_generator, res_dir, params,
+                        min_time, max_time, jump, game_size, game_name, budget='time', trace_interval=0):
+    """ Compares the split and complete game solvers under equal budgets, from min_time to max_time in jump
+        steps. With budget='nodes' the amounts are numbers of touched game nodes instead of seconds.
+    """
     fieldnames = ['time_allocated']
     fieldnames.append('attacker algorithm')
     fieldnames.append('defender algorithm')
-    fieldnames.append('attacker iterations')
+    fieldnames.append('complete game iterations')
+    fieldnames.append('split game iterations')
+    fieldnames.append('complete game nodes touched')
+    fieldnames.append('split game nodes touched')
     fieldnames.append('expected_utility')
 
     file_name = res_dir + game_name + '_utility_cmp' + '_' + str(game_size)+'.csv'
     with open(file_name,'w', newline='') as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
+    trace_file_name = res_dir + game_name + '_utility_cmp_trace' + '_' + str(game_size)+'.csv'
+    if trace_interval:
+        with open(trace_file_name, 'w', newline='') as csvfile:
+            csv.DictWriter(csvfile, fieldnames=['budget_allocated', 'algorithm', 'iteration', 'time', 'nodes_touched',
+                                                'exploitability']).writeheader()
 
     time_allocated = min_time
     root_generator.gen_roots(game_size)
@@ -128,8 +156,13 @@ def run_utility_cmp(root_generator, res_dir, params,
                {'attacker_alg': 'COMPLETE', 'defender_alg': 'SPLIT'}]
 
     while time_allocated <= max_time:
-        main_game_results, selector_game_result = get_split_cfr(params, root_generator, time_allocated)
-        complete_cfr, complete_iterations = get_complete_game_cfr(root_generator, time_allocated)
+        main_game_results, selector_game_result = get_split_cfr(params, root_generator, time_allocated, budget,
+                                                                trace_interval)
+        complete_cfr, complete_iterations = get_complete_game_cfr(root_generator, time_allocated, budget,
+                                                                  trace_interval)
+        if trace_interval:
+            write_convergence_traces(trace_file_name, time_allocated, {'SPLIT': main_game_results['trace'],
+                                                                       'COMPLETE': complete_cfr.convergence_trace})
         for setting in settings:
             utility = run_game_iterations(complete_root=root_generator.get_complete_game_root(),
                                           complete_cfr=complete_cfr,
@@ -139,11 +172,13 @@ def run_utility_cmp(root_generator, res_dir, params,
                                           split_main_cfr=main_game_results['cfr'],
                                           attacker_alg=setting['attacker_alg'], rounds=1000)
 
-            row = {'time_alllocated': time_allocated,
+            row = {'time_allocated': time_allocated,
                    'attacker algorithm': setting['attacker_alg'],
                    'defender algorithm': setting['defender_alg'],
                    'complete game iterations': complete_iterations,
                    'split game iterations': 1 + main_game_results['iterations'],
+                   'complete game nodes touched': complete_cfr.nodes_touched,
+                   'split game nodes touched': main_game_results['nodes_touched'],
                    'expected_utility': utility}
 
             with open(file_name, 'a', newline='') as csvfile:
@@ -151,9 +186,3 @@ def run_utility_cmp(root_generator, res_dir, params,
                 writer.writerow(row)
 
         time_allocated += jump
-
-
-
-
-
-
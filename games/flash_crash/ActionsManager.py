@@ -53,6 +53,10 @@ class ActionsManager:
     def get_portfolios_prob(self):
         return self.__portfolios_probs
 
+    def update_portfolios(self, portfolios_probs):
+        # keeps every probable portfolio in the game, also those the new distribution gives probability 0
+        self.__portfolios_probs = {pid: portfolios_probs.get(pid, 0.) for pid in self.__portfolios_probs}
+
     def get_portfolios_in_budget(self, budget):
         return [pid for pid in self.__id_to_portfolio.keys() if self.__pid_to_cost[pid] <= budget]
 
@@ -1,7 +1,10 @@
 #!/usr/bin/python
+import copy
 import csv
 import json
 import random
+import struct
+import zipfile
 from math import floor, ceil
 
 import networkx as nx
@@ -39,6 +42,10 @@ class Asset:
 
 
 class Fund:
+    # counts the changes of the portfolio made by liquidations, so that the HoldingsMatrix of a network holding
+    # the fund knows when it is stale
+    portfolio_version = 0
+
     def __init__(self, symbol, portfolio: Dict[str, int], initial_capital, initial_leverage, tolerance):
         self.symbol = symbol
         self.leverage = initial_leverage
@@ -61,8 +68,11 @@ class Fund:
                self.tolerance == other.tolerance and \
                self.loan == other.loan
 
-    def update_state(self, assets):
-        curr_leverage = self.compute_curr_leverage(assets)
+    def update_state(self, assets, curr_leverage=None):
+        if curr_leverage is None:
+            curr_leverage = self.compute_curr_leverage(assets)
+        elif curr_leverage != numpy.inf:
+            self.leverage = curr_leverage
         if curr_leverage == numpy.inf:
             self.is_in_default = True
             self.is_liquidating = True
@@ -83,6 +93,7 @@ class Fund:
                 assets_to_remove.append(asset_symbol)
         for asset_symbol in assets_to_remove:
             self.portfolio.pop(asset_symbol)
+        self.portfolio_version += 1
         return orders
 
   #  def get_orders(self, assets: Dict[str, Asset]):
@@ -125,6 +136,225 @@ class Fund:
         return self.compute_curr_leverage(assets) / self.initial_leverage > self.tolerance
 
 
+def _has_standard_margin_call(fund):
+    return getattr(fund.marginal_call, '__func__', None) is Fund.marginal_call
+
+
+class SparseShares:
+    """ A funds x assets matrix of shares in compressed sparse row (rows, cols, data sorted by fund, with
+        indptr) and compressed sparse column (col_rows, col_data sorted by asset, with col_indptr) form. The
+        entries of a fund keep the order of its portfolio. """
+
+    def __init__(self, rows, cols, data, shape):
+        self.shape = shape
+        order = numpy.argsort(rows, kind='stable')
+        self.rows = numpy.asarray(rows, dtype=numpy.intp)[order]
+        self.cols = numpy.asarray(cols, dtype=numpy.intp)[order]
+        self.data = numpy.asarray(data, dtype=float)[order]
+        self.indptr = numpy.searchsorted(self.rows, numpy.arange(shape[0] + 1))
+        col_order = numpy.argsort(self.cols, kind='stable')
+        self.col_rows = self.rows[col_order]
+        self.col_data = self.data[col_order]
+        self.col_indptr = numpy.searchsorted(self.cols[col_order], numpy.arange(shape[1] + 1))
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    def row(self, i):
+        """ The (asset indices, shares) of fund i """
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.cols[start:end], self.data[start:end]
+
+    def column(self, j):
+        """ The (fund indices, shares) of asset j """
+        start, end = self.col_indptr[j], self.col_indptr[j + 1]
+        return self.col_rows[start:end], self.col_data[start:end]
+
+    def dot(self, prices):
+        """ The value of every row at the prices (assets), or per scenario for a scenarios x assets array """
+        sums = numpy.zeros(prices.shape[:-1] + (self.shape[0],))
+        if not self.nnz:
+            return sums
+        weighted = prices[..., self.cols] * self.data
+        starts = self.indptr[:-1]
+        non_empty = starts < self.indptr[1:]
+        sums[..., non_empty] = numpy.add.reduceat(weighted, starts[non_empty], axis=-1)
+        return sums
+
+    def toarray(self):
+        array = numpy.zeros(self.shape)
+        array[self.rows, self.cols] = self.data
+        return array
+
+
+class HoldingsMatrix:
+    """ The funds of a network as arrays, shares[i, j] is how many shares of asset_symbols[j] fund_symbols[i]
+        holds, so the leverage and margin call of every fund come from one product with the price vector.
+        With sparse, shares is a SparseShares, for large networks where most funds hold few of the assets.
+        holders[j] is the (fund indices, shares) of the funds holding asset_symbols[j]. Funds with their own
+        margin call rule (a marginal_call other than Fund's) are listed in custom_funds and their flags come
+        from that rule.
+    """
+
+    def __init__(self, funds: Dict[str, Fund], asset_symbols, sparse=False):
+        self.fund_symbols = list(funds)
+        self.portfolio_versions = [f.portfolio_version for f in funds.values()]
+        self.asset_symbols = list(asset_symbols)
+        self.asset_index = {sym: j for j, sym in enumerate(self.asset_symbols)}
+        self.sparse = sparse
+        self.custom_funds = []
+        self.standard_funds = []
+        rows, cols, data = [], [], []
+        for i, fund in enumerate(funds.values()):
+            standard = _has_standard_margin_call(fund)
+            (self.standard_funds if standard else self.custom_funds).append((i, fund))
+            for sym, num_shares in fund.portfolio.items():
+                # a custom rule may be about assets the network does not trade
+                if standard or sym in self.asset_index:
+                    rows.append(i)
+                    cols.append(self.asset_index[sym])
+                    data.append(num_shares)
+        self.sparse_shares = SparseShares(rows, cols, data, (len(self.fund_symbols), len(self.asset_symbols)))
+        self.shares = self.sparse_shares if sparse else self.sparse_shares.toarray()
+        self.holders = [self.sparse_shares.column(j) for j in range(len(self.asset_symbols))]
+        self.loans = numpy.array([f.loan for f in funds.values()], dtype=float)
+        self.initial_leverages = numpy.array([f.initial_leverage for f in funds.values()], dtype=float)
+        self.tolerances = numpy.array([f.tolerance for f in funds.values()], dtype=float)
+
+    def prices(self, assets: Dict[str, Asset]):
+        return numpy.fromiter([assets[sym].price for sym in self.asset_symbols], float, len(self.asset_symbols))
+
+    def portfolio_values(self, prices):
+        """ Per fund, or per scenario and fund when prices has a row per scenario """
+        if self.sparse:
+            return self.shares.dot(prices)
+        return numpy.dot(prices, self.shares.T)
+
+    def leverages(self, prices):
+        return self.value_leverages(self.portfolio_values(prices))
+
+    def value_leverages(self, values):
+        """ The leverages of the funds at the given portfolio values """
+        capitals = values - self.loans
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return numpy.where(capitals > 0, values / capitals - 1, numpy.inf)
+
+    def value_margin_calls(self, values):
+        """ Margin call flags by Fund's rule, like value_leverages """
+        return self.leverage_margin_calls(self.value_leverages(values))
+
+    def leverage_margin_calls(self, leverages):
+        """ Margin call flags by Fund's rule from the leverages of the funds: leverage / initial_leverage >
+            tolerance, which holds for the funds without capital as their leverage is infinite """
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return leverages / self.initial_leverages > self.tolerances
+
+    def margin_calls(self, prices, assets=None):
+        """ Margin call flags of all the funds, assets is needed for the custom_funds (a list of them, one per
+            scenario, for scenario prices). """
+        flags = self.value_margin_calls(self.portfolio_values(prices))
+        self.apply_custom_margin_calls(flags, assets)
+        return flags
+
+    def liquidation_sales(self, liquidating, assets: Dict[str, Asset]):
+        """ The shares each entry of sparse_shares sells in a liquidation step (see Fund.gen_liquidation_orders),
+            zero for the funds not liquidating (a flag per fund) """
+        limits = numpy.floor(numpy.fromiter([assets[sym].avg_minute_volume for sym in self.asset_symbols], float,
+                                            len(self.asset_symbols)) * SysConfig.get("MINUTE_VOLUME_LIMIT"))
+        shares = self.sparse_shares
+        return numpy.where(liquidating[shares.rows], numpy.minimum(limits[shares.cols], shares.data), 0.)
+
+    def apply_custom_margin_calls(self, flags, assets):
+        for i, fund in self.custom_funds:
+            if flags.ndim == 1:
+                flags[i] = fund.marginal_call(assets)
+            else:
+                flags[:, i] = [fund.marginal_call(scenario_assets) for scenario_assets in assets]
+
+
+class FundValuation:
+    """ The portfolio values of the funds at a network's prices, kept up to date incrementally: a price change
+        updates only the funds holding the asset, found with the holders index of the HoldingsMatrix. The
+        leverages and margin call flags (by Fund's rule) follow from the values in O(number of funds) and are
+        cached until the next price change.
+    """
+
+    def __init__(self, holdings: HoldingsMatrix, prices):
+        self.holdings = holdings
+        self.prices = prices
+        self.values = holdings.portfolio_values(prices)
+        self._leverages = None
+        self._margin_calls = None
+
+    def copy(self):
+        valuation = copy.copy(self)
+        valuation.prices = self.prices.copy()
+        valuation.values = self.values.copy()
+        return valuation
+
+    def set_price(self, asset_index, price):
+        """ O(number of holders of the asset) """
+        funds, shares = self.holdings.holders[asset_index]
+        self.values[funds] += shares * (price - self.prices[asset_index])
+        self.prices[asset_index] = price
+        self._leverages = None
+        self._margin_calls = None
+
+    def restore_values(self, funds, values):
+        """ Sets the values of the funds (indices) back to values recorded before """
+        self.values[funds] = values
+        self._leverages = None
+        self._margin_calls = None
+
+    def set_prices(self, prices):
+        """ Moves the valuation to the prices (assets), updating only the funds holding an asset whose price
+            changed """
+        for j in numpy.flatnonzero(prices != self.prices).tolist():
+            self.set_price(j, prices[j])
+
+    def leverages(self):
+        if self._leverages is None:
+            self._leverages = self.holdings.value_leverages(self.values)
+        return self._leverages
+
+    def margin_calls(self):
+        if self._margin_calls is None:
+            self._margin_calls = self.holdings.leverage_margin_calls(self.leverages())
+        return self._margin_calls
+
+
+SNAPSHOT_VERSION = 1
+
+
+def _load_npz(file_name, mmap=False):
+    """ The arrays of a .npz written by numpy.savez, as read-only memory maps of the file with mmap (the archive
+        stores the arrays uncompressed) """
+    if not mmap:
+        with numpy.load(file_name) as npz:
+            return {name: npz[name] for name in npz.files}
+    arrays = {}
+    with zipfile.ZipFile(file_name) as archive, open(file_name, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError('{0} is compressed, it can not be memory-mapped'.format(info.filename))
+            # the array starts after the local file header (30 bytes, then the name and the extra field)
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = numpy.lib.format.read_magic(f)
+            read_header = numpy.lib.format.read_array_header_1_0 if version == (1, 0) else \
+                numpy.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(f)
+            name = info.filename[:-len('.npy')]
+            if not shape or 0 in shape:
+                arrays[name] = numpy.lib.format.read_array(archive.open(info))
+            else:
+                arrays[name] = numpy.memmap(file_name, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                            order='F' if fortran_order else 'C')
+    return arrays
+
+
 def read_assets_file(assets_file, num_assets):
     assets = {}
     with open(assets_file, newline='') as csvfile:
@@ -149,6 +379,16 @@ class AssetFundsNetwork:
 #        if intraday_asset_gain_max_range:
 #            self.run_intraday_simulation(intraday_asset_gain_max_range, 0.7)
         self.limit_trade_step = limit_trade_step
+        # assets shared with the network this one was copied from are copied before their first price change
+        self._owned_assets = set(assets)
+        self._undo_log = []
+        # HoldingsMatrix of the funds, built on first use. The copies share the funds and so this one slot.
+        self._holdings = [None]
+        # FundValuation at this network's prices, built on first use. Copies share it until a price changes.
+        self._valuation = None
+        self._owns_valuation = False
+        # (TIME_STEP_MINUTES * DAILY_PORTION_PER_MIN, trade caps, asset positions), shared with the copies
+        self._trade_table_slot = [None]
         for f in self.funds.values():
             assert(not f.is_in_margin_call())
 
@@ -159,6 +399,91 @@ class AssetFundsNetwork:
     def __repr__(self):
         return str(self.funds)
 
+    def copy(self):
+        """ A network with its own prices and order books. The funds are shared, and so are the assets until
+            this network changes their price, so a copy costs O(number of assets) references. """
+        new_net = copy.copy(self)
+        new_net.assets = dict(self.assets)
+        new_net.buy_orders = dict(self.buy_orders)
+        new_net.sell_orders = dict(self.sell_orders)
+        new_net._undo_log = []
+        # both networks now share the assets
+        new_net._owned_assets = set()
+        self._owned_assets = set()
+        new_net._owns_valuation = False
+        self._owns_valuation = False
+        return new_net
+
+    def _writable_asset(self, symbol):
+        if symbol not in self._owned_assets:
+            self.assets[symbol] = copy.copy(self.assets[symbol])
+            self._owned_assets.add(symbol)
+        return self.assets[symbol]
+
+    def set_asset_price(self, symbol, price):
+        """ Sets the price of an asset of this network only, updating the fund valuation of the funds holding
+            it """
+        self._writable_asset(symbol).price = price
+        valuation = self._valuation
+        if valuation is None or valuation.holdings is not self._holdings[0]:
+            return
+        self._writable_valuation().set_price(valuation.holdings.asset_index[symbol], price)
+
+    def _writable_valuation(self):
+        if not self._owns_valuation:
+            self._valuation = self._valuation.copy()
+            self._owns_valuation = True
+        return self._valuation
+
+    def apply(self, buy_orders=(), sell_orders=(), trade=False):
+        """ Submits the orders and, with trade, runs a trade step, recording only the order books and the prices
+            of the traded assets so that undo() reverts it. Applies nest. Returns the trade log. """
+        books = (self.buy_orders, self.sell_orders)
+        self.buy_orders = dict(self.buy_orders)
+        self.sell_orders = dict(self.sell_orders)
+        try:
+            self.submit_buy_orders(buy_orders)
+            self.submit_sell_orders(sell_orders)
+        except TypeError:
+            self.buy_orders, self.sell_orders = books
+            raise
+        self._undo_log.append(books)
+        if not trade:
+            return None
+        traded = [sym for sym in set(self.buy_orders).union(self.sell_orders) if sym]
+        self._undo_log[-1] += ({sym: self.assets[sym].price for sym in traded}, self._valuation_record(traded))
+        return self.simulate_trade()
+
+    def undo(self):
+        """ Reverts the last apply() that was not undone yet """
+        entry = self._undo_log.pop()
+        self.buy_orders, self.sell_orders = entry[0], entry[1]
+        if len(entry) > 2:
+            for sym, price in entry[2].items():
+                self.set_asset_price(sym, price)
+            self._restore_valuation(entry[3])
+
+    def _valuation_record(self, symbols):
+        """ The values of the funds holding the assets (symbols), with the holdings and prices they are valued
+            at, so that undo() restores them exactly rather than by the reverse price changes (whose rounding
+            errors add up over a search) """
+        valuation = self._valuation
+        if valuation is None or valuation.holdings is not self._holdings[0]:
+            return None
+        holdings = valuation.holdings
+        funds = numpy.unique(numpy.concatenate(
+            [holdings.holders[holdings.asset_index[sym]][0] for sym in symbols] + [numpy.empty(0, numpy.intp)]))
+        return holdings, valuation.prices.copy(), funds, valuation.values[funds]
+
+    def _restore_valuation(self, record):
+        valuation = self._valuation
+        if record is None or valuation is None:
+            return
+        holdings, prices, funds, values = record
+        # the prices are back to those of the record unless they were also changed otherwise after apply()
+        if valuation.holdings is holdings and numpy.array_equal(valuation.prices, prices):
+            self._writable_valuation().restore_values(funds, values)
+
     def reset_order_books(self):
         self.buy_orders = {}
         self.sell_orders = {}
@@ -166,6 +491,13 @@ class AssetFundsNetwork:
     def public_state(self):
         return str({a.symbol:a.price for a in self.assets.values()})
 
+    def canonical_state(self):
+        """ Hashable key of everything a game can change: asset prices, order books and the funds'
+            liquidation flags. Networks with the same key evolve identically. """
+        return (tuple(sorted((sym, a.price) for sym, a in self.assets.items())),
+                tuple(sorted(self.buy_orders.items())), tuple(sorted(self.sell_orders.items())),
+                tuple(sorted((sym, f.is_liquidating, f.is_in_default) for sym, f in self.funds.items())))
+
 
     @staticmethod
     def submit_orders(orders, book):
@@ -196,13 +528,32 @@ class AssetFundsNetwork:
     def no_more_sell_orders(self):
         return not (self.sell_orders)
 
+    def trade_caps(self):
+        """ The most shares of each asset a trade step trades. It is computed once for the network and its
+            copies, and again only when TIME_STEP_MINUTES or DAILY_PORTION_PER_MIN change
+            (Asset.max_shares_to_trade_in_ts keeps the configuration of when the asset was made). """
+        return self._trade_table()[1]
+
+    def _trade_table(self):
+        portion = SysConfig.get('TIME_STEP_MINUTES') * SysConfig.get('DAILY_PORTION_PER_MIN')
+        table = self._trade_table_slot[0]
+        if table is None or table[0] != portion:
+            table = self._trade_table_slot[0] = (portion,
+                                                 {sym: ceil(portion * a.daily_volume) for sym, a in self.assets.items()},
+                                                 {sym: i for i, sym in enumerate(self.assets)})
+        return table
+
     def simulate_trade(self):
+        """ A trade step: nets the buy and sell orders of every asset in the books, trades up to the asset's
+            trade cap (with limit_trade_step) and moves the traded prices. Returns the price log,
+            '<old price>-><new price>' per traded asset, in asset order. ScenarioBatch.trade_step is the array
+            version, for many books at once. """
+        _, caps, position = self._trade_table()
         log = {}
-        order_keys = set(self.sell_orders.keys())
-        order_keys.update(self.buy_orders.keys())
+        # the empty order has no asset and is skipped, orders for assets the network does not have raise KeyError
+        order_keys = sorted((sym for sym in set(self.sell_orders).union(self.buy_orders) if sym),
+                            key=position.__getitem__)
         for order_key in order_keys:
-            if not order_key: #empty order
-                continue
             buy = self.buy_orders[order_key] if order_key in self.buy_orders else 0
             sell = self.sell_orders[order_key] if order_key in self.sell_orders else 0
             balance = buy - sell
@@ -211,10 +562,7 @@ class AssetFundsNetwork:
                 del self.sell_orders[order_key]
                 continue
             if self.limit_trade_step:
-                max_shares_to_trade_in_ts = ceil(SysConfig.get('TIME_STEP_MINUTES')\
-                                      *SysConfig.get('DAILY_PORTION_PER_MIN')* self.assets[order_key].daily_volume)
-                #max_shares_to_trade = self.assets[order_key].max_shares_to_trade_in_ts
-                shares_to_trade = min(abs(balance), max_shares_to_trade_in_ts)
+                shares_to_trade = min(abs(balance), caps[order_key])
             else:
                 shares_to_trade = abs(balance)
 
@@ -234,30 +582,27 @@ class AssetFundsNetwork:
                 sign = 1
             updated_price  = self.mi_calc.get_updated_price(shares_to_trade, self.assets[order_key], sign)
             log[order_key] = '{0}->{1}'.format(self.assets[order_key].price, updated_price)
-            self.assets[order_key].price = updated_price
+            self.set_asset_price(order_key, updated_price)
         return log
 
 
     def are_funds_leveraged_less_than(self, leverage_goal):
-        for fund in self.funds.values():
-            if leverage_goal < fund.compute_curr_leverage(self.assets):
-                return False
-        return True
+        return not (self.fund_leverages() > leverage_goal).any()
 
     def run_intraday_simulation_2(self, intraday_asset_gain_max_range):
         if (intraday_asset_gain_max_range < 1):
             raise ValueError
-        for asset in self.assets.values():
+        for sym in list(self.assets):
             price_gain = random.uniform(1, intraday_asset_gain_max_range)
-            asset.set_price(asset.price * price_gain)
+            self.set_asset_price(sym, self.assets[sym].price * price_gain)
 
     def run_intraday_simulation(self, intraday_asset_gain_max_range, leverage_goal):
         if intraday_asset_gain_max_range < 1:
             raise ValueError
         while not self.are_funds_leveraged_less_than(leverage_goal):
-            for asset in self.assets.values():
+            for sym in list(self.assets):
                 price_gain = random.uniform(1, intraday_asset_gain_max_range)
-                asset.set_price(asset.price * price_gain)
+                self.set_asset_price(sym, self.assets[sym].price * price_gain)
 
 
 
@@ -378,6 +723,73 @@ class AssetFundsNetwork:
         with open(filename, 'w') as fp:
             json.dump(class_dict, fp)
 
+    def save_snapshot(self, file_name):
+        """ Writes the funds and assets to a versioned binary .npz snapshot: an array per asset and fund field,
+            and the portfolios in compressed sparse row form (a fund's entries in portfolio order). Symbols
+            are stored as strings. """
+        assets = list(self.assets.values())
+        asset_index = {sym: j for j, sym in enumerate(self.assets)}
+        funds = list(self.funds.values())
+        portfolio_indptr = numpy.cumsum([0] + [len(f.portfolio) for f in funds])
+        portfolio_assets = [asset_index[sym] for f in funds for sym in f.portfolio]
+        portfolio_shares = [num_shares for f in funds for num_shares in f.portfolio.values()]
+        numpy.savez(file_name, version=numpy.array(SNAPSHOT_VERSION),
+                    asset_keys=numpy.array(list(self.assets), dtype=str),
+                    asset_symbols=numpy.array([a.symbol for a in assets], dtype=str),
+                    prices=numpy.array([a.price for a in assets]),
+                    zero_time_prices=numpy.array([a.zero_time_price for a in assets]),
+                    daily_volumes=numpy.array([a.daily_volume for a in assets]),
+                    volatilities=numpy.array([a.volatility for a in assets]),
+                    max_shares_to_trade_in_ts=numpy.array([a.max_shares_to_trade_in_ts for a in assets]),
+                    fund_keys=numpy.array(list(self.funds), dtype=str),
+                    fund_symbols=numpy.array([f.symbol for f in funds], dtype=str),
+                    initial_capitals=numpy.array([f.initial_capital for f in funds]),
+                    initial_leverages=numpy.array([f.initial_leverage for f in funds]),
+                    leverages=numpy.array([f.leverage for f in funds]),
+                    loans=numpy.array([f.loan for f in funds]),
+                    tolerances=numpy.array([f.tolerance for f in funds]),
+                    is_liquidating=numpy.array([f.is_liquidating for f in funds], dtype=bool),
+                    is_in_default=numpy.array([f.is_in_default for f in funds], dtype=bool),
+                    portfolio_indptr=portfolio_indptr,
+                    portfolio_assets=numpy.array(portfolio_assets, dtype=numpy.intp),
+                    portfolio_shares=numpy.array(portfolio_shares))
+
+    @classmethod
+    def load_snapshot(cls, file_name, mi_calc: MarketImpactCalculator, mmap=False):
+        """ A network written by save_snapshot(). With mmap the arrays are read from memory maps of the file, so
+            only the pages the network is built from are read. """
+        arrays = _load_npz(file_name, mmap)
+        if int(arrays['version']) != SNAPSHOT_VERSION:
+            raise ValueError('unsupported network snapshot version {0}'.format(int(arrays['version'])))
+        asset_keys = arrays['asset_keys'].tolist()
+        assets = {}
+        for sym, symbol, price, zero_time_price, daily_volume, volatility, max_shares in zip(
+                asset_keys, arrays['asset_symbols'].tolist(), arrays['prices'].tolist(),
+                arrays['zero_time_prices'].tolist(), arrays['daily_volumes'].tolist(),
+                arrays['volatilities'].tolist(), arrays['max_shares_to_trade_in_ts'].tolist()):
+            asset = Asset(price=zero_time_price, daily_volume=daily_volume, symbol=symbol, volatility=volatility)
+            asset.price = price
+            asset.max_shares_to_trade_in_ts = max_shares
+            assets[sym] = asset
+        indptr = arrays['portfolio_indptr'].tolist()
+        portfolio_assets = arrays['portfolio_assets'].tolist()
+        portfolio_shares = arrays['portfolio_shares'].tolist()
+        funds = {}
+        for i, (sym, symbol, initial_capital, initial_leverage, leverage, loan, tolerance, is_liquidating,
+                is_in_default) in enumerate(zip(
+                arrays['fund_keys'].tolist(), arrays['fund_symbols'].tolist(), arrays['initial_capitals'].tolist(),
+                arrays['initial_leverages'].tolist(), arrays['leverages'].tolist(), arrays['loans'].tolist(),
+                arrays['tolerances'].tolist(), arrays['is_liquidating'].tolist(), arrays['is_in_default'].tolist())):
+            portfolio = {asset_keys[j]: num_shares for j, num_shares in
+                         zip(portfolio_assets[indptr[i]:indptr[i + 1]], portfolio_shares[indptr[i]:indptr[i + 1]])}
+            fund = Fund(symbol, portfolio, initial_capital, initial_leverage, tolerance)
+            fund.leverage = leverage
+            fund.loan = loan
+            fund.is_liquidating = is_liquidating
+            fund.is_in_default = is_in_default
+            funds[sym] = fund
+        return cls(funds, assets, mi_calc)
+
     def get_canonical_form(self):
         num_funds = len(self.funds)
         num_assets = len(self.assets)
@@ -394,35 +806,90 @@ class AssetFundsNetwork:
         state =  ["{0}:{1}".format(a.symbol, a.price) for a in self.assets]
         return ','.join(state)
 
+    def holdings(self):
+        """ The HoldingsMatrix of the funds, shared with the copies of this network like the funds are. It is
+            built on first use, sparse from SPARSE_HOLDINGS_MIN_SIZE funds x assets on, and again after a
+            liquidation changes a portfolio. Call reset_holdings() after changing the funds otherwise. """
+        holdings = self._holdings[0]
+        if holdings is None or holdings.portfolio_versions != [f.portfolio_version for f in self.funds.values()]:
+            sparse = len(self.funds) * len(self.assets) >= SysConfig.get('SPARSE_HOLDINGS_MIN_SIZE')
+            self._holdings[0] = HoldingsMatrix(self.funds, self.assets, sparse)
+        return self._holdings[0]
+
+    def reset_holdings(self):
+        self._holdings[0] = None
+
+    def _fund_valuation(self):
+        holdings = self.holdings()
+        prices = holdings.prices(self.assets)
+        if self._valuation is None or self._valuation.holdings is not holdings:
+            self._valuation = FundValuation(holdings, prices)
+            self._owns_valuation = True
+        elif (self._valuation.prices != prices).any():
+            # prices set on the Asset objects (which copies of the network share) rather than by set_asset_price
+            self._writable_valuation().set_prices(prices)
+        return self._valuation
+
+    def _record_leverages(self, valuation):
+        """ Sets fund.leverage to the current leverage of the funds with Fund's margin call rule, as
+            Fund.compute_curr_leverage does (which keeps the last finite leverage) """
+        leverages = valuation.leverages().tolist()
+        for i, fund in valuation.holdings.standard_funds:
+            if leverages[i] != numpy.inf:
+                fund.leverage = leverages[i]
+
+    def fund_leverages(self):
+        valuation = self._fund_valuation()
+        self._record_leverages(valuation)
+        return valuation.leverages().copy()
+
+    def margin_call_flags(self):
+        valuation = self._fund_valuation()
+        self._record_leverages(valuation)
+        flags = valuation.margin_calls().copy()
+        valuation.holdings.apply_custom_margin_calls(flags, self.assets)
+        return flags
+
     def count_margin_calls(self):
-        fund_in_margin = 0
-        for fund in self.funds.values():
-            if fund.marginal_call(self.assets):
-                fund_in_margin += 1
-        return fund_in_margin
+        return int(numpy.count_nonzero(self.margin_call_flags()))
 
     def get_funds_in_margin_calls(self):
-        fund_in_margin = []
-        for fund in self.funds.values():
-            if fund.marginal_call(self.assets):
-                fund_in_margin.append(fund.symbol)
-        return fund_in_margin
+        fund_symbols = self.holdings().fund_symbols
+        return [self.funds[fund_symbols[i]].symbol for i in numpy.flatnonzero(self.margin_call_flags())]
 
     def margin_calls(self):
-        for fund in self.funds.values():
-            if fund.marginal_call(self.assets):
-                return True
-        return False
+        return bool(self.margin_call_flags().any())
 
     def get_liquidation_orders(self):
+        holdings = self.holdings()
+        funds = list(self.funds.values())
+        liquidating = numpy.array([fund.is_liquidating for fund in funds], dtype=bool)
+        custom = {i for i, _ in holdings.custom_funds}
+        sales = holdings.liquidation_sales(liquidating, self.assets)
+        shares = holdings.sparse_shares
         orders = []
-        for fund in self.funds.values():
-            orders.append(fund.get_orders(self.assets))
+        for i, fund in enumerate(funds):
+            if not liquidating[i] or i in custom:
+                orders.append(fund.get_orders(self.assets))
+                continue
+            start, end = shares.indptr[i], shares.indptr[i + 1]
+            fund_orders = []
+            for j, sold in zip(shares.cols[start:end].tolist(), sales[start:end].tolist()):
+                sym = holdings.asset_symbols[j]
+                num_shares = fund.portfolio[sym]
+                shares_to_sell = num_shares if sold == num_shares else int(sold)
+                fund_orders.append(Sell(sym, shares_to_sell))
+                if num_shares == shares_to_sell:
+                    fund.portfolio.pop(sym)
+                else:
+                    fund.portfolio[sym] = num_shares - shares_to_sell
+            fund.portfolio_version += 1
+            orders.append(fund_orders)
         return orders
 
     def update_funds(self):
-        for fund in self.funds.values():
-            fund.update_state(self.assets)
+        for fund, leverage in zip(self.funds.values(), self._fund_valuation().leverages().tolist()):
+            fund.update_state(self.assets, leverage)
 
     def get_single_orders_multiple_options(self, gen_order_func):
         orders = []
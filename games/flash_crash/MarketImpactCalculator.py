@@ -1,5 +1,7 @@
 from math import exp, sqrt
 
+import numpy
+
 from Orders import Sell, Buy, NoLimitOrder
 
 
@@ -10,6 +12,11 @@ class MarketImpactCalculator:
     def get_updated_price(self, num_shares, asset, sign):
         raise NotImplementedError
 
+    def get_updated_prices(self, num_shares, daily_volumes, prices, volatilities, signs):
+        """ get_updated_price for arrays of trades, element by element (the arrays broadcast together, e.g.
+            scenarios x assets) """
+        raise NotImplementedError
+
 
 class ExponentialMarketImpactCalculator(MarketImpactCalculator):
     def __init__(self, alpha):
@@ -25,6 +32,9 @@ class ExponentialMarketImpactCalculator(MarketImpactCalculator):
         frac_liquidated = num_shares / asset.daily_volume
         return asset.price * exp(sign*self.alpha * frac_liquidated)
 
+    def get_updated_prices(self, num_shares, daily_volumes, prices, volatilities, signs):
+        return prices * numpy.exp(signs * self.alpha * (num_shares / daily_volumes))
+
 
 class SqrtMarketImpactCalculator(MarketImpactCalculator):
     def __init__(self, Y=0.5):
@@ -43,4 +53,8 @@ class SqrtMarketImpactCalculator(MarketImpactCalculator):
         delta = sqrt(abs(frac_liquidated)) * self.Y * asset.volatility
         return asset.price + sign/abs(sign)*delta
 
+    def get_updated_prices(self, num_shares, daily_volumes, prices, volatilities, signs):
+        delta = numpy.sqrt(numpy.abs(num_shares / daily_volumes)) * self.Y * volatilities
+        return prices + numpy.sign(signs) * delta
+
 
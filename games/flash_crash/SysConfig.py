@@ -9,6 +9,7 @@ class SysConfig:
               "MAX_NUM_ORDERS": 2,
               "TIME_STEP_MINUTES": 5,
               "DAILY_PORTION_PER_MIN": 0.001, # finish a 1.5% order in 15 minutes
+              "SPARSE_HOLDINGS_MIN_SIZE": 200000, # funds x assets
              # "DAILY_PORTION_PER_MIN": 0.001, # finish a 1.5% order in 15 minutes
     }
 
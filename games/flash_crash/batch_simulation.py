@@ -0,0 +1,122 @@
+import copy
+
+import numpy
+
+
+class ScenarioBatch:
+    """ K order book scenarios on one network, run together: the prices and the buy / sell books are
+        K x assets arrays (columns in the order of network.holdings().asset_symbols) and every trade step and
+        margin check covers all K scenarios at once. Scenario k starts from the network's prices and books plus
+        sell_order_sets[k] and buy_order_sets[k]. The network itself is not changed.
+    """
+
+    def __init__(self, network, sell_order_sets=(), buy_order_sets=None):
+        self.network = network
+        self.holdings = network.holdings()
+        self.asset_symbols = self.holdings.asset_symbols
+        self.asset_index = self.holdings.asset_index
+        self.num_scenarios = len(sell_order_sets) if buy_order_sets is None else len(buy_order_sets)
+        self.prices = numpy.tile(self.holdings.prices(network.assets), (self.num_scenarios, 1))
+        # the prices no trade moved yet, logged like the network logs them
+        self._unmoved = numpy.ones(self.prices.shape, dtype=bool)
+        self.sell = self._book(network.sell_orders, sell_order_sets)
+        self.buy = self._book(network.buy_orders, buy_order_sets or [()] * self.num_scenarios)
+        self.limit_trade_step = network.limit_trade_step
+        caps = network.trade_caps()
+        self.trade_caps = numpy.array([caps[sym] for sym in self.asset_symbols])
+        self.daily_volumes = numpy.array([network.assets[sym].daily_volume for sym in self.asset_symbols], dtype=float)
+        self.volatilities = numpy.array([network.assets[sym].volatility for sym in self.asset_symbols], dtype=float)
+
+    @classmethod
+    def from_attacks(cls, network, attacks):
+        """ A scenario per (order_set, cost) of ActionsManager.get_possible_attacks """
+        return cls(network, [order_set for order_set, _ in attacks])
+
+    def _book(self, network_book, order_sets):
+        book = numpy.zeros((self.num_scenarios, len(self.asset_symbols)))
+        for sym, num_shares in network_book.items():
+            book[:, self.asset_index[sym]] = num_shares
+        for k, orders in enumerate(order_sets):
+            for order in orders:
+                book[k, self.asset_index[order.asset_symbol]] += order.num_shares
+        return book
+
+    def order_books_empty(self):
+        """ Per scenario """
+        return ~((self.buy != 0) | (self.sell != 0)).any(axis=1)
+
+    def trade_step(self, log=False):
+        """ AssetFundsNetwork.simulate_trade for every scenario: nets the books, clips the trades to the trade
+            caps and moves the prices of all the traded assets of all the scenarios with one impact model call.
+            With log, returns the price log of every scenario, as simulate_trade does. """
+        buy, sell = self.buy, self.sell
+        balance = buy - sell
+        shares = numpy.abs(balance)
+        if self.limit_trade_step:
+            shares = numpy.minimum(shares, self.trade_caps)
+        selling = balance < 0
+        buying = balance > 0
+        self.sell = numpy.where(selling, sell - (shares + buy), 0.)
+        self.buy = numpy.where(buying, buy - (shares + sell), 0.)
+        traded = numpy.nonzero(selling | buying)
+        assets = traded[1]
+        old_prices = self._log_prices(traded) if log else None
+        try:
+            self.prices[traded] = self.network.mi_calc.get_updated_prices(
+                shares[traded], self.daily_volumes[assets], self.prices[traded], self.volatilities[assets],
+                numpy.where(buying[traded], 1, -1))
+        except NotImplementedError:
+            self._update_prices_one_by_one(traded, shares, buying)
+        self._unmoved[traded] = False
+        if log:
+            return self._trade_logs(traded, old_prices)
+        return None
+
+    def _log_prices(self, traded):
+        prices = self.prices[traded].tolist()
+        for n in numpy.flatnonzero(self._unmoved[traded]).tolist():
+            prices[n] = self.network.assets[self.asset_symbols[traded[1][n]]].price
+        return prices
+
+    def _trade_logs(self, traded, old_prices):
+        logs = [{} for _ in range(self.num_scenarios)]
+        for k, j, old_price, updated_price in zip(traded[0].tolist(), traded[1].tolist(), old_prices,
+                                                  self.prices[traded].tolist()):
+            logs[k][self.asset_symbols[j]] = '{0}->{1}'.format(old_price, updated_price)
+        return logs
+
+    def _update_prices_one_by_one(self, traded, shares, buying):
+        """ For impact models with only the single trade get_updated_price """
+        mi_calc = self.network.mi_calc
+        # one scratch copy per asset carries the scenario's price into the impact model
+        scratch = [copy.copy(self.network.assets[sym]) for sym in self.asset_symbols]
+        for k, j in zip(*traded):
+            asset = scratch[j]
+            asset.price = self.prices[k, j].item()
+            self.prices[k, j] = mi_calc.get_updated_price(shares[k, j].item(), asset, 1 if buying[k, j] else -1)
+
+    def clear_order_books(self):
+        while not self.order_books_empty().all():
+            self.trade_step()
+
+    def _asset(self, k, j):
+        asset = copy.copy(self.network.assets[self.asset_symbols[j]])
+        asset.price = self.prices[k, j].item()
+        return asset
+
+    def scenario_assets(self, k):
+        """ The network's assets with the prices of scenario k """
+        return {sym: self._asset(k, j) for j, sym in enumerate(self.asset_symbols)}
+
+    def margin_calls(self):
+        """ K x funds margin call flags, funds in the order of network.holdings().fund_symbols """
+        assets = [self.scenario_assets(k) for k in range(self.num_scenarios)] if self.holdings.custom_funds else None
+        return self.holdings.margin_calls(self.prices, assets)
+
+    def count_margin_calls(self):
+        return numpy.count_nonzero(self.margin_calls(), axis=1)
+
+    def get_funds_in_margin_calls(self):
+        """ The list of funds in margin call of every scenario """
+        fund_symbols = [self.network.funds[sym].symbol for sym in self.holdings.fund_symbols]
+        return [[fund_symbols[i] for i in numpy.flatnonzero(flags)] for flags in self.margin_calls()]
@@ -1,4 +1,3 @@
-import copy
 import csv
 from math import floor
 
@@ -20,14 +19,7 @@ class Solution:
 
 
 def copy_network(from_net):
-    new_assets = copy.deepcopy(from_net.assets)
-    new_net = AssetFundsNetwork(funds=from_net.funds,
-                                assets=new_assets,
-                                mi_calc=from_net.mi_calc,
-                                limit_trade_step=from_net.limit_trade_step)
-    new_net.sell_orders = copy.deepcopy(from_net.sell_orders)
-    new_net.buy_orders = copy.deepcopy(from_net.buy_orders)
-    return new_net
+    return from_net.copy()
 
 def store_solutions( filename, solutions):
     with open(filename, 'w', newline='') as csvfile:
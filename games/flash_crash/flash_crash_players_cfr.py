@@ -1,35 +1,51 @@
-import copy
-
 from AssetFundNetwork import AssetFundsNetwork
 import random
 
 from common import copy_network
 from constants import ATTACKER, CHANCE, DEFENDER, MARKET, BUY, SELL, SIM_TRADE
-from games.bases import GameStateBase
+from games.bases import GameStateBase, LazyExpansion, History, LabelTable
 
 
 class Budget:
+    __slots__ = ('attacker', 'defender')
+
     def __init__(self,attacker, defender):
         self.attacker = attacker
         self.defender = defender
 
     def __eq__(self, other):
         return isinstance(other, Budget) and self.defender == other.defender and self.attacker == other.attacker
-#parent, actions_manager, to_move, history_assets_dict, budget, af_network, actions_history
+
+
+class FlashCrashTreeContext:
+    """ What all the nodes of one tree share, so each node holds a single reference to it """
+    __slots__ = ('actions_manager', 'expansion', 'labels')
+
+    def __init__(self, actions_manager, expansion):
+        self.actions_manager = actions_manager
+        self.expansion = expansion
+        self.labels = LabelTable()
+
 
 class FlashCrashRootChanceGameState(GameStateBase):
-    def __init__(self, action_mgr, af_network:AssetFundsNetwork, defender_budget, attacker_budgets):
+    def __init__(self, action_mgr, af_network:AssetFundsNetwork, defender_budget, attacker_budgets, lazy=False,
+                 max_expanded=None, branches=None):
         self.af_network = af_network
         super().__init__(parent=None, to_move=CHANCE, actions =[str(x) for x in attacker_budgets])
+        # with lazy, nodes build their children on first play and tree_size is not known (None)
+        # with branches, only the children of those actions are built (see parallel_tree_builder)
+        self.expansion = LazyExpansion(max_expanded) if lazy else None
+        context = FlashCrashTreeContext(action_mgr, self.expansion)
+        empty = History()
         self.children = {
             str(budget): AttackerMoveGameState(
-                parent=self,  actions_manager=action_mgr, to_move=ATTACKER,  history_assets_dict={BUY:{},SELL:{}},
+                parent=self,  context=context, to_move=ATTACKER,  history_assets_dict={BUY:{},SELL:{}},
                 budget=Budget(attacker=budget,defender=defender_budget),af_network=af_network,
-                actions_history={BUY:[],SELL:[],SIM_TRADE:[]}
-            ) for budget in attacker_budgets
+                histories=(empty, empty, empty)
+            ) for budget in attacker_budgets if branches is None or str(budget) in branches
         }
-        self._chance_prob = 1. / len(self.children)
-        self.tree_size = 1 + sum([x.tree_size for x in self.children.values()])
+        self._chance_prob = 1. / len(self.actions)
+        self.tree_size = None if lazy else 1 + sum([x.tree_size for x in self.children.values()])
 
     def is_terminal(self):
         return False
@@ -40,20 +56,66 @@ class FlashCrashRootChanceGameState(GameStateBase):
     def chance_prob(self):
         return self._chance_prob
 
-    def sample_one(self):
-        return random.choice(list(self.children.values()))
+    def sample_one(self, rng=random):
+        return rng.choice(list(self.children.values()))
 
 
 class FlashCrashGameStateBase(GameStateBase):
-
-    def __init__(self, parent, to_move, actions, history_assets_dict, af_network, budget, actions_history):
-        super().__init__(parent = parent, to_move = to_move,actions=actions)
-        self.actions_history=actions_history
+    """ Nodes are kept compact: __slots__, the action histories as History objects shared with the ancestors,
+        history_assets_dict shared with the parent where it did not change, and action labels, action lists and
+        information sets stored once per tree in the context's LabelTable. actions_history and
+        history_assets_dict must not be modified.
+    """
+    __slots__ = ('context', 'af_network', 'budget', 'history_assets_dict', '_buy_history', '_sell_history',
+                 '_trade_history', '_children', '_information_set')
+
+    def __init__(self, parent, to_move, actions, history_assets_dict, af_network, budget, histories, context):
+        super().__init__(parent = parent, to_move = to_move,actions=context.labels.actions(actions))
+        self._buy_history, self._sell_history, self._trade_history = histories
         self.af_network = af_network
         self.budget = budget
-        self.children = {}
         self.history_assets_dict = history_assets_dict
+        self.context = context
+        self._children = None
+
+    @property
+    def actions_manager(self):
+        return self.context.actions_manager
+
+    @property
+    def expansion(self):
+        return self.context.expansion
+
+    @property
+    def actions_history(self):
+        return {BUY: self._buy_history.to_list(), SELL: self._sell_history.to_list(),
+                SIM_TRADE: self._trade_history.to_list()}
+
+    @property
+    def children(self):
+        expansion = self.context.expansion
+        if self._children is None:
+            self._children = self._expand()
+            if expansion:
+                expansion.add(self)
+        elif expansion:
+            expansion.touch(self)
+        return self._children
+
+    def _expand(self):
+        return {}
+
+    def _init_tree_size(self):
+        if self.expansion:
+            self.tree_size = None
+        else:
+            self.tree_size = 1 + sum([x.tree_size for x in self.children.values()])
+
+    def _set_information_set(self, information_set):
+        self._information_set = self.context.labels.label(information_set)
 
+    def evict(self):
+        self._children = None
 
     def inf_set(self):
         return self._information_set
@@ -65,46 +127,53 @@ class FlashCrashGameStateBase(GameStateBase):
         return -1*self.af_network.count_margin_calls()
 
     def _update_asset_history(self, order_set, buy_sell_key):
-        history_assets_dict2 = copy.deepcopy(self.history_assets_dict)
+        # only the changed side is copied, the other one stays shared
+        history_assets_dict2 = dict(self.history_assets_dict)
+        assets_history = dict(history_assets_dict2[buy_sell_key])
         for order in order_set:
-            order_count = history_assets_dict2[buy_sell_key][order.asset_symbol] if order.asset_symbol \
-                                                                in history_assets_dict2[buy_sell_key] else 0
-            history_assets_dict2[buy_sell_key][order.asset_symbol] = order_count + 1
+            order_count = assets_history[order.asset_symbol] if order.asset_symbol in assets_history else 0
+            assets_history[order.asset_symbol] = order_count + 1
+        history_assets_dict2[buy_sell_key] = assets_history
         return history_assets_dict2
 
 
 class MarketMoveGameState(FlashCrashGameStateBase):
+    __slots__ = ('terminal', '_traded_network')
 
-    def __init__(self, parent,  actions_manager, to_move, history_assets_dict, budget, af_network, actions_history):
+    def __init__(self, parent, context, to_move, history_assets_dict, budget, af_network, histories):
         self.terminal = af_network.order_books_empty()
         if self.terminal:
             actions = []
+            self._traded_network = None
         else:
-            net2 = copy_network(af_network)
-            actions = [str(net2.simulate_trade())]
+            self._traded_network = copy_network(af_network)
+            actions = [str(self._traded_network.simulate_trade())]
 
         super().__init__(parent = parent, to_move = to_move, actions=actions,history_assets_dict=history_assets_dict,
-                         af_network = af_network, budget=budget, actions_history=actions_history)
-
-        self._information_set = ".{0}.{1}.{2}".format('MARKET_HISTORY:' + str(actions_history[SIM_TRADE])
-                                                     ,'BUY:'+str(af_network.buy_orders), 'SELL:'+str(af_network.sell_orders))
-
-        if actions:
-            action = actions[0]
-            actions_history2 = copy.deepcopy(actions_history)
-            actions_history2[SELL].append(action)
-            actions_history2[BUY].append(action)
-            actions_history2[SIM_TRADE].append(action)
-            self.children[action] = AttackerMoveGameState(
+                         af_network = af_network, budget=budget, histories=histories, context=context)
+
+        self._set_information_set(".{0}.{1}.{2}".format('MARKET_HISTORY:' + str(self._trade_history)
+                                                     ,'BUY:'+str(af_network.buy_orders), 'SELL:'+str(af_network.sell_orders)))
+        self._init_tree_size()
+        if not self.expansion:
+            self._traded_network = None
+
+    def _expand(self):
+        children = {}
+        if self.actions:
+            action = self.actions[0]
+            # the child only copies the traded network, so it can be rebuilt after an eviction
+            children[action] = AttackerMoveGameState(
                     self,
-                    actions_manager,
+                    self.context,
                     ATTACKER,
                     self.history_assets_dict,
-                    budget,
-                    net2,
-                    actions_history2
+                    self.budget,
+                    self._traded_network,
+                    (self._buy_history.append(action), self._sell_history.append(action),
+                     self._trade_history.append(action))
                 )
-        self.tree_size = 1 + sum([x.tree_size for x in self.children.values()])
+        return children
 
     def chance_prob(self):
         return 1
@@ -114,71 +183,76 @@ class MarketMoveGameState(FlashCrashGameStateBase):
 
 
 class AttackerMoveGameState(FlashCrashGameStateBase):
-    def __init__(self, parent, actions_manager, to_move, history_assets_dict, budget, af_network, actions_history):
+    __slots__ = ('_attacks',)
+
+    def __init__(self, parent, context, to_move, history_assets_dict, budget, af_network, histories):
 #        if af_network.margin_calls():
 #            str_order_sets = []
 #        else:
 #            attacks = actions_manager.get_possible_attacks(budget.attacker, history_assets_dict)
 #            str_order_sets = [str(x[0]) for x in attacks]
-        attacks = actions_manager.get_possible_attacks(budget.attacker, history_assets_dict)
-        str_order_sets = [str(x[0]) for x in attacks]
+        self._attacks = context.actions_manager.get_possible_attacks(budget.attacker, history_assets_dict)
+        str_order_sets = [str(x[0]) for x in self._attacks]
         super().__init__(parent=parent,  to_move=to_move, actions = str_order_sets,
-                         history_assets_dict=history_assets_dict, af_network=af_network, budget=budget, actions_history=actions_history)
-        self._information_set = ".{0}.{1}".format(str(budget.attacker), 'A_HISTORY:' + str(actions_history[SELL]))
-        if not str_order_sets:
-            return
-
-        for order_set, cost in attacks:
-            net2 = copy_network(af_network)
+                         history_assets_dict=history_assets_dict, af_network=af_network, budget=budget,
+                         histories=histories, context=context)
+        self._set_information_set(".{0}.{1}".format(str(budget.attacker), 'A_HISTORY:' + str(self._sell_history)))
+        self._init_tree_size()
+        if not self.expansion:
+            self._attacks = None
+
+    def _expand(self):
+        children = {}
+        for (order_set, cost), action in zip(self._attacks, self.actions):
+            net2 = copy_network(self.af_network)
             net2.submit_sell_orders(order_set)
-            actions_history2 = copy.deepcopy(actions_history)
-            actions_history2[SELL].append(str(order_set))
-            self.children[str(order_set)] = DefenderMoveGameState(
+            children[action] = DefenderMoveGameState(
                 self,
-                actions_manager,
+                self.context,
                 DEFENDER,
                 self._update_asset_history(order_set, SELL),
-                Budget(budget.attacker - cost, budget.defender),
+                Budget(self.budget.attacker - cost, self.budget.defender),
                 net2,
-                actions_history2
+                (self._buy_history, self._sell_history.append(action), self._trade_history)
             )
-
-        self.tree_size = 1 + sum([x.tree_size for x in self.children.values()])
+        return children
 
     def is_terminal(self):
         return False
 
 class DefenderMoveGameState(FlashCrashGameStateBase):
+    __slots__ = ('_defenses',)
 
-    def __init__(self, parent, actions_manager, to_move, history_assets_dict, budget, af_network, actions_history):
-        defenses = actions_manager.get_possible_defenses(af_network, budget.defender, history_assets_dict)
-        str_order_sets = [str(x[0]) for x in defenses]
+    def __init__(self, parent, context, to_move, history_assets_dict, budget, af_network, histories):
+        self._defenses = context.actions_manager.get_possible_defenses(af_network, budget.defender,
+                                                                       history_assets_dict)
+        str_order_sets = [str(x[0]) for x in self._defenses]
         super().__init__(parent=parent, to_move=to_move, actions=str_order_sets, history_assets_dict=history_assets_dict,
-                         af_network=af_network, budget=budget, actions_history=actions_history)
+                         af_network=af_network, budget=budget, histories=histories, context=context)
+
+        self._set_information_set(".{0}.{1}".format(str(budget.defender), 'D_HISTORY:' + str(self._buy_history)))
+        self._init_tree_size()
+        if not self.expansion:
+            self._defenses = None
 
+    def _expand(self):
+        children = {}
 #        if not defenses:
 #            self.budget.defender = 0 #in case there is only a small amount of money
  #       else:
-        for order_set, cost in defenses:
-            net2 = copy_network(af_network)
+        for (order_set, cost), action in zip(self._defenses, self.actions):
+            net2 = copy_network(self.af_network)
             net2.submit_buy_orders(order_set)
-            actions_history2 = copy.deepcopy(actions_history)
-            actions_history2[BUY].append(str(order_set))
-            self.children[str(order_set)] = MarketMoveGameState(
+            children[action] = MarketMoveGameState(
                 self,
-                actions_manager,
+                self.context,
                 MARKET,
                 self._update_asset_history(order_set, BUY),
-                Budget(budget.attacker,budget.defender - cost),
+                Budget(self.budget.attacker,self.budget.defender - cost),
                 net2,
-                actions_history2
+                (self._buy_history.append(action), self._sell_history, self._trade_history)
             )
-        self._information_set = ".{0}.{1}".format(str(budget.defender), 'D_HISTORY:' + str(actions_history[BUY]))
-        self.tree_size = 1 + sum([x.tree_size for x in self.children.values()])
+        return children
 
     def is_terminal(self):
         return False
-
-
-
-
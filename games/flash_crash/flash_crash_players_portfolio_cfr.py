@@ -39,7 +39,8 @@ class PortfolioFlashCrashGameStateBase(GameStateBase):
 
 
 class PortfolioFlashCrashRootChanceGameState(GameStateBase):
-    def __init__(self, action_mgr, af_network:AssetFundsNetwork, defender_budget):
+    def __init__(self, action_mgr, af_network:AssetFundsNetwork, defender_budget, branches=None):
+        # with branches, only the children of those actions are built (see parallel_tree_builder)
         self._chance_prob = action_mgr.get_portfolios_prob()
         portfolios = {x: y.order_set for x, y in action_mgr.get_portfolios().items() if x in self._chance_prob}
         super().__init__(parent=None, to_move=CHANCE, actions = portfolios.keys())
@@ -50,7 +51,7 @@ class PortfolioFlashCrashRootChanceGameState(GameStateBase):
                 players_info=PlayersHiddenInfo(p, p_id, defender_budget),
                 af_network=af_network,
                 actions_history={BUY:[],SELL:[],SIM_TRADE:[]}
-            ) for p_id, p in portfolios.items()
+            ) for p_id, p in portfolios.items() if branches is None or str(p_id) in branches
         }
 
         self.tree_size = 1 + sum([x.tree_size for x in self.children.values()])
@@ -64,8 +65,9 @@ class PortfolioFlashCrashRootChanceGameState(GameStateBase):
     def chance_prob(self):
         return self._chance_prob
 
-    def sample_one(self):
-        return random.choice(list(self.children.values()))
+    def sample_one(self, rng=random):
+        actions = list(self.children.keys())
+        return self.children[rng.choices(actions, weights=[self._chance_prob[a] for a in actions])[0]]
 
 
 class PortfolioMarketMoveGameState(PortfolioFlashCrashGameStateBase):
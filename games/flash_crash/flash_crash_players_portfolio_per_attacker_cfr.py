@@ -5,7 +5,8 @@ import random
 
 from common import copy_network
 from constants import ATTACKER, CHANCE, DEFENDER, MARKET, BUY, SELL, SIM_TRADE
-from games.bases import GameStateBase
+from games.bases import GameStateBase, InfoSetInterner
+from public_states import PublicStateTable
 
 
 
@@ -22,14 +23,48 @@ class PPAPlayersHiddenInfo:
 
 
 class PPAFlashCrashGameStateBase(GameStateBase):
+    """ With an interner the nodes keep only the ids of their histories (actions_history is None), the action
+        lists are recovered from the interner by the actions_history property. """
 
-    def __init__(self, parent, to_move, actions, af_network, players_info, actions_history):
+    def __init__(self, parent, to_move, actions, af_network, players_info, actions_history, public_states=None,
+                 interner=None, history_ids=None):
         super().__init__(parent=parent, to_move = to_move,actions=actions)
-        self.actions_history=actions_history
+        self._actions_history = actions_history
         self.af_network = af_network
         self.players_info = players_info
+        self.public_states = public_states
+        self.interner = interner
+        self.history_ids = history_ids
         self.children = {}
 
+    @property
+    def actions_history(self):
+        if self.interner is None:
+            return self._actions_history
+        return {kind: self.interner.history(history_id) for kind, history_id in self.history_ids.items()}
+
+    def _set_information_set(self, prefix, history_kind, suffix=''):
+        if self.interner is None:
+            self._information_set = prefix + str(self._actions_history[history_kind]) + suffix
+        else:
+            self._information_set = self.interner.key(prefix, self.history_ids[history_kind], suffix)
+
+    def _child_actions_history(self, action, history_kinds):
+        if self.interner is not None:
+            return None
+        actions_history = copy.deepcopy(self._actions_history)
+        for kind in history_kinds:
+            actions_history[kind].append(action)
+        return actions_history
+
+    def _child_history_ids(self, action, history_kinds):
+        if self.interner is None:
+            return None
+        history_ids = dict(self.history_ids)
+        for kind in history_kinds:
+            history_ids[kind] = self.interner.extend(history_ids[kind], action)
+        return history_ids
+
     def inf_set(self):
         return self._information_set
 
@@ -37,18 +72,38 @@ class PPAFlashCrashGameStateBase(GameStateBase):
         if not self.is_terminal():
             raise RuntimeError("trying to evaluate non-terminal node")
 
-        return -1*self.af_network.count_margin_calls()
+        if self.public_states is None:
+            return -1*self.af_network.count_margin_calls()
+        return self.public_states.get(('evaluation', self._state_key), lambda: -1*self.af_network.count_margin_calls())
+
+    def _next_network(self, action, compute_network):
+        if self.public_states is None:
+            return compute_network()
+        return self.public_states.transition(self._state_key, action, compute_network)
 
 
 class PPAFlashCrashRootChanceGameState(GameStateBase):
-    def __init__(self, action_mgr, af_network:AssetFundsNetwork, defender_budget, attacker_budgets):
+    """ With transpositions=True, nodes with the same public state (prices, order books, liquidation flags)
+        share their network and the trades, defenses and evaluations computed from it, see PublicStateTable.
+        The tree and its information sets are the same either way.
+        With interned_infosets=True the information sets are integers from the InfoSetInterner self.infosets,
+        self.infosets.describe(key) gives the usual string.
+        With branches, only the children of those actions are built (see parallel_tree_builder). """
+    def __init__(self, action_mgr, af_network:AssetFundsNetwork, defender_budget, attacker_budgets,
+                 transpositions=False, interned_infosets=False, branches=None):
         super().__init__(parent=None, to_move=CHANCE, actions = [str(x) for x in attacker_budgets])
         self.af_network = af_network
+        self.public_states = PublicStateTable() if transpositions else None
+        self.infosets = InfoSetInterner() if interned_infosets else None
+        self._information_set = self.infosets.key('.') if self.infosets is not None else '.'
+        if self.public_states is not None:
+            af_network = self.public_states.network(af_network)
         self.children = {
             str(attacker_budget): PPASelectorGameState(
                 parent=self,  actions_manager=action_mgr, to_move=ATTACKER,
-                af_network=af_network,defender_budget=defender_budget, attacker_budget=attacker_budget
-            ) for attacker_budget in attacker_budgets
+                af_network=af_network,defender_budget=defender_budget, attacker_budget=attacker_budget,
+                public_states=self.public_states, interner=self.infosets
+            ) for attacker_budget in attacker_budgets if branches is None or str(attacker_budget) in branches
         }
 
         self.tree_size = 1 + sum([x.tree_size for x in self.children.values()])
@@ -59,18 +114,18 @@ class PPAFlashCrashRootChanceGameState(GameStateBase):
         return False
 
     def inf_set(self):
-        return "."
+        return self._information_set
 
     def chance_prob(self):
         return self._chance_prob
 
-    def sample_one(self):
-        return random.choice(list(self.children.values()))
+    def sample_one(self, rng=random):
+        return rng.choice(list(self.children.values()))
 
 
 class PPASelectorGameState(GameStateBase):
     def __init__(self, parent, actions_manager, to_move,
-                 af_network:AssetFundsNetwork, defender_budget, attacker_budget):
+                 af_network:AssetFundsNetwork, defender_budget, attacker_budget, public_states=None, interner=None):
         portfolios_in_budget = actions_manager.get_portfolios_in_budget(attacker_budget)
         portfolios = {x: y.order_set for x, y in actions_manager.get_portfolios().items() if x in portfolios_in_budget}
         super().__init__(parent=parent, to_move=to_move, actions=portfolios.keys())
@@ -80,11 +135,15 @@ class PPASelectorGameState(GameStateBase):
                 parent=self,  actions_manager=actions_manager, to_move=ATTACKER,
                 players_info=PPAPlayersHiddenInfo(p, p_id, defender_budget, attacker_budget),
                 af_network=af_network,
-                actions_history={BUY:[],SELL:[],SIM_TRADE:[]}
+                actions_history={BUY:[],SELL:[],SIM_TRADE:[]} if interner is None else None,
+                public_states=public_states, interner=interner,
+                history_ids=dict.fromkeys([BUY, SELL, SIM_TRADE], InfoSetInterner.EMPTY_HISTORY)
             ) for p_id, p in portfolios.items()
         }
 
         self._information_set = ".{0}".format(str(attacker_budget))
+        if interner is not None:
+            self._information_set = interner.key(self._information_set)
         self.tree_size = 1 + sum([x.tree_size for x in self.children.values()])
 
     def is_terminal(self):
@@ -97,36 +156,49 @@ class PPASelectorGameState(GameStateBase):
 
 class PPAMarketMoveGameState(PPAFlashCrashGameStateBase):
 
-    def __init__(self, parent,  actions_manager, to_move, players_info, af_network, actions_history):
+    def __init__(self, parent,  actions_manager, to_move, players_info, af_network, actions_history,
+                 public_states=None, interner=None, history_ids=None):
+        self._state_key = public_states.state_key(af_network) if public_states is not None else None
         self.terminal = af_network.no_more_sell_orders()
         if self.terminal:
             actions = []
+        elif public_states is None:
+            net2, trade_log = self._trade(af_network)
+            actions = [trade_log]
         else:
-            net2 = copy_network(af_network)
-            actions = [str(net2.simulate_trade())]
+            net2, trade_log = public_states.get(('trade', self._state_key), lambda: self._trade(af_network, public_states))
+            actions = [trade_log]
 
         super().__init__(parent = parent, to_move = to_move, actions=actions,
-                         af_network = af_network, players_info=players_info, actions_history=actions_history)
+                         af_network = af_network, players_info=players_info, actions_history=actions_history,
+                         public_states=public_states, interner=interner, history_ids=history_ids)
 
-        self._information_set = ".{0}.{1}.{2}".format('MARKET_HISTORY:' + str(actions_history[SIM_TRADE])
-                                                     ,'BUY:'+str(af_network.buy_orders), 'SELL:'+str(af_network.sell_orders))
+        self._set_information_set('.MARKET_HISTORY:', SIM_TRADE,
+                                  '.BUY:' + str(af_network.buy_orders) + '.SELL:' + str(af_network.sell_orders))
 
         if actions:
             action = actions[0]
-            actions_history2 = copy.deepcopy(actions_history)
-            actions_history2[SELL].append(action)
-            actions_history2[BUY].append(action)
-            actions_history2[SIM_TRADE].append(action)
             self.children[action] = PPAAttackerMoveGameState(
                     self,
                     actions_manager,
                     ATTACKER,
                     players_info,
                     net2,
-                    actions_history2
+                    self._child_actions_history(action, [SELL, BUY, SIM_TRADE]),
+                    public_states,
+                    interner,
+                    self._child_history_ids(action, [SELL, BUY, SIM_TRADE])
                 )
         self.tree_size = 1 + sum([x.tree_size for x in self.children.values()])
 
+    @staticmethod
+    def _trade(af_network, public_states=None):
+        net2 = copy_network(af_network)
+        trade_log = str(net2.simulate_trade())
+        if public_states is not None:
+            net2 = public_states.network(net2)
+        return net2, trade_log
+
     def chance_prob(self):
         return 1
 
@@ -135,19 +207,19 @@ class PPAMarketMoveGameState(PPAFlashCrashGameStateBase):
 
 
 class PPAAttackerMoveGameState(PPAFlashCrashGameStateBase):
-    def __init__(self, parent, actions_manager, to_move, players_info, af_network, actions_history):
+    def __init__(self, parent, actions_manager, to_move, players_info, af_network, actions_history,
+                 public_states=None, interner=None, history_ids=None):
+        self._state_key = public_states.state_key(af_network) if public_states is not None else None
         actions = actions_manager.get_possible_attacks_from_portfolio(players_info.attacker_attack, af_network.no_more_sell_orders())
         self.terminal = not actions
 
         super().__init__(parent=parent,  to_move=to_move, actions = [str(x['action_subset']) for x in actions ],
-                          af_network=af_network, players_info=players_info, actions_history=actions_history)
+                          af_network=af_network, players_info=players_info, actions_history=actions_history,
+                          public_states=public_states, interner=interner, history_ids=history_ids)
 
         for action in actions:
             order_set = action['action_subset']
-            net2 = copy_network(af_network)
-            net2.submit_sell_orders(order_set)
-            actions_history2 = copy.deepcopy(actions_history)
-            actions_history2[SELL].append(str(order_set))
+            net2 = self._next_network(SELL + str(order_set), lambda: self._submit_sell(af_network, order_set))
             self.children[str(order_set)] = PPADefenderMoveGameState(
                 self,
                 actions_manager,
@@ -155,11 +227,21 @@ class PPAAttackerMoveGameState(PPAFlashCrashGameStateBase):
                 PPAPlayersHiddenInfo(action['remaining_orders'], players_info.attacker_pid, players_info.defender,
                                      players_info.attacker_budget),
                 net2,
-                actions_history2,
+                self._child_actions_history(str(order_set), [SELL]),
+                public_states,
+                interner,
+                self._child_history_ids(str(order_set), [SELL])
             )
 
         self.tree_size = 1 + sum([x.tree_size for x in self.children.values()])
-        self._information_set = ".{0}.{1}.{2}".format(str(players_info.attacker_budget), players_info.attacker_pid, 'A_HISTORY:' + str(actions_history[SELL]))
+        self._set_information_set('.{0}.{1}.A_HISTORY:'.format(players_info.attacker_budget, players_info.attacker_pid),
+                                  SELL)
+
+    @staticmethod
+    def _submit_sell(af_network, order_set):
+        net2 = copy_network(af_network)
+        net2.submit_sell_orders(order_set)
+        return net2
 
     def is_terminal(self):
         return self.terminal
@@ -167,20 +249,25 @@ class PPAAttackerMoveGameState(PPAFlashCrashGameStateBase):
 
 class PPADefenderMoveGameState(PPAFlashCrashGameStateBase):
 
-    def __init__(self, parent, actions_manager, to_move, players_info, af_network, actions_history):
-        defenses = actions_manager.get_possible_defenses(af_network, players_info.defender)
+    def __init__(self, parent, actions_manager, to_move, players_info, af_network, actions_history,
+                 public_states=None, interner=None, history_ids=None):
+        if public_states is None:
+            self._state_key = None
+            defenses = actions_manager.get_possible_defenses(af_network, players_info.defender)
+        else:
+            self._state_key = public_states.state_key(af_network)
+            defenses = public_states.get(('defenses', self._state_key, players_info.defender),
+                                         lambda: actions_manager.get_possible_defenses(af_network, players_info.defender))
         str_order_sets = [str(x[0]) for x in defenses]
         super().__init__(parent=parent, to_move=to_move, actions=str_order_sets,
-                         af_network=af_network, players_info=players_info, actions_history=actions_history)
+                         af_network=af_network, players_info=players_info, actions_history=actions_history,
+                         public_states=public_states, interner=interner, history_ids=history_ids)
 
 #        if not defenses:
 #            self.budget.defender = 0 #in case there is only a small amount of money
  #       else:
         for order_set, cost in defenses:
-            net2 = copy_network(af_network)
-            net2.submit_buy_orders(order_set)
-            actions_history2 = copy.deepcopy(actions_history)
-            actions_history2[BUY].append(str(order_set))
+            net2 = self._next_network(BUY + str(order_set), lambda: self._submit_buy(af_network, order_set))
             self.children[str(order_set)] = PPAMarketMoveGameState(
                 self,
                 actions_manager,
@@ -188,11 +275,20 @@ class PPADefenderMoveGameState(PPAFlashCrashGameStateBase):
                 PPAPlayersHiddenInfo(players_info.attacker_attack, players_info.attacker_pid, players_info.defender - cost,
                                      players_info.attacker_budget),
                 net2,
-                actions_history2
+                self._child_actions_history(str(order_set), [BUY]),
+                public_states,
+                interner,
+                self._child_history_ids(str(order_set), [BUY])
             )
-        self._information_set = ".{0}.{1}".format(players_info.defender, 'D_HISTORY:' + str(actions_history[BUY]))
+        self._set_information_set('.{0}.D_HISTORY:'.format(players_info.defender), BUY)
         self.tree_size = 1 + sum([x.tree_size for x in self.children.values()])
 
+    @staticmethod
+    def _submit_buy(af_network, order_set):
+        net2 = copy_network(af_network)
+        net2.submit_buy_orders(order_set)
+        return net2
+
     def is_terminal(self):
         return False
 
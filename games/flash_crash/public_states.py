@@ -0,0 +1,35 @@
+class PublicStateTable:
+    """ Transposition table for the public part of flash crash game states. Nodes reached through different
+        orderings of the same orders share one network object and everything computed from it (trades,
+        possible defenses, evaluations). The nodes themselves stay separate, since their information sets
+        include the players' histories. Shared networks must not be modified.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.__networks = {}
+        self.__results = {}
+
+    def num_states(self):
+        return len(self.__networks)
+
+    def state_key(self, af_network):
+        return af_network.canonical_state()
+
+    def network(self, af_network):
+        """ The shared network with af_network's state, af_network itself if the state is new """
+        return self.__networks.setdefault(self.state_key(af_network), af_network)
+
+    def get(self, key, compute):
+        if key in self.__results:
+            self.hits += 1
+            return self.__results[key]
+        self.misses += 1
+        value = self.__results[key] = compute()
+        return value
+
+    def transition(self, state_key, action, compute_network):
+        """ The shared network reached by playing action (a string) in state_key, compute_network builds it
+            on a miss """
+        return self.get(('transition', state_key, action), lambda: self.network(compute_network()))
@@ -0,0 +1,157 @@
+import random
+
+import numpy
+
+from common import copy_network
+from constants import ATTACKER, DEFENDER, MARKET
+from public_states import PublicStateTable
+
+COUNT_FIELDS = ['chance', 'attacker', 'defender', 'market', 'terminal']
+_FIELD = {ATTACKER: 1, DEFENDER: 2, MARKET: 3}
+
+
+class _TooManyStates(Exception):
+    pass
+
+
+class TreeSizeEstimator:
+    """ Node and information set counts of the portfolio flash crash games without building their trees:
+        the complete game (PPAFlashCrashRootChanceGameState) when attacker_budgets is given, the split main game
+        (PortfolioFlashCrashRootChanceGameState) otherwise.
+        Subtrees are counted once per distinct state (public state, remaining attack, defender budget), which
+        is exact and costs the number of states rather than nodes. Beyond max_states states the counts are
+        sampled instead, with Knuth's estimator over random probes. Information sets need the players' histories,
+        so they are only counted, exactly, for games of at most max_inf_set_nodes nodes.
+    """
+
+    def __init__(self, actions_mgr, af_network, defender_budget, attacker_budgets=None, max_states=100000,
+                 max_inf_set_nodes=1000000, probes=100, rng=None):
+        self.actions_mgr = actions_mgr
+        self.af_network = af_network
+        self.defender_budget = defender_budget
+        self.attacker_budgets = attacker_budgets
+        self.max_states = max_states
+        self.max_inf_set_nodes = max_inf_set_nodes
+        self.probes = probes
+        self.rng = rng or random.Random()
+        self.public_states = PublicStateTable()
+        self.__subtree_counts = {}
+
+    def estimate(self):
+        """ {'nodes', 'chance', 'attacker', 'defender', 'market', 'terminal', 'inf_sets', 'exact'},
+            inf_sets is None when it was not counted """
+        # the root and the complete game's portfolio selectors
+        top = numpy.zeros(len(COUNT_FIELDS))
+        top[0] = 1
+        top[1] = len(self.attacker_budgets or [])
+        starts = self._starts()
+        try:
+            counts = top + sum(self._count(ATTACKER, self.af_network, attack, self.defender_budget)
+                               for _, _, attack in starts)
+            exact = True
+        except _TooManyStates:
+            counts = top + sum(self._probe_estimate(attack) for _, _, attack in starts)
+            exact = False
+        result = {field: float(c) if not exact else int(c) for field, c in zip(COUNT_FIELDS, counts)}
+        result['nodes'] = sum(result[field] for field in COUNT_FIELDS)
+        result['exact'] = exact
+        result['inf_sets'] = self.count_inf_sets() if exact and result['nodes'] <= self.max_inf_set_nodes else None
+        return result
+
+    def _starts(self):
+        """ (attacker budget, portfolio id, portfolio orders) of every subtree below the selector / root """
+        portfolios = self.actions_mgr.get_portfolios()
+        if self.attacker_budgets is None:
+            probable = self.actions_mgr.get_portfolios_prob()
+            return [(None, pid, p.order_set) for pid, p in portfolios.items() if pid in probable]
+        return [(budget, pid, portfolios[pid].order_set) for budget in self.attacker_budgets
+                for pid in self.actions_mgr.get_portfolios_in_budget(budget)]
+
+    def _network(self, state_key, action, compute_network):
+        return self.public_states.transition(state_key, action, compute_network)
+
+    def _children(self, kind, net, attack, defender_budget):
+        """ (action, kind, network, remaining attack, defender budget) of the node's children """
+        state_key = self.public_states.state_key(net)
+        if kind == ATTACKER:
+            children = []
+            for action in self.actions_mgr.get_possible_attacks_from_portfolio(attack, net.no_more_sell_orders()):
+                order_set = action['action_subset']
+                net2 = self._network(state_key, 'SELL' + str(order_set), lambda: self._submit(net, order_set, True))
+                children.append((str(order_set), DEFENDER, net2, action['remaining_orders'], defender_budget))
+            return children
+        if kind == DEFENDER:
+            defenses = self.public_states.get(('defenses', state_key, defender_budget),
+                                              lambda: self.actions_mgr.get_possible_defenses(net, defender_budget))
+            return [(str(order_set), MARKET,
+                     self._network(state_key, 'BUY' + str(order_set), lambda: self._submit(net, order_set, False)),
+                     attack, defender_budget - cost) for order_set, cost in defenses]
+        if net.no_more_sell_orders():
+            return []
+        net2, trade_log = self.public_states.get(('trade', state_key), lambda: self._trade(net))
+        return [(trade_log, ATTACKER, net2, attack, defender_budget)]
+
+    def _submit(self, net, order_set, sell):
+        net2 = copy_network(net)
+        if sell:
+            net2.submit_sell_orders(order_set)
+        else:
+            net2.submit_buy_orders(order_set)
+        return self.public_states.network(net2)
+
+    def _trade(self, net):
+        net2 = copy_network(net)
+        trade_log = str(net2.simulate_trade())
+        return self.public_states.network(net2), trade_log
+
+    def _count(self, kind, net, attack, defender_budget):
+        key = (kind, self.public_states.state_key(net), str(attack), defender_budget)
+        counts = self.__subtree_counts.get(key)
+        if counts is not None:
+            return counts
+        if len(self.__subtree_counts) >= self.max_states:
+            raise _TooManyStates()
+        children = self._children(kind, net, attack, defender_budget)
+        counts = numpy.zeros(len(COUNT_FIELDS))
+        counts[_FIELD[kind] if children else -1] = 1
+        for _, child_kind, child_net, child_attack, child_budget in children:
+            counts += self._count(child_kind, child_net, child_attack, child_budget)
+        self.__subtree_counts[key] = counts
+        return counts
+
+    def _probe_estimate(self, attack):
+        """ Knuth's estimator: along a random path, every node stands for the product of the branching factors
+            above it """
+        counts = numpy.zeros(len(COUNT_FIELDS))
+        for i in range(self.probes):
+            node = (ATTACKER, self.af_network, attack, self.defender_budget)
+            weight = 1.
+            while True:
+                children = self._children(*node)
+                counts[_FIELD[node[0]] if children else -1] += weight
+                if not children:
+                    break
+                weight *= len(children)
+                node = self.rng.choice(children)[1:]
+        return counts / self.probes
+
+    def count_inf_sets(self):
+        """ Distinct information sets of the attacker and defender decision nodes (selectors included) """
+        inf_sets = set()
+        if self.attacker_budgets is not None:
+            inf_sets.update(('selector', budget) for budget in self.attacker_budgets
+                            if self.actions_mgr.get_portfolios_in_budget(budget))
+        for budget, pid, attack in self._starts():
+            stack = [(ATTACKER, self.af_network, attack, self.defender_budget, (), ())]
+            while stack:
+                kind, net, attack, defender_budget, sell_history, buy_history = stack.pop()
+                children = self._children(kind, net, attack, defender_budget)
+                if kind == ATTACKER and children:
+                    inf_sets.add((ATTACKER, budget, pid, sell_history))
+                elif kind == DEFENDER:
+                    inf_sets.add((DEFENDER, defender_budget, buy_history))
+                for action, child_kind, child_net, child_attack, child_budget in children:
+                    stack.append((child_kind, child_net, child_attack, child_budget,
+                                  sell_history + (action,) if kind != DEFENDER else sell_history,
+                                  buy_history + (action,) if kind != ATTACKER else buy_history))
+        return len(inf_sets)
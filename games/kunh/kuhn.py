@@ -24,8 +24,8 @@ class KuhnRootChanceGameState(GameStateBase):
     def chance_prob(self):
         return self._chance_prob
 
-    def sample_one(self):
-        return random.choice(list(self.children.values()))
+    def sample_one(self, rng=random):
+        return rng.choice(list(self.children.values()))
 
 class KuhnPlayerMoveGameState(GameStateBase):
 
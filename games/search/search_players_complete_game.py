@@ -37,8 +37,8 @@ class SearchCompleteGameRootChanceGameState(GameStateBase):
     def chance_prob(self):
         return self._chance_prob
 
-    def sample_one(self):
-        return random.choice(list(self.children.values()))
+    def sample_one(self, rng=random):
+        return rng.choice(list(self.children.values()))
 
     def evaluation(self):
         raise RuntimeError("trying to evaluate non-terminal node")
@@ -36,8 +36,9 @@ class SearchMainGameRootChanceGameState(GameStateBase):
     def chance_prob(self):
         return self._chance_prob
 
-    def sample_one(self):
-        return random.choice(list(self.children.values()))
+    def sample_one(self, rng=random):
+        actions = list(self.children.keys())
+        return self.children[rng.choices(actions, weights=[self._chance_prob[a] for a in actions])[0]]
 
     def evaluation(self):
         raise RuntimeError("trying to evaluate non-terminal node")
@@ -36,8 +36,8 @@ class SelectorRootChanceGameState(GameStateBase):
     def chance_prob(self):
         return self._chance_prob
 
-    def sample_one(self):
-        return random.choice(list(self.children.values()))
+    def sample_one(self, rng=random):
+        return rng.choice(list(self.children.values()))
 
 
 class SelectorAttackerMoveGameState(SelectorGameStateBase):
@@ -0,0 +1,62 @@
+import numpy
+
+from constants import ATTACKER, DEFENDER
+
+
+def best_response_value(tree, strategy, player):
+    """ Value (in player's own utility) of player's best response against strategy, computed in one
+        bottom-up pass over a CompiledTree. Within a level the counterfactual action values of each of
+        player's information sets are summed over all its nodes, weighted by the opponent and chance reach,
+        so the best action is chosen per information set and not per node.
+    """
+    _check_levels(tree, player)
+    edge = tree.edge_weights(strategy)
+    parents = numpy.maximum(tree.parent, 0)
+    players_edge = tree.player[parents] == player
+    players_edge[0] = False
+    reach_others = tree.path_products(numpy.where(players_edge, 1., edge))
+    tables = tree.tables
+    values = player * tree.utility
+    for d in range(tree.num_levels - 1, 0, -1):
+        start, stop = tree.level(d)
+        parent_start, parent_stop = tree.level(d - 1)
+        level_parents = tree.parent[start:stop]
+        own = players_edge[start:stop]
+        child_values = values[start:stop]
+        sums = numpy.zeros(parent_stop - parent_start)
+        sums += numpy.bincount(level_parents[~own] - parent_start, weights=(edge[start:stop] * child_values)[~own],
+                               minlength=parent_stop - parent_start)
+        if own.any():
+            slots = tree.slot[start:stop][own]
+            inf_sets = tables.owner[slots]
+            action_values = numpy.bincount(slots, weights=reach_others[level_parents[own]] * child_values[own],
+                                           minlength=tables.size)
+            best_values = numpy.full(tables.num_inf_sets, -numpy.inf)
+            numpy.maximum.at(best_values, inf_sets, action_values[slots])
+            # first action reaching the best value of its information set
+            best_slot = numpy.full(tables.num_inf_sets, tables.size)
+            candidates = slots[action_values[slots] == best_values[inf_sets]]
+            numpy.minimum.at(best_slot, tables.owner[candidates], candidates)
+            chosen = own.copy()
+            chosen[own] = slots == best_slot[inf_sets]
+            sums += numpy.bincount(level_parents[chosen] - parent_start, weights=child_values[chosen],
+                                   minlength=parent_stop - parent_start)
+        values[parent_start:parent_stop] = numpy.where(tree.terminal[parent_start:parent_stop],
+                                                       values[parent_start:parent_stop], sums)
+    return values[0]
+
+
+def _check_levels(tree, player):
+    node_levels = numpy.repeat(numpy.arange(tree.num_levels), numpy.diff(tree.level_offsets))
+    own = tree.player == player
+    first = numpy.full(tree.tables.num_inf_sets, tree.num_levels)
+    last = numpy.full(tree.tables.num_inf_sets, -1)
+    numpy.minimum.at(first, tree.inf_set[own], node_levels[own])
+    numpy.maximum.at(last, tree.inf_set[own], node_levels[own])
+    if numpy.any((last >= 0) & (first != last)):
+        raise ValueError('best response needs all nodes of an information set at the same depth')
+
+
+def nash_conv(tree, strategy):
+    """ Sum over both players of what a best response gains against strategy; 0 at a Nash equilibrium """
+    return best_response_value(tree, strategy, ATTACKER) + best_response_value(tree, strategy, DEFENDER)
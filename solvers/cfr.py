@@ -1,19 +1,134 @@
-import datetime
+import time
 
+import numpy
+
+from best_response import nash_conv
+from cfr_checkpoint import save_checkpoint, load_checkpoint
+from cfr_tables import InfoSetTables
+from compiled_tree import CompiledTree
 from constants import ATTACKER, DEFENDER
 from utils import init_sigma, init_empty_node_maps, init_empty_node
 
 
 class CounterfactualRegretMinimizationBase:
 
-    def __init__(self, root, chance_sampling = False):
+    def __init__(self, root, chance_sampling = False, track_imm_regret = True, prune_interval = 0):
         self.root = root
+        self.chance_sampling = chance_sampling
+        # the immediate regret bound costs an extra table update per node; exploitability() is exact
+        self.track_imm_regret = track_imm_regret
+        # regret-based pruning: with prune_interval > 0, actions with negative regret (and so zero probability)
+        # are not traversed, except on every prune_interval-th iteration which visits the whole tree
+        self.prune_interval = prune_interval
+        self.pruning_rates = []
+        self._pruning = False
+        self._actions_pruned = 0
+        self._actions_visited = 0
+        self.iteration = 0
+        self.nodes_touched = 0
+        self.convergence_trace = []
+        self.checkpoint_path = None
+        self._compiled_tree = None
+        self._layout = None
+        self._init_tables(root)
+
+    def _init_tables(self, root):
         self.sigma = init_sigma(root)
         self.cumulative_regrets = init_empty_node_maps(root)
-        self.cumulative_immediate_pos_regret = init_empty_node(root)
+        self.cumulative_immediate_pos_regret = init_empty_node(root) if self.track_imm_regret else None
         self.cumulative_sigma = init_empty_node_maps(root)
         self.nash_equilibrium = init_empty_node_maps(root)
-        self.chance_sampling = chance_sampling
+
+    def _start_iteration(self):
+        self.iteration += 1
+        self._pruning = self.prune_interval > 0 and self.iteration % self.prune_interval != 0
+        self._actions_pruned = 0
+        self._actions_visited = 0
+
+    def _end_iteration(self):
+        if self.prune_interval > 0:
+            total = self._actions_pruned + self._actions_visited
+            self.pruning_rates.append(self._actions_pruned / total if total else 0.)
+        if self.checkpoint_path and self.__checkpoint_due():
+            self.save_checkpoint(self.checkpoint_path)
+
+    def enable_checkpoints(self, path, every_iterations = None, every_seconds = None):
+        """ Saves a checkpoint to path after every every_iterations iterations and/or once every_seconds
+            seconds have passed since the last one """
+        if every_iterations is None and every_seconds is None:
+            raise ValueError('a checkpoint interval is required')
+        self.checkpoint_path = path
+        self.checkpoint_every_iterations = every_iterations
+        self.checkpoint_every_seconds = every_seconds
+        self._last_checkpoint_time = time.monotonic()
+
+    def __checkpoint_due(self):
+        if self.checkpoint_every_iterations and self.iteration % self.checkpoint_every_iterations == 0:
+            return True
+        return self.checkpoint_every_seconds is not None and \
+            time.monotonic() - self._last_checkpoint_time >= self.checkpoint_every_seconds
+
+    def _table_layout(self):
+        # slot layout the dict tables are stored in
+        if self._layout is None:
+            self._layout = InfoSetTables(self.root)
+        return self._layout
+
+    def _checkpoint_arrays(self):
+        tables = self._table_layout()
+        arrays = {'cumulative_regrets': tables.from_dict(self.cumulative_regrets),
+                  'cumulative_sigma': tables.from_dict(self.cumulative_sigma),
+                  'sigma': tables.from_dict(self.sigma)}
+        if self.track_imm_regret:
+            arrays['cumulative_immediate_pos_regret'] = numpy.array(
+                [self.cumulative_immediate_pos_regret.get(i, 0.) for i in tables.inf_sets])
+        return arrays
+
+    def _restore_arrays(self, data):
+        tables = self._table_layout()
+        for name in ['cumulative_regrets', 'cumulative_sigma', 'sigma']:
+            table = getattr(self, name)
+            for inf_set, values in tables.to_dict(data[name]).items():
+                table.setdefault(inf_set, {}).update(values)
+        if self.track_imm_regret and 'cumulative_immediate_pos_regret' in data:
+            for inf_set, regret in zip(tables.inf_sets, data['cumulative_immediate_pos_regret']):
+                if inf_set in self.cumulative_immediate_pos_regret:
+                    self.cumulative_immediate_pos_regret[inf_set] = float(regret)
+
+    def save_checkpoint(self, path):
+        save_checkpoint(path, self._table_layout(), self._checkpoint_arrays(), self.iteration,
+                        self.nodes_touched, type(self).__name__, getattr(self, 'rng', None))
+        self._last_checkpoint_time = time.monotonic()
+
+    def load_checkpoint(self, path):
+        data = load_checkpoint(path, self._table_layout(), type(self).__name__)
+        self._restore_arrays(data)
+        self.iteration = data['iteration']
+        self.nodes_touched = data['nodes_touched']
+        if 'rng_state' in data and hasattr(self, 'rng'):
+            self.rng.setstate(data['rng_state'])
+
+    def cumulative_tables(self):
+        """ Cumulative regrets and strategy sums keyed by information set and action """
+        return self.cumulative_regrets, self.cumulative_sigma
+
+    def warm_start(self, previous, decay = 1.):
+        """ Continues from the cumulative regrets and strategy sums of previous (a solver of a similar game),
+            scaled by decay, for the information sets and actions both games share. The rest start from zero.
+        """
+        tables = self._table_layout()
+        regrets, sigma_sums = previous.cumulative_tables()
+        cumulative_regrets = decay * tables.from_dict(regrets)
+        self._restore_arrays({'cumulative_regrets': cumulative_regrets,
+                              'cumulative_sigma': decay * tables.from_dict(sigma_sums),
+                              'sigma': tables.regret_matching(cumulative_regrets)})
+
+    @classmethod
+    def resume(cls, path, root, **kwargs):
+        """ A solver for root continuing from the checkpoint at path """
+        solver = cls(root, **kwargs)
+        solver.load_checkpoint(path)
+        return solver
 
     def _update_sigma(self, i):
         rgrt_sum = sum(filter(lambda x : x > 0, self.cumulative_regrets[i].values()))
@@ -34,10 +149,12 @@ class CounterfactualRegretMinimizationBase:
             else:
                 self.nash_equilibrium[i] = {a: chance_probs for a in node.actions}
         else:
-            sigma_sum = sum(self.cumulative_sigma[i].values())
-            if(sigma_sum == 0):
-                print(i)
-            self.nash_equilibrium[i] = {a: self.cumulative_sigma[i][a] / sigma_sum for a in node.actions}
+            sigma_sum = sum(self.cumulative_sigma[i].values()) if i in self.cumulative_sigma else 0
+            if sigma_sum == 0:
+                # never reached with positive probability (e.g. not sampled yet)
+                self.nash_equilibrium[i] = {a: 1. / len(node.actions) for a in node.actions}
+            else:
+                self.nash_equilibrium[i] = {a: self.cumulative_sigma[i][a] / sigma_sum for a in node.actions}
         # go to subtrees
         for k in node.children:
             self.__compute_ne_rec(node.children[k])
@@ -60,8 +177,23 @@ class CounterfactualRegretMinimizationBase:
 #        print(y)
 
     def average_total_imm_regret(self, iterations):
+        if not self.track_imm_regret:
+            raise ValueError("immediate regret is not tracked, use exploitability()")
         return sum(self.cumulative_immediate_pos_regret.values())/iterations
 
+    def exploitability(self):
+        """ Exact NashConv of the current average strategy, via best responses on the compiled tree """
+        tree = self._get_compiled_tree()
+        return nash_conv(tree, self._average_strategy(tree.tables))
+
+    def _get_compiled_tree(self):
+        if self._compiled_tree is None:
+            self._compiled_tree = CompiledTree.compile(self.root, keep_nodes=False)
+        return self._compiled_tree
+
+    def _average_strategy(self, tables):
+        return tables.average_strategy(tables.from_dict(self.cumulative_sigma))
+
     def total_positive_regret(self):
         pos_r = 0
         ## sum? look in paper
@@ -72,11 +204,45 @@ class CounterfactualRegretMinimizationBase:
     def run(self, iterations):
         raise NotImplementedError("Please implement run method")
 
+    def _run_iteration(self):
+        raise NotImplementedError("Please implement _run_iteration method")
+
+    def run_with_budget(self, time_limit = None, nodes_limit = None, trace_interval = 0):
+        """ Runs iterations until time_limit seconds or nodes_limit touched nodes are used up, whichever comes
+            first. Every trace_interval iterations, and after the last one, the iteration, elapsed time,
+            nodes touched and exploitability are appended to convergence_trace. Time spent on the
+            exploitability evaluations is not counted against the budget. Returns the number of iterations.
+        """
+        if time_limit is None and nodes_limit is None:
+            raise ValueError('a time or nodes budget is required')
+        elapsed = 0.
+        iterations = 0
+        while (time_limit is None or elapsed < time_limit) and \
+                (nodes_limit is None or self.nodes_touched < nodes_limit):
+            start = time.perf_counter()
+            self._run_iteration()
+            elapsed += time.perf_counter() - start
+            iterations += 1
+            if trace_interval and iterations % trace_interval == 0:
+                self._trace(elapsed)
+        if trace_interval and iterations % trace_interval != 0:
+            self._trace(elapsed)
+        self.iterations = iterations
+        self.elapsed = elapsed
+        return iterations
+
+    def run_with_time_limit(self, time_limit):
+        return self.run_with_budget(time_limit = time_limit)
+
+    def _trace(self, elapsed):
+        self.convergence_trace.append({'iteration': self.iteration, 'time': elapsed,
+                                       'nodes_touched': self.nodes_touched, 'exploitability': self.exploitability()})
+
     def value_of_the_game(self):
         return self.__value_of_the_game_state_recursive(self.root)
 
     def _cfr_utility_recursive(self, state, reach_attacker, reach_defender):
-        children_states_utilities = {}
+        self.nodes_touched += 1
         if state.is_terminal():
             # evaluate terminal node according to the game result
             return state.evaluation()
@@ -98,9 +264,18 @@ class CounterfactualRegretMinimizationBase:
         if state.is_market():
             return self._cfr_utility_recursive(state.play(state.actions[0]), reach_attacker, reach_defender)
 
+        return self._player_utility(state, reach_attacker, reach_defender)
+
+    def _player_utility(self, state, reach_attacker, reach_defender):
+        children_states_utilities = {}
         # sum up all utilities for playing actions in our game state
         value = 0.
         for action in state.actions:
+            if self._pruning and self.sigma[state.inf_set()][action] == 0 and \
+                    self.cumulative_regrets[state.inf_set()][action] < 0:
+                self._actions_pruned += 1
+                continue
+            self._actions_visited += 1
 
             child_reach_attacker = reach_attacker * (self.sigma[state.inf_set()][action] if state.to_move == ATTACKER else 1)
             child_reach_defender = reach_defender * (self.sigma[state.inf_set()][action] if state.to_move == DEFENDER else 1)
@@ -115,15 +290,17 @@ class CounterfactualRegretMinimizationBase:
         #cfr_reach = pi_{-i}^{\sigma}
         (cfr_reach, reach) = (reach_defender, reach_attacker) if state.to_move == ATTACKER else (reach_attacker, reach_defender)
         max_pos_regret = 0
-        for action in state.actions:
+        for action in children_states_utilities:
             # we multiply regret by -1 for player defender, this is because value is computed from player A perspective
             # again we need that perspective switch
             #action_cfr_regret = probabaility_of_reaching_action*(utilities_diff)*sign_value(-1/1 fora attacker or defender)
             action_cfr_regret = state.to_move * cfr_reach * (children_states_utilities[action] - value)
-            max_pos_regret = max(max_pos_regret, action_cfr_regret)
+            if self.track_imm_regret:
+                max_pos_regret = max(max_pos_regret, action_cfr_regret)
             self._cumulate_cfr_regret(state.inf_set(), action, action_cfr_regret)
             self._cumulate_sigma(state.inf_set(), action, reach * self.sigma[state.inf_set()][action])
-        self._cumulate_imm_pos_regret(state.inf_set(), max_pos_regret)
+        if self.track_imm_regret:
+            self._cumulate_imm_pos_regret(state.inf_set(), max_pos_regret)
         if self.chance_sampling:
             # update sigma according to cumulative regrets - we can do it here because we are using chance sampling
             # and so we only visit single game_state from an information set (chance is sampled once)
@@ -144,32 +321,30 @@ class CounterfactualRegretMinimizationBase:
 
 class VanillaCFR(CounterfactualRegretMinimizationBase):
 
-    def __init__(self, root):
-        super().__init__(root = root, chance_sampling = False)
-
-    def run_with_time_limit(self, time_limit):
-        time_elapsed = 0
-        start = datetime.now()
-        iteration = 1
-        while time_elapsed <= time_limit:
-            print('iteration ' + str(iteration))
-            u = self._cfr_utility_recursive(self.root, 1, 1)
-            # since we do not update sigmas in each information set while traversing, we need to
-            # traverse the tree to perform to update it now
-            self.__update_sigma_recursively(self.root)
-            iteration += 1
-            time_elapsed = (datetime.now() - start).seconds
-        self.iterations = iteration
-        return iteration
+    def __init__(self, root, track_imm_regret = True, prune_interval = 0):
+        super().__init__(root = root, chance_sampling = False, track_imm_regret = track_imm_regret,
+                         prune_interval = prune_interval)
 
     def run(self, round = 0, iterations = 1):
         self.iterations = iterations
         for i in range(0, iterations):
-            print('iteration ' + str(round) + '_' + str(i))
-            u = self._cfr_utility_recursive(self.root, 1, 1)
-            # since we do not update sigmas in each information set while traversing, we need to
-            # traverse the tree to perform to update it now
-            self.__update_sigma_recursively(self.root)
+            self._run_iteration()
+            print('iteration ' + str(round) + '_' + str(i) +
+                  (' pruned ' + str(self.pruning_rates[-1]) if self.prune_interval else ''))
+
+    def _run_iteration(self):
+        self._start_iteration()
+        u = self._cfr_utility_recursive(self.root, 1, 1)
+        self._discount()
+        # since we do not update sigmas in each information set while traversing, we need to
+        # traverse the tree to perform to update it now
+        self.__update_sigma_recursively(self.root)
+        self._end_iteration()
+        return u
+
+    def _discount(self):
+        # applied once per iteration, after the regrets of the iteration were accumulated
+        pass
 
     def __update_sigma_recursively(self, node):
         # stop traversal at terminal node
@@ -191,3 +366,151 @@ class ChanceSamplingCFR(CounterfactualRegretMinimizationBase):
     def run(self, iterations = 1):
         for _ in range(0, iterations):
             self._cfr_utility_recursive(self.root, 1, 1)
+
+
+class CFRPlus(VanillaCFR):
+    """ CFR+: cumulative regrets are floored at zero after every iteration and the average strategy weights
+        iteration t by max(t - averaging_delay, 0).
+    """
+
+    def __init__(self, root, averaging_delay = 0, track_imm_regret = True, prune_interval = 0):
+        super().__init__(root = root, track_imm_regret = track_imm_regret, prune_interval = prune_interval)
+        self.averaging_delay = averaging_delay
+
+    def _cumulate_sigma(self, information_set, action, prob):
+        super()._cumulate_sigma(information_set, action, max(self.iteration - self.averaging_delay, 0) * prob)
+
+    def _discount(self):
+        for actions_regret_dict in self.cumulative_regrets.values():
+            for a, regret in actions_regret_dict.items():
+                if regret < 0:
+                    actions_regret_dict[a] = 0.
+
+
+class DiscountedCFR(VanillaCFR):
+    """ Discounted CFR (Brown & Sandholm): after iteration t positive regrets are scaled by t^alpha/(t^alpha + 1),
+        negative regrets by t^beta/(t^beta + 1) and the cumulative strategy by (t/(t + 1))^gamma.
+    """
+
+    def __init__(self, root, alpha = 1.5, beta = 0., gamma = 2., track_imm_regret = True, prune_interval = 0):
+        super().__init__(root = root, track_imm_regret = track_imm_regret, prune_interval = prune_interval)
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+
+    def _discount(self):
+        t = self.iteration
+        pos_discount = t ** self.alpha / (t ** self.alpha + 1)
+        neg_discount = t ** self.beta / (t ** self.beta + 1)
+        sigma_discount = (t / (t + 1)) ** self.gamma
+        for i, actions_regret_dict in self.cumulative_regrets.items():
+            for a, regret in actions_regret_dict.items():
+                actions_regret_dict[a] = regret * (pos_discount if regret > 0 else neg_discount)
+            actions_sigma_dict = self.cumulative_sigma[i]
+            for a in actions_sigma_dict:
+                actions_sigma_dict[a] *= sigma_discount
+
+
+class ArrayVanillaCFR(CounterfactualRegretMinimizationBase):
+    """ VanillaCFR over InfoSetTables: regrets and strategy sums live in flat numpy arrays indexed by
+        information set, and sigma is updated for all information sets at once after every iteration.
+    """
+
+    def __init__(self, root, track_imm_regret = True, prune_interval = 0):
+        super().__init__(root = root, chance_sampling = False, track_imm_regret = track_imm_regret,
+                         prune_interval = prune_interval)
+
+    def _init_tables(self, root):
+        self.tables = InfoSetTables(root)
+        self.nash_equilibrium_table = None
+
+    def run(self, round = 0, iterations = 1):
+        self.iterations = iterations
+        for i in range(0, iterations):
+            self._run_iteration()
+
+    def _run_iteration(self):
+        self._start_iteration()
+        u = self._cfr_utility_recursive(self.root, 1, 1)
+        self.tables.update_sigma()
+        self._end_iteration()
+        return u
+
+    def _player_utility(self, state, reach_attacker, reach_defender):
+        tables = self.tables
+        i = tables.index[state.inf_set()]
+        start, stop = tables.offsets[i], tables.offsets[i + 1]
+        sigma = tables.sigma[start:stop]
+        utilities = numpy.zeros(stop - start)
+        pruned = (sigma == 0) & (tables.cumulative_regrets[start:stop] < 0) if self._pruning else None
+        for k, action in enumerate(state.actions):
+            if pruned is not None and pruned[k]:
+                self._actions_pruned += 1
+                continue
+            self._actions_visited += 1
+            child_reach_attacker = reach_attacker * (sigma[k] if state.to_move == ATTACKER else 1)
+            child_reach_defender = reach_defender * (sigma[k] if state.to_move == DEFENDER else 1)
+            utilities[k] = self._cfr_utility_recursive(state.play(action), child_reach_attacker, child_reach_defender)
+        value = sigma.dot(utilities)
+        if pruned is not None:
+            # no regret update for the pruned actions
+            utilities[pruned] = value
+        (cfr_reach, reach) = (reach_defender, reach_attacker) if state.to_move == ATTACKER else (reach_attacker, reach_defender)
+        regrets = state.to_move * cfr_reach * (utilities - value)
+        tables.cumulative_regrets[start:stop] += regrets
+        tables.cumulative_sigma[start:stop] += reach * sigma
+        if self.track_imm_regret:
+            tables.cumulative_immediate_pos_regret[i] += max(regrets.max(), 0)
+        return value
+
+    def compute_nash_equilibrium(self):
+        self.nash_equilibrium_table = self.tables.average_strategy()
+
+    def value_of_the_game(self):
+        return self.__value_of_the_game_state_recursive(self.root)
+
+    def __value_of_the_game_state_recursive(self, node):
+        if node.is_terminal():
+            value = node.evaluation()
+            node.set_value(value)
+            return value
+        start = self.tables.offsets[self.tables.index[node.inf_set()]]
+        value = 0.
+        for k, action in enumerate(node.actions):
+            value += self.nash_equilibrium_table[start + k] * self.__value_of_the_game_state_recursive(node.play(action))
+        node.set_value(value)
+        return value
+
+    def average_total_imm_regret(self, iterations):
+        if not self.track_imm_regret:
+            raise ValueError("immediate regret is not tracked, use exploitability()")
+        return self.tables.cumulative_immediate_pos_regret.sum()/iterations
+
+    def _table_layout(self):
+        return self.tables
+
+    def cumulative_tables(self):
+        return self.tables.to_dict(self.tables.cumulative_regrets), self.tables.to_dict(self.tables.cumulative_sigma)
+
+    def _checkpoint_arrays(self):
+        arrays = {'cumulative_regrets': self.tables.cumulative_regrets, 'cumulative_sigma': self.tables.cumulative_sigma,
+                  'sigma': self.tables.sigma}
+        if self.track_imm_regret:
+            arrays['cumulative_immediate_pos_regret'] = self.tables.cumulative_immediate_pos_regret
+        return arrays
+
+    def _restore_arrays(self, data):
+        for name in ['cumulative_regrets', 'cumulative_sigma', 'sigma', 'cumulative_immediate_pos_regret']:
+            if name in data:
+                getattr(self.tables, name)[:] = data[name]
+
+    def _average_strategy(self, tables):
+        if tables.inf_sets == self.tables.inf_sets:
+            return self.tables.average_strategy()
+        return tables.average_strategy(tables.from_dict(self.tables.to_dict(self.tables.cumulative_sigma)))
+
+    def total_positive_regret(self):
+        return self.tables.total_positive_regret()
+
+    def export_tables(self):
+        return self.tables.export(self.nash_equilibrium_table)
@@ -0,0 +1,55 @@
+import hashlib
+import os
+
+import numpy
+
+
+def layout_digest(tables):
+    """ Fingerprint of the information set keys and their action lists, in table order """
+    digest = hashlib.sha256()
+    for inf_set, actions in zip(tables.inf_sets, tables.actions):
+        digest.update(repr(inf_set).encode())
+        digest.update(repr(actions).encode())
+    return digest.hexdigest()
+
+
+def save_checkpoint(path, tables, arrays, iteration, nodes_touched, solver_name, rng=None):
+    """ Writes the solver state to path (a compressed .npz) through a temporary file, so a crash while writing
+        leaves the previous checkpoint intact. arrays maps names to arrays in the slot layout of tables.
+    """
+    data = dict(arrays)
+    data['layout'] = numpy.array(layout_digest(tables))
+    data['solver'] = numpy.array(solver_name)
+    data['iteration'] = numpy.array(iteration, dtype=numpy.int64)
+    data['nodes_touched'] = numpy.array(nodes_touched, dtype=numpy.int64)
+    if rng is not None:
+        version, internal_state, gauss_next = rng.getstate()
+        data['rng_version'] = numpy.array(version, dtype=numpy.int64)
+        data['rng_state'] = numpy.array(internal_state, dtype=numpy.int64)
+        data['rng_gauss_next'] = numpy.array(numpy.nan if gauss_next is None else gauss_next)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        numpy.savez_compressed(f, **data)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, tables, solver_name):
+    """ Reads a checkpoint written by save_checkpoint and checks it was written by the same solver class
+        for the same information set layout. Returns a dict of the stored values.
+    """
+    with numpy.load(path) as f:
+        data = {k: f[k] for k in f.files}
+    if str(data['solver']) != solver_name:
+        raise ValueError('checkpoint was written by {0}, not {1}'.format(data['solver'], solver_name))
+    if str(data['layout']) != layout_digest(tables):
+        raise ValueError('checkpoint information sets do not match the game tree')
+    for name in ['cumulative_regrets', 'cumulative_sigma', 'sigma']:
+        if data[name].shape != (tables.size,):
+            raise ValueError('checkpoint table {0} has the wrong size'.format(name))
+    data['iteration'] = int(data['iteration'])
+    data['nodes_touched'] = int(data['nodes_touched'])
+    if 'rng_state' in data:
+        gauss_next = float(data['rng_gauss_next'])
+        data['rng_state'] = (int(data['rng_version']), tuple(int(x) for x in data['rng_state']),
+                             None if numpy.isnan(gauss_next) else gauss_next)
+    return data
@@ -0,0 +1,119 @@
+import numpy
+
+
+class InfoSetTables:
+    """ Dense storage for the CFR tables: every information set gets an integer index and its actions
+        occupy the slots offsets[i]:offsets[i+1] of flat regret / strategy arrays.
+    """
+
+    def __init__(self, root):
+        self.index = {}
+        self.inf_sets = []
+        self.actions = []
+        is_chance = []
+        chance_probs = []
+        self.__index_tree(root, is_chance, chance_probs)
+        self._init_arrays(is_chance, chance_probs)
+
+    @classmethod
+    def from_layout(cls, inf_sets, actions, is_chance, chance_probs):
+        tables = cls.__new__(cls)
+        tables.inf_sets = list(inf_sets)
+        tables.index = {inf_set: i for i, inf_set in enumerate(tables.inf_sets)}
+        tables.actions = [list(a) for a in actions]
+        tables._init_arrays(is_chance, chance_probs)
+        return tables
+
+    def _init_arrays(self, is_chance, chance_probs):
+        self.offsets = numpy.zeros(len(self.inf_sets) + 1, dtype=numpy.int64)
+        numpy.cumsum([len(a) for a in self.actions], out=self.offsets[1:])
+        self.lengths = numpy.diff(self.offsets)
+        self.is_chance = numpy.array(is_chance, dtype=bool)
+        self.num_inf_sets = len(self.inf_sets)
+        self.size = int(self.offsets[-1])
+        # infoset index of every action slot
+        self.owner = numpy.repeat(numpy.arange(self.num_inf_sets), self.lengths)
+        self.chance_probs = numpy.array(chance_probs, dtype=numpy.float64)
+        self.sigma = 1. / self.lengths[self.owner]
+        self.cumulative_regrets = numpy.zeros(self.size)
+        self.cumulative_sigma = numpy.zeros(self.size)
+        self.cumulative_immediate_pos_regret = numpy.zeros(self.num_inf_sets)
+
+    def __index_tree(self, root, is_chance, chance_probs):
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            i = node.inf_set()
+            if i not in self.index:
+                self.index[i] = len(self.inf_sets)
+                self.inf_sets.append(i)
+                actions = list(node.actions)
+                self.actions.append(actions)
+                chance = node.is_chance() or node.is_market()
+                is_chance.append(chance)
+                if chance and actions:
+                    probs = node.chance_prob()
+                    chance_probs.extend([probs[a] for a in actions] if isinstance(probs, dict) else
+                                        [probs] * len(actions))
+                else:
+                    chance_probs.extend([0.] * len(actions))
+            stack.extend(node.children.values())
+
+    def slots(self, inf_set):
+        i = self.index[inf_set]
+        return self.offsets[i], self.offsets[i + 1]
+
+    def action_slot(self, inf_set, action):
+        i = self.index[inf_set]
+        return self.offsets[i] + self.actions[i].index(action)
+
+    def __segment_sums(self, values):
+        return numpy.bincount(self.owner, weights=values, minlength=self.num_inf_sets)
+
+    def regret_matching(self, regrets):
+        pos_regrets = numpy.maximum(regrets, 0.)
+        sums = self.__segment_sums(pos_regrets)[self.owner]
+        return numpy.where(sums > 0, pos_regrets / numpy.where(sums > 0, sums, 1.), 1. / self.lengths[self.owner])
+
+    def update_sigma(self):
+        self.sigma = self.regret_matching(self.cumulative_regrets)
+
+    def update_inf_set_sigma(self, i):
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        pos_regrets = numpy.maximum(self.cumulative_regrets[start:stop], 0.)
+        rgrt_sum = pos_regrets.sum()
+        self.sigma[start:stop] = pos_regrets / rgrt_sum if rgrt_sum > 0 else 1. / (stop - start)
+
+    def average_strategy(self, cumulative_sigma=None):
+        if cumulative_sigma is None:
+            cumulative_sigma = self.cumulative_sigma
+        sums = self.__segment_sums(cumulative_sigma)[self.owner]
+        average = numpy.where(sums > 0, cumulative_sigma / numpy.where(sums > 0, sums, 1.),
+                              1. / self.lengths[self.owner])
+        return numpy.where(self.is_chance[self.owner], self.chance_probs, average)
+
+    def total_positive_regret(self):
+        return numpy.maximum(self.cumulative_regrets, 0.).sum()
+
+    def from_dict(self, values_dict):
+        values = numpy.zeros(self.size)
+        for i, inf_set in enumerate(self.inf_sets):
+            if inf_set in values_dict:
+                actions_dict = values_dict[inf_set]
+                for k, a in enumerate(self.actions[i]):
+                    values[self.offsets[i] + k] = actions_dict.get(a, 0.)
+        return values
+
+    def to_dict(self, values):
+        return {inf_set: {a: float(values[self.offsets[i] + k]) for k, a in enumerate(self.actions[i])}
+                for i, inf_set in enumerate(self.inf_sets)}
+
+    def export(self, nash_equilibrium=None):
+        tables = {'sigma': self.to_dict(self.sigma),
+                  'cumulative_regrets': self.to_dict(self.cumulative_regrets),
+                  'cumulative_sigma': self.to_dict(self.cumulative_sigma),
+                  'cumulative_immediate_pos_regret': {inf_set: float(self.cumulative_immediate_pos_regret[i])
+                                                      for i, inf_set in enumerate(self.inf_sets)}}
+        if nash_equilibrium is not None:
+            tables['nash_equilibrium'] = self.to_dict(nash_equilibrium)
+        return tables
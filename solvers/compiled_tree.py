@@ -0,0 +1,248 @@
+import json
+import os
+
+import numpy
+
+from cfr_tables import InfoSetTables
+
+NODE_ARRAYS = ['parent', 'player', 'terminal', 'inf_set', 'slot', 'chance_prob', 'utility', 'level_offsets']
+FORMAT_VERSION = 1
+
+
+def _encode_keys(keys):
+    """ Information set keys or action labels as arrays: ints as they are, strings as one utf-8 blob with
+        offsets """
+    if all(isinstance(k, (int, numpy.integer)) and not isinstance(k, bool) for k in keys):
+        return 'int', {'values': numpy.array(keys, dtype=numpy.int64)}
+    if all(isinstance(k, str) for k in keys):
+        encoded = [k.encode('utf-8') for k in keys]
+        offsets = numpy.zeros(len(encoded) + 1, dtype=numpy.int64)
+        numpy.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return 'str', {'blob': numpy.frombuffer(b''.join(encoded), dtype=numpy.uint8), 'offsets': offsets}
+    raise ValueError('only int or str information sets and actions can be saved')
+
+
+def _decode_keys(kind, arrays):
+    if kind == 'int':
+        return [int(k) for k in arrays['values']]
+    blob = arrays['blob'].tobytes()
+    offsets = arrays['offsets']
+    return [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+
+class CompiledTree:
+    """ A GameStateBase tree flattened into parallel node arrays in breadth first (topological) order.
+        Nodes of depth d occupy level_offsets[d]:level_offsets[d+1], so every parent precedes its children.
+        slot[n] is the InfoSetTables slot of the action leading to n, and chance_prob[n] the probability of
+        that action when the parent is a chance or market node.
+    """
+
+    def __init__(self, parent, player, terminal, inf_set, slot, chance_prob, utility, level_offsets, tables,
+                 nodes=None):
+        self.parent = parent
+        self.player = player
+        self.terminal = terminal
+        self.inf_set = inf_set
+        self.slot = slot
+        self.chance_prob = chance_prob
+        self.utility = utility
+        self.level_offsets = level_offsets
+        self.tables = tables
+        self.nodes = nodes
+        self.num_nodes = len(parent)
+        self.num_levels = len(level_offsets) - 1
+        non_root = numpy.arange(1, self.num_nodes)
+        parent_player = player[parent[non_root]]
+        # edges leaving attacker / defender nodes, the rest are chance (or market) edges
+        self.player_edges = non_root[parent_player != 0]
+        self.chance_edges = non_root[parent_player == 0]
+
+    @classmethod
+    def compile(cls, root, keep_nodes=True):
+        tables = InfoSetTables(root)
+        nodes = [root]
+        parent = [-1]
+        slot = [-1]
+        chance_prob = [1.]
+        level_offsets = [0, 1]
+        level_start = 0
+        while level_start < len(nodes):
+            level_end = len(nodes)
+            for n in range(level_start, level_end):
+                node = nodes[n]
+                if node.is_terminal():
+                    continue
+                start = tables.offsets[tables.index[node.inf_set()]]
+                if node.is_market():
+                    actions = node.actions[:1]
+                    probs = [1.]
+                elif node.is_chance():
+                    actions = node.actions
+                    p = node.chance_prob()
+                    probs = [p[a] for a in actions] if isinstance(p, dict) else [p] * len(actions)
+                else:
+                    actions = node.actions
+                    probs = [1.] * len(actions)
+                for k, action in enumerate(actions):
+                    nodes.append(node.play(action))
+                    parent.append(n)
+                    slot.append(start + k)
+                    chance_prob.append(probs[k])
+            level_start = level_end
+            if len(nodes) > level_end:
+                level_offsets.append(len(nodes))
+
+        player = numpy.zeros(len(nodes), dtype=numpy.int8)
+        terminal = numpy.zeros(len(nodes), dtype=bool)
+        inf_set = numpy.zeros(len(nodes), dtype=numpy.int64)
+        utility = numpy.zeros(len(nodes))
+        for n, node in enumerate(nodes):
+            inf_set[n] = tables.index[node.inf_set()]
+            if node.is_terminal():
+                terminal[n] = True
+                utility[n] = node.evaluation()
+            elif not (node.is_chance() or node.is_market()):
+                player[n] = node.to_move
+
+        return cls(parent=numpy.array(parent, dtype=numpy.int64), player=player, terminal=terminal,
+                   inf_set=inf_set, slot=numpy.array(slot, dtype=numpy.int64),
+                   chance_prob=numpy.array(chance_prob), utility=utility,
+                   level_offsets=numpy.array(level_offsets, dtype=numpy.int64), tables=tables,
+                   nodes=nodes if keep_nodes else None)
+
+    @classmethod
+    def stitch(cls, root, subtrees):
+        """ The tree of the chance node root from the compiled subtrees of its children, one per root.actions
+            in that order. Information sets are matched by key across the subtrees, the result is the same tree
+            compile(root) gives, up to the order of the information sets. """
+        chance_probs = root.chance_prob()
+        root_probs = [chance_probs[a] if isinstance(chance_probs, dict) else chance_probs for a in root.actions]
+        index = {root.inf_set(): 0}
+        inf_sets = [root.inf_set()]
+        actions = [list(root.actions)]
+        is_chance = [True]
+        slot_probs = [list(root_probs)]
+        inf_set_maps = []
+        for subtree in subtrees:
+            local = subtree.tables
+            inf_set_map = numpy.zeros(local.num_inf_sets, dtype=numpy.int64)
+            for i, key in enumerate(local.inf_sets):
+                if key not in index:
+                    index[key] = len(inf_sets)
+                    inf_sets.append(key)
+                    actions.append(local.actions[i])
+                    is_chance.append(local.is_chance[i])
+                    slot_probs.append(local.chance_probs[local.offsets[i]:local.offsets[i + 1]])
+                inf_set_map[i] = index[key]
+            inf_set_maps.append(inf_set_map)
+        tables = InfoSetTables.from_layout(inf_sets, actions, is_chance, numpy.concatenate(slot_probs))
+
+        # level d of the tree is level d-1 of every subtree, in the order of the root's actions
+        num_levels = 1 + max(subtree.num_levels for subtree in subtrees)
+        level_sizes = numpy.zeros((len(subtrees), num_levels), dtype=numpy.int64)
+        for k, subtree in enumerate(subtrees):
+            level_sizes[k, 1:subtree.num_levels + 1] = numpy.diff(subtree.level_offsets)
+        level_offsets = numpy.zeros(num_levels + 1, dtype=numpy.int64)
+        level_offsets[1] = 1
+        numpy.cumsum(level_sizes.sum(axis=0)[1:], out=level_offsets[2:])
+        level_offsets[2:] += 1
+        level_starts = level_offsets[:-1] + numpy.cumsum(level_sizes, axis=0) - level_sizes
+
+        num_nodes = int(level_offsets[-1])
+        parent = numpy.full(num_nodes, -1, dtype=numpy.int64)
+        player = numpy.zeros(num_nodes, dtype=numpy.int8)
+        terminal = numpy.zeros(num_nodes, dtype=bool)
+        inf_set = numpy.zeros(num_nodes, dtype=numpy.int64)
+        slot = numpy.full(num_nodes, -1, dtype=numpy.int64)
+        chance_prob = numpy.ones(num_nodes)
+        utility = numpy.zeros(num_nodes)
+        for k, subtree in enumerate(subtrees):
+            local = subtree.tables
+            depth = numpy.repeat(numpy.arange(subtree.num_levels), numpy.diff(subtree.level_offsets))
+            position = level_starts[k, depth + 1] + numpy.arange(subtree.num_nodes) - subtree.level_offsets[depth]
+            parent[position] = numpy.where(subtree.parent >= 0, position[numpy.maximum(subtree.parent, 0)], 0)
+            player[position] = subtree.player
+            terminal[position] = subtree.terminal
+            inf_set[position] = inf_set_maps[k][subtree.inf_set]
+            utility[position] = subtree.utility
+            # the subtree's root is reached by the root's action k, its other nodes by their own slots
+            slot[position[0]] = k
+            chance_prob[position[0]] = root_probs[k]
+            local_slot = subtree.slot[1:]
+            owner = local.owner[local_slot]
+            slot[position[1:]] = tables.offsets[inf_set_maps[k][owner]] + local_slot - local.offsets[owner]
+            chance_prob[position[1:]] = subtree.chance_prob[1:]
+        return cls(parent=parent, player=player, terminal=terminal, inf_set=inf_set, slot=slot,
+                   chance_prob=chance_prob, utility=utility, level_offsets=level_offsets, tables=tables)
+
+    def save(self, path):
+        """ Writes the tree to the directory path, one .npy file per node array plus the information set
+            and action tables, so load() can memory-map it """
+        os.makedirs(path, exist_ok=True)
+        tables = self.tables
+        arrays = {name: getattr(self, name) for name in NODE_ARRAYS}
+        arrays.update({'is_chance': tables.is_chance, 'chance_probs': tables.chance_probs,
+                       'slot_offsets': tables.offsets})
+        inf_set_kind, inf_set_arrays = _encode_keys(tables.inf_sets)
+        action_kind, action_arrays = _encode_keys([a for actions in tables.actions for a in actions])
+        arrays.update({'inf_set_' + k: v for k, v in inf_set_arrays.items()})
+        arrays.update({'action_label_' + k: v for k, v in action_arrays.items()})
+        for name, array in arrays.items():
+            numpy.save(os.path.join(path, name + '.npy'), array)
+        with open(os.path.join(path, 'layout.json'), 'w') as f:
+            json.dump({'version': FORMAT_VERSION, 'num_nodes': self.num_nodes, 'inf_set_kind': inf_set_kind,
+                       'action_kind': action_kind}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """ A tree written by save(). With mmap the node arrays are read-only memory maps of the files; only
+            the information set and action tables are read into Python objects. """
+        with open(os.path.join(path, 'layout.json')) as f:
+            layout = json.load(f)
+        if layout['version'] != FORMAT_VERSION:
+            raise ValueError('unsupported compiled tree format {0}'.format(layout['version']))
+
+        def read(name):
+            return numpy.load(os.path.join(path, name + '.npy'), mmap_mode='r' if mmap else None)
+
+        def read_keys(prefix, kind):
+            names = ['values'] if kind == 'int' else ['blob', 'offsets']
+            return _decode_keys(kind, {name: read(prefix + name) for name in names})
+
+        slot_offsets = read('slot_offsets')
+        labels = read_keys('action_label_', layout['action_kind'])
+        actions = [labels[slot_offsets[i]:slot_offsets[i + 1]] for i in range(len(slot_offsets) - 1)]
+        tables = InfoSetTables.from_layout(read_keys('inf_set_', layout['inf_set_kind']), actions,
+                                           read('is_chance'), read('chance_probs'))
+        return cls(tables=tables, **{name: read(name) for name in NODE_ARRAYS})
+
+    def level(self, d):
+        return self.level_offsets[d], self.level_offsets[d + 1]
+
+    def edge_weights(self, strategy):
+        weights = self.chance_prob.copy()
+        weights[self.player_edges] = strategy[self.slot[self.player_edges]]
+        return weights
+
+    def reach_probabilities(self, edge, player):
+        """ Product of the given player's action probabilities (edge weights) along the path to every node """
+        return self.path_products(numpy.where(self.player[numpy.maximum(self.parent, 0)] == player, edge, 1.))
+
+    def path_products(self, factor):
+        products = numpy.ones(self.num_nodes)
+        for d in range(1, self.num_levels):
+            start, stop = self.level(d)
+            products[start:stop] = products[self.parent[start:stop]] * factor[start:stop]
+        return products
+
+    def values(self, edge):
+        """ Expected utility of every node's subtree when every edge is taken with the given weight """
+        values = self.utility.copy()
+        for d in range(self.num_levels - 1, 0, -1):
+            start, stop = self.level(d)
+            parent_start, parent_stop = self.level(d - 1)
+            sums = numpy.bincount(self.parent[start:stop] - parent_start, weights=edge[start:stop] * values[start:stop],
+                                  minlength=parent_stop - parent_start)
+            values[parent_start:parent_stop] = numpy.where(self.terminal[parent_start:parent_stop],
+                                                           values[parent_start:parent_stop], sums)
+        return values
@@ -0,0 +1,130 @@
+import random
+
+from cfr import CounterfactualRegretMinimizationBase
+from constants import ATTACKER, DEFENDER
+
+
+class MonteCarloCFRBase(CounterfactualRegretMinimizationBase):
+    """ Common part of the sampling CFR solvers. Chance outcomes are drawn through the chance nodes'
+        sample_one(rng) hook, player actions from the solver's own seeded random.Random.
+    """
+
+    def __init__(self, root, seed = None):
+        super().__init__(root = root, chance_sampling = False, track_imm_regret = False)
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    def _init_tables(self, root):
+        # filled on the first visit of each information set, so the tree is never traversed as a whole
+        self.sigma = {}
+        self.cumulative_regrets = {}
+        self.cumulative_immediate_pos_regret = None
+        self.cumulative_sigma = {}
+        self.nash_equilibrium = {}
+
+    def run(self, round = 0, iterations = 1):
+        self.iterations = iterations
+        for i in range(0, iterations):
+            self._run_iteration()
+
+    def _run_iteration(self):
+        self._start_iteration()
+        for player in [ATTACKER, DEFENDER]:
+            self._traverse(self.root, player)
+        self._end_iteration()
+
+    def _traverse(self, state, player):
+        raise NotImplementedError("Please implement _traverse method")
+
+    def _current_strategy(self, state):
+        information_set = state.inf_set()
+        if information_set not in self.cumulative_regrets:
+            self.cumulative_regrets[information_set] = {a: 0. for a in state.actions}
+            self.cumulative_sigma[information_set] = {a: 0. for a in state.actions}
+            self.sigma[information_set] = {}
+        self._update_sigma(information_set)
+        return self.sigma[information_set]
+
+    def _sample_action(self, actions, probs):
+        r = self.rng.random()
+        cumulative = 0.
+        for action in actions:
+            cumulative += probs[action]
+            if r < cumulative:
+                return action
+        return actions[-1]
+
+    def _sample_chance(self, state):
+        if state.is_market():
+            return state.play(state.actions[0])
+        return state.sample_one(self.rng)
+
+
+class ExternalSamplingMCCFR(MonteCarloCFRBase):
+    """ External sampling: the traversing player's actions are all explored, chance and opponent actions are
+        sampled once per visit. The opponent's average strategy is accumulated where it is sampled.
+    """
+
+    def _traverse(self, state, player):
+        self.nodes_touched += 1
+        if state.is_terminal():
+            return player * state.evaluation()
+        if state.is_chance() or state.is_market():
+            return self._traverse(self._sample_chance(state), player)
+
+        i = state.inf_set()
+        sigma = self._current_strategy(state)
+        if state.to_move != player:
+            for action in state.actions:
+                self._cumulate_sigma(i, action, sigma[action])
+            return self._traverse(state.play(self._sample_action(state.actions, sigma)), player)
+
+        utilities = {action: self._traverse(state.play(action), player) for action in state.actions}
+        value = sum([sigma[action] * utilities[action] for action in state.actions])
+        for action in state.actions:
+            self._cumulate_cfr_regret(i, action, utilities[action] - value)
+        return value
+
+
+class OutcomeSamplingMCCFR(MonteCarloCFRBase):
+    """ Outcome sampling: a single terminal history is sampled per traversal, the traversing player's actions
+        with epsilon exploration, and regrets are importance weighted by the sampling probability.
+    """
+
+    def __init__(self, root, seed = None, exploration = 0.6):
+        super().__init__(root = root, seed = seed)
+        self.exploration = exploration
+
+    def _traverse(self, state, player, reach_opponent = 1., sample_prob = 1.):
+        self.nodes_touched += 1
+        if state.is_terminal():
+            return player * state.evaluation() / sample_prob, 1.
+        if state.is_chance() or state.is_market():
+            # chance is sampled on policy so it cancels out of the importance weights
+            return self._traverse(self._sample_chance(state), player, reach_opponent, sample_prob)
+
+        i = state.inf_set()
+        sigma = self._current_strategy(state)
+        num_actions = len(state.actions)
+        if state.to_move == player:
+            sample_probs = {a: self.exploration / num_actions + (1 - self.exploration) * sigma[a]
+                            for a in state.actions}
+        else:
+            sample_probs = sigma
+        action = self._sample_action(state.actions, sample_probs)
+        if state.to_move == player:
+            utility, tail_prob = self._traverse(state.play(action), player, reach_opponent,
+                                                sample_prob * sample_probs[action])
+            weighted_utility = utility * reach_opponent
+            for a in state.actions:
+                if a == action:
+                    regret = weighted_utility * tail_prob * (1 - sigma[action])
+                else:
+                    regret = -weighted_utility * tail_prob * sigma[action]
+                self._cumulate_cfr_regret(i, a, regret)
+        else:
+            utility, tail_prob = self._traverse(state.play(action), player, reach_opponent * sigma[action],
+                                                sample_prob * sample_probs[action])
+            for a in state.actions:
+                self._cumulate_sigma(i, a, reach_opponent * sigma[a] / sample_prob)
+        return utility, tail_prob * sigma[action]
@@ -1,5 +1,3 @@
-import copy
-
 from AssetFundNetwork import AssetFundsNetwork
 from constants import ATTACKER, DEFENDER, MARKET
 
@@ -62,9 +60,9 @@ def minimax2(actions_mgr, turn, network: AssetFundsNetwork, attacker_budget, def
         i = -1
         for (order_set, cost) in attacks:
             i+=1
-            net2 = copy.deepcopy(network)
-            net2.submit_sell_orders(order_set)
-            child_result= minimax2(actions_mgr, MARKET,net2,attacker_budget - cost, defender_budget)
+            network.apply(sell_orders=order_set)
+            child_result= minimax2(actions_mgr, MARKET,network,attacker_budget - cost, defender_budget)
+            network.undo()
             node.add_child(str(order_set), child_result.tree)
             total_cost = child_result.attacker_cost + cost
             if not best_result or child_result.value < best_result.value or (child_result.value == best_result.value and
@@ -77,9 +75,9 @@ def minimax2(actions_mgr, turn, network: AssetFundsNetwork, attacker_budget, def
     elif turn == DEFENDER:
         actions = actions_mgr.get_possible_defenses(network, defender_budget)
         for (order_set, cost) in actions:
-            net2 = copy.deepcopy(network)
-            net2.submit_buy_orders(order_set)
-            child_result = minimax2(actions_mgr, MARKET,net2,attacker_budget, defender_budget - cost)
+            network.apply(buy_orders=order_set)
+            child_result = minimax2(actions_mgr, MARKET,network,attacker_budget, defender_budget - cost)
+            network.undo()
             node.add_child(str(order_set), child_result.tree)
             total_cost = child_result.defender_cost + cost
             if not best_result or child_result.value > best_result.value  or (child_result.value == best_result.value and
@@ -91,16 +89,18 @@ def minimax2(actions_mgr, turn, network: AssetFundsNetwork, attacker_budget, def
 
         return best_result
     else: #MARKET
-        net2 = copy.deepcopy(network)
-        net2.simulate_trade()
-        funds = net2.get_funds_in_margin_calls()
-        if net2.no_more_sell_orders():
+        network.apply(trade=True)
+        funds = network.get_funds_in_margin_calls()
+        if network.no_more_sell_orders():
+            final_network = network.copy()
+            network.undo()
             return Result(funds=funds, node=node, order_set=['MARKET'],
-                                     future_actions=[], network=net2,
+                                     future_actions=[], network=final_network,
                                      attacker_cost=0,
                                      defender_cost=0)
 
-        child_result  = minimax2(actions_mgr, DEFENDER,net2,attacker_budget, defender_budget)
+        child_result  = minimax2(actions_mgr, DEFENDER,network,attacker_budget, defender_budget)
+        network.undo()
         node.add_child('MARKET', child_result.tree)
         return Result(funds=child_result.funds,node=node, order_set=['MARKET'],
                                      future_actions=child_result.actions, network=child_result.network,
@@ -123,9 +123,9 @@ def alphabeta(actions_mgr, turn, network: AssetFundsNetwork, attacker_budget, de
         i = -1
         for (order_set,cost) in attacks:
             i += 1
-            net2 = copy.deepcopy(network)
-            net2.submit_sell_orders(order_set)
-            child_result = alphabeta(actions_mgr, MARKET, net2, attacker_budget - cost, defender_budget, alpha, beta)
+            network.apply(sell_orders=order_set)
+            child_result = alphabeta(actions_mgr, MARKET, network, attacker_budget - cost, defender_budget, alpha, beta)
+            network.undo()
             node.add_child(str(order_set), child_result.tree)
             total_cost = child_result.attacker_cost + cost
             if child_result.value < beta[0] or (child_result.value == beta[0] and total_cost < beta[1]):
@@ -145,9 +145,9 @@ def alphabeta(actions_mgr, turn, network: AssetFundsNetwork, attacker_budget, de
         # else:
         actions = actions_mgr.get_possible_defenses(network, defender_budget)
         for (order_set, cost) in actions:
-            net2 = copy.deepcopy(network)
-            net2.submit_buy_orders(order_set)
-            child_result = alphabeta(actions_mgr, MARKET, net2, attacker_budget, defender_budget - cost, alpha, beta)
+            network.apply(buy_orders=order_set)
+            child_result = alphabeta(actions_mgr, MARKET, network, attacker_budget, defender_budget - cost, alpha, beta)
+            network.undo()
             node.add_child(str(order_set), child_result.tree)
             total_cost = child_result.defender_cost + cost
             if child_result.value >= alpha[0]:
@@ -165,16 +165,18 @@ def alphabeta(actions_mgr, turn, network: AssetFundsNetwork, attacker_budget, de
 
         return best_result
     else:  # MARKET
-        net2 = copy.deepcopy(network)
-        net2.simulate_trade()
-        funds = net2.get_funds_in_margin_calls()
-        if net2.no_more_sell_orders():
+        network.apply(trade=True)
+        funds = network.get_funds_in_margin_calls()
+        if network.no_more_sell_orders():
+            final_network = network.copy()
+            network.undo()
             return Result(funds=funds, node=node, order_set=['MARKET'],
-                          future_actions=[], network=net2,
+                          future_actions=[], network=final_network,
                           attacker_cost=0,
                           defender_cost=0)
 
-        child_result = alphabeta(actions_mgr, DEFENDER, net2, attacker_budget, defender_budget, alpha, beta)
+        child_result = alphabeta(actions_mgr, DEFENDER, network, attacker_budget, defender_budget, alpha, beta)
+        network.undo()
         node.add_child('MARKET', child_result.tree)
         return Result(funds=child_result.funds, node=node, order_set=['MARKET'],
                       future_actions=child_result.actions, network=child_result.network,
@@ -189,9 +191,9 @@ def minimax(actions_mgr, turn, network: AssetFundsNetwork, attacker_budget, defe
 #        actions = get_possible_attacks(network, attacker_budget,root_attacker)
         #value = inf
         for (order_set, cost) in attacks:
-            net2 = copy.deepcopy(network)
-            net2.submit_sell_orders(order_set)
-            child_result= minimax(actions_mgr, MARKET,net2,attacker_budget - cost, defender_budget)
+            network.apply(sell_orders=order_set)
+            child_result= minimax(actions_mgr, MARKET,network,attacker_budget - cost, defender_budget)
+            network.undo()
             node.add_child(str(order_set), child_result.tree)
             total_cost = child_result.attacker_cost+cost
             if not best_result or child_result.value < best_result.value or (child_result.value == best_result.value and
@@ -202,15 +204,16 @@ def minimax(actions_mgr, turn, network: AssetFundsNetwork, attacker_budget, defe
                                      defender_cost = child_result.defender_cost)
         return best_result
     elif turn == DEFENDER:
-        net2 = copy.deepcopy(network)
-        net2.simulate_trade()
-        if not net2.count_margin_calls() ==0:
+        network.apply(trade=True)
+        margin_calls = network.count_margin_calls()
+        network.undo()
+        if not margin_calls ==0:
             #actions = get_possible_defenses(network, defender_budget)
             actions = actions_mgr.get_possible_defenses(network, defender_budget)
         for (order_set, cost) in actions:
-            net2 = copy.deepcopy(network)
-            net2.submit_buy_orders(order_set)
-            child_result = minimax(actions_mgr, ATTACKER,net2,attacker_budget, defender_budget - cost)
+            network.apply(buy_orders=order_set)
+            child_result = minimax(actions_mgr, ATTACKER,network,attacker_budget, defender_budget - cost)
+            network.undo()
             node.add_child(str(order_set), child_result.tree)
             total_cost = child_result.defender_cost + cost
             if not best_result or child_result.value > best_result.value or (child_result.value == best_result.value and
@@ -222,18 +225,37 @@ def minimax(actions_mgr, turn, network: AssetFundsNetwork, attacker_budget, defe
 
         return best_result
     else: #MARKET
-        net2 = copy.deepcopy(network)
-        net2.simulate_trade()
-        funds = net2.get_funds_in_margin_calls()
-        if len(funds) or net2.no_more_sell_orders():
+        network.apply(trade=True)
+        funds = network.get_funds_in_margin_calls()
+        if len(funds) or network.no_more_sell_orders():
+            final_network = network.copy()
+            network.undo()
             return Result(funds=funds, node=node, order_set=['MARKET'],
-                                     future_actions=[], network=net2,
+                                     future_actions=[], network=final_network,
                                      attacker_cost=0,
                                      defender_cost=0)
-        child_result  = minimax(actions_mgr, DEFENDER,net2,attacker_budget, defender_budget)
+        child_result  = minimax(actions_mgr, DEFENDER,network,attacker_budget, defender_budget)
+        network.undo()
         node.add_child('MARKET', child_result.tree)
         return Result(funds=child_result.funds,node=node, order_set=['MARKET'],
                                      future_actions=child_result.actions, network=child_result.network,
                       attacker_cost=child_result.attacker_cost, defender_cost=child_result.defender_cost)
 
 
+
+
+def game_state_minimax(state):
+    """ Minimax value of a game state tree: the attacker minimizes, the defender maximizes and chance nodes
+        are averaged. Children are only reached through play, so a lazily expanded tree is built one path at a
+        time and, with eviction, is never held in memory as a whole.
+    """
+    if state.is_terminal():
+        return state.evaluation()
+    if state.is_market():
+        return game_state_minimax(state.play(state.actions[0]))
+    if state.is_chance():
+        probs = state.chance_prob()
+        return sum([(probs[a] if isinstance(probs, dict) else probs) * game_state_minimax(state.play(a))
+                    for a in state.actions])
+    values = [game_state_minimax(state.play(a)) for a in state.actions]
+    return min(values) if state.to_move == ATTACKER else max(values)
@@ -0,0 +1,103 @@
+import contextlib
+import multiprocessing
+import os
+
+import numpy
+
+from cfr import ArrayVanillaCFR
+
+# solver the worker processes traverse, inherited through fork so the game tree is never pickled
+_solver = None
+
+
+def _traverse_children(task):
+    actions, sigma = task
+    solver = _solver
+    tables = solver.tables
+    tables.sigma = sigma
+    tables.cumulative_regrets = numpy.zeros(tables.size)
+    tables.cumulative_sigma = numpy.zeros(tables.size)
+    tables.cumulative_immediate_pos_regret = numpy.zeros(tables.num_inf_sets)
+    solver.nodes_touched = 0
+    utilities = [solver._cfr_utility_recursive(solver.root.play(action), 1, 1) for action in actions]
+    return utilities, tables.cumulative_regrets, tables.cumulative_sigma, tables.cumulative_immediate_pos_regret, \
+        solver.nodes_touched
+
+
+class ParallelCFR(ArrayVanillaCFR):
+    """ ArrayVanillaCFR with the subtrees of the root chance node traversed by a pool of worker processes.
+        Every iteration the workers get the current sigma and return the regret and strategy sums of their
+        subtrees, which are added up before sigma is updated. Information sets shared between subtrees
+        (the defender does not observe the chance outcome) therefore get exactly the vanilla CFR update.
+    """
+
+    def __init__(self, root, processes = None, track_imm_regret = True):
+        if not root.is_chance():
+            raise ValueError('ParallelCFR splits the children of a chance root')
+        super().__init__(root = root, track_imm_regret = track_imm_regret)
+        self.processes = min(processes or os.cpu_count(), len(root.actions))
+        chance_probs = root.chance_prob()
+        self.root_probs = {a: chance_probs[a] if isinstance(chance_probs, dict) else chance_probs
+                           for a in root.actions}
+        self.chunks = self.__balance_children(root, self.processes)
+        self.root_value = None
+        self._pool = None
+
+    @staticmethod
+    def __balance_children(root, processes):
+        # largest subtrees first, each to the currently lightest worker
+        chunks = [[] for _ in range(processes)]
+        loads = [0] * processes
+        for action in sorted(root.actions, key=lambda a: -(getattr(root.play(a), 'tree_size', 1) or 1)):
+            w = loads.index(min(loads))
+            chunks[w].append(action)
+            loads[w] += getattr(root.play(action), 'tree_size', 1) or 1
+        return [chunk for chunk in chunks if chunk]
+
+    def run(self, round = 0, iterations = 1):
+        self.iterations = iterations
+        with self._worker_pool():
+            for i in range(0, iterations):
+                self._run_iteration()
+
+    def run_with_budget(self, time_limit = None, nodes_limit = None, trace_interval = 0):
+        # one pool for the whole budgeted run, its start-up is not counted against the budget
+        with self._worker_pool():
+            return super().run_with_budget(time_limit = time_limit, nodes_limit = nodes_limit,
+                                           trace_interval = trace_interval)
+
+    def _run_iteration(self):
+        if self._pool is None:
+            with self._worker_pool():
+                return self._parallel_iteration(self._pool)
+        return self._parallel_iteration(self._pool)
+
+    @contextlib.contextmanager
+    def _worker_pool(self):
+        global _solver
+        _solver = self
+        try:
+            with multiprocessing.get_context('fork').Pool(len(self.chunks)) as pool:
+                self._pool = pool
+                yield pool
+        finally:
+            self._pool = None
+            _solver = None
+
+    def _parallel_iteration(self, pool):
+        tables = self.tables
+        results = pool.map(_traverse_children, [(chunk, tables.sigma) for chunk in self.chunks])
+        self._start_iteration()
+        self.nodes_touched += 1
+        value = 0.
+        for chunk, (utilities, regrets, sigma_sums, imm_regrets, nodes_touched) in zip(self.chunks, results):
+            value += sum(self.root_probs[a] * u for a, u in zip(chunk, utilities))
+            self.nodes_touched += nodes_touched
+            tables.cumulative_regrets += regrets
+            tables.cumulative_sigma += sigma_sums
+            if self.track_imm_regret:
+                tables.cumulative_immediate_pos_regret += imm_regrets
+        tables.update_sigma()
+        self.root_value = value
+        self._end_iteration()
+        return value
@@ -0,0 +1,43 @@
+import multiprocessing
+import os
+
+from compiled_tree import CompiledTree
+
+# root factory the worker processes call, inherited through fork so it does not have to be picklable
+_root_factory = None
+
+
+def _compile_branch(action):
+    root = _root_factory(branches=[action])
+    return CompiledTree.compile(root.play(action), keep_nodes=False)
+
+
+def build_compiled_tree(root_factory, processes=None, path=None):
+    """ The CompiledTree of the game root_factory() builds, with the subtrees of the root's children built and
+        compiled by a pool of worker processes and stitched together.
+        root_factory(branches=actions) must return the chance root with only the children of the given actions
+        built, e.g. functools.partial(PPAFlashCrashRootChanceGameState, action_mgr, network, defender_budget,
+        attacker_budgets). Information set keys must not depend on the process that built them, so interned
+        information sets are not supported. With path, the tree is also saved there (see CompiledTree.save).
+    """
+    global _root_factory
+    root = root_factory(branches=[])
+    if not root.is_chance():
+        raise ValueError('the subtrees of a chance root are built in parallel')
+    if getattr(root, 'infosets', None) is not None:
+        raise ValueError('interned information sets differ between the worker processes')
+    actions = list(root.actions)
+    processes = min(processes or os.cpu_count(), len(actions))
+    _root_factory = root_factory
+    try:
+        if processes > 1:
+            with multiprocessing.get_context('fork').Pool(processes) as pool:
+                subtrees = pool.map(_compile_branch, actions, chunksize=1)
+        else:
+            subtrees = [_compile_branch(action) for action in actions]
+    finally:
+        _root_factory = None
+    tree = CompiledTree.stitch(root, subtrees)
+    if path:
+        tree.save(path)
+    return tree
@@ -4,6 +4,7 @@ from math import floor
 import AssetFundNetwork
 from Orders import Sell
 from ActionsManager import ActionsManager
+from batch_simulation import ScenarioBatch
 from common import Solution
 
 
@@ -21,41 +22,41 @@ class SingleAgentESSolver:
         self.action_mgr = ActionsManager(self.network.assets, self.min_order_percentage, self.max_order_num)
 
     def gen_attacks(self,network):
-        self.attack(len(network.assets), network, [])
-        return self.solutions
-
-    def attack(self, n, network, orders_list):
-        if n == 0:
-            net2 = copy.deepcopy(network)
-            net2.submit_sell_orders(orders_list)
-            net2.clear_order_book()
-            funds = net2.get_funds_in_margin_calls()
+        attacks = []
+        self.attack(len(network.assets), network, attacks, [])
+        # all the attacks are simulated together
+        batch = ScenarioBatch(network, attacks)
+        batch.clear_order_books()
+        for orders_list, funds in zip(attacks, batch.get_funds_in_margin_calls()):
             cost = sum([o.num_shares*network.assets[o.asset_symbol].zero_time_price for o in orders_list])
             value = len(funds)
             for i in range (1, value+1):
                 if i not in self.solutions or cost < self.solutions[i].cost:
                     self.solutions[i] = Solution(network, orders_list, value, funds, cost)
+        return self.solutions
+
+    def attack(self, n, network, attacks, orders_list):
+        if n == 0:
+            attacks.append(orders_list)
             return
         asset_sym = self.id_to_sym[n]
         orders_list2 = copy.copy(orders_list)
-        self.attack(n - 1, network,  orders_list2)
+        self.attack(n - 1, network, attacks, orders_list2)
         for i in range(1, self.max_order_num + 1):
             num_shares = int(floor(i * self.min_order_percentage * network.assets[asset_sym].daily_volume))
             order = Sell(asset_sym, num_shares)
             orders_list2 = copy.copy(orders_list)
             orders_list2.append(order)
-            self.attack(n-1,  network, orders_list2)
+            self.attack(n-1,  network, attacks, orders_list2)
         return
 
     def gen_optimal_attacks(self):
         solutions = {}
 #        portfolios = self.get_all_attack_portfolios(self.network.assets, len(self.network.assets))
         attacks = self.action_mgr.get_possible_attacks()
-        for (order_set,cost) in attacks:
-            net2 = copy.deepcopy(self.network)
-            net2.submit_sell_orders(order_set)
-            net2.clear_order_book()
-            funds = net2.get_funds_in_margin_calls()
+        batch = ScenarioBatch.from_attacks(self.network, attacks)
+        batch.clear_order_books()
+        for (order_set, cost), funds in zip(attacks, batch.get_funds_in_margin_calls()):
             value = len(funds)
             for i in range(1, value + 1):
                 if i not in solutions or cost <= solutions[i].cost:
@@ -1,4 +1,4 @@
-import datetime
+import time
 from math import inf
 
 from SysConfig import SysConfig
@@ -11,10 +11,18 @@ from split_selector_game import SelectorRootChanceGameState
 
 class SplitGameCFR:
 
-    def compute_main_game_utilities(self, root, sub_game_keys, iterations, time=None):
-        vanilla_cfr = VanillaCFR(root)
-        if time:
-            vanilla_cfr.run_with_time_limit(time)
+    def __init__(self, cfr_cls = VanillaCFR):
+        # solver class (or factory taking the root) used for the main game and the mixed selector game
+        self.cfr_cls = cfr_cls
+
+    def compute_main_game_utilities(self, root, sub_game_keys, iterations, time_limit=None, nodes_limit=None,
+                                    trace_interval=0, warm_start=None, warm_start_decay=1.):
+        vanilla_cfr = self.cfr_cls(root)
+        if warm_start is not None:
+            vanilla_cfr.warm_start(warm_start, warm_start_decay)
+        if time_limit is not None or nodes_limit is not None:
+            iterations = vanilla_cfr.run_with_budget(time_limit=time_limit, nodes_limit=nodes_limit,
+                                                     trace_interval=trace_interval)
         else:
             vanilla_cfr.run(iterations=iterations)
         vanilla_cfr.compute_nash_equilibrium()
@@ -23,12 +31,13 @@ class SplitGameCFR:
         utilities = {pid: root.children[pid].get_value() for pid in sub_game_keys}
         cumulative_pos_regret = vanilla_cfr.average_total_imm_regret(iterations)
         return {'utilities':utilities,'pos_regret': cumulative_pos_regret, 'exploitability': 2* cumulative_pos_regret,
-                'cfr':vanilla_cfr, 'iterations':iterations}
+                'cfr':vanilla_cfr, 'iterations':iterations, 'nodes_touched': vanilla_cfr.nodes_touched,
+                'trace': vanilla_cfr.convergence_trace}
 
 
     def compute_game_mixed_equilibrium(self, attacker_types, subgame_utilities, iterations, attacks_in_budget_dict):
         p_selector_root = SelectorRootChanceGameState(attacker_types, subgame_utilities, attacks_in_budget_dict)
-        cfr = VanillaCFR(p_selector_root)
+        cfr = self.cfr_cls(p_selector_root)
         cfr.run(iterations=iterations)
         cfr.compute_nash_equilibrium()
         pids = subgame_utilities.keys()
@@ -100,28 +109,43 @@ class SplitGameCFR:
                   'portfolios_dist':nash_eq, 'sigma':sigma,'root':p_selector_root,'cfr':cfr
                 }
 
-    def iterate(self, network, defender_budget, game1_iterations, game2_iterations, max_iterations, regret_epsilon):
+    def iterate(self, network, defender_budget, attacker_budgets, game1_iterations, game2_iterations, max_iterations,
+                regret_epsilon, warm_start_decay=None, warm_game1_iterations=None):
+        """ Alternates between the main game, whose chance root draws portfolios from the current distribution,
+            and the selector game, which updates that distribution. With warm_start_decay, every main game
+            after the first starts from the previous round's regrets scaled by the decay and runs
+            warm_game1_iterations (default game1_iterations) iterations.
+        """
         network.limit_trade_step = True
-        action_mgr = ActionsManager(network.assets, SysConfig.get("STEP_ORDER_SIZE"), 1)
+        action_mgr = ActionsManager(network.assets, SysConfig.get("STEP_ORDER_SIZE"), 1, attacker_budgets)
         regret = inf
         total_iterations = 0
-        portfolios_dist = action_mgr.uniform_portfolios()
-        round_index = 1
+        previous_cfr = None
         while (total_iterations < max_iterations) and (regret >= regret_epsilon):
-            action_mgr.update_portfolios(portfolios_dist)
-            results = self.run_split_cfr(action_mgr, network, defender_budget, game1_iterations, game2_iterations, round_index)
-            total_iterations += game1_iterations + game2_iterations
-            portfolios_dist = results['portfolios_dist']
-            regret = results ['cumulative_pos_regret']
-            self.print_eq_info(total_iterations, results)
-            round_index += 1
-        return results
-
-    def print_eq_info(self, total_iterations, results):
+            root = PortfolioFlashCrashRootChanceGameState(action_mgr=action_mgr, af_network=network,
+                                                          defender_budget=defender_budget)
+            iterations = game1_iterations
+            if previous_cfr is not None and warm_game1_iterations is not None:
+                iterations = warm_game1_iterations
+            main_game_results = self.compute_main_game_utilities(root, action_mgr.get_probable_portfolios().keys(),
+                                                                 iterations, warm_start=previous_cfr,
+                                                                 warm_start_decay=warm_start_decay)
+            selector_game_result = self.compute_game_mixed_equilibrium(attacker_budgets, main_game_results['utilities'],
+                                                                       game2_iterations,
+                                                                       action_mgr.get_portfolios_in_budget_dict())
+            if warm_start_decay is not None:
+                previous_cfr = main_game_results['cfr']
+            action_mgr.update_portfolios(selector_game_result['portfolios_dist'])
+            total_iterations += iterations + game2_iterations
+            regret = main_game_results['exploitability'] + selector_game_result['exploitability']
+            self.print_eq_info(total_iterations, regret, selector_game_result)
+        return (main_game_results, selector_game_result)
+
+    def print_eq_info(self, total_iterations, regret, results):
         print('run {0} iterations'.format(total_iterations))
-        print('cumulative regret is '.format(results['cumulative_regret']))
-        print('defender equilibrium value is  '.format(results['defender']))
-        print('attackers equilibrium values are  '.format(results['attackers']))
+        print('cumulative regret is {0}'.format(regret))
+        print('defender equilibrium value is {0}'.format(results['defender']))
+        print('attackers equilibrium values are {0}'.format(results['attackers']))
 
     def run_old(self, action_mgr, network, defender_budget, attacker_budgets, game1_iterations, game2_iterations, round):
         root = PortfolioFlashCrashRootChanceGameState(action_mgr=action_mgr,
@@ -146,17 +170,26 @@ class SplitGameCFR:
 
         return (main_game_results, selector_game_result)
 
-    def run_with_time_limit(self, time_limit, main_game_root, attacker_types,
-             attacks_in_budget_dict, subgame_keys):
+    def run_with_budget(self, main_game_root, attacker_types, attacks_in_budget_dict, subgame_keys,
+                        time_limit=None, nodes_limit=None, trace_interval=0):
+        """ The main game gets the whole budget, the pure selector game is solved directly and its time is
+            reported in selector_game_result['time'] """
         main_game_results = self.compute_main_game_utilities(root=main_game_root, sub_game_keys=subgame_keys,
-                                                             iterations=None, time_limit=time_limit -1)
-        t = datetime.now()
+                                                             iterations=None, time_limit=time_limit,
+                                                             nodes_limit=nodes_limit, trace_interval=trace_interval)
+        start = time.perf_counter()
         selector_game_result = self.compute_pure_game_equilibrium(attacker_types=attacker_types,
                                                                   subgame_utilities=main_game_results['utilities'],
                                                                   attacks_in_budget_dict=attacks_in_budget_dict)
-        print(str((datetime.now() - t).miliseconds))
+        selector_game_result['time'] = time.perf_counter() - start
         return (main_game_results, selector_game_result)
 
+    def run_with_time_limit(self, time_limit, main_game_root, attacker_types,
+             attacks_in_budget_dict, subgame_keys):
+        return self.run_with_budget(main_game_root=main_game_root, attacker_types=attacker_types,
+                                    attacks_in_budget_dict=attacks_in_budget_dict, subgame_keys=subgame_keys,
+                                    time_limit=time_limit)
+
 
 def main():
     defender_budget = 100000000
@@ -0,0 +1,68 @@
+import numpy
+
+from cfr import ArrayVanillaCFR
+from compiled_tree import CompiledTree
+from constants import ATTACKER, DEFENDER
+
+
+class VectorizedCFR(ArrayVanillaCFR):
+    """ Vanilla CFR over a CompiledTree: the reach and value passes run level by level as numpy operations
+        on the node arrays instead of recursing through the game states.
+    """
+
+    def __init__(self, root=None, tree=None, track_imm_regret = True):
+        self.tree = tree if tree is not None else CompiledTree.compile(root)
+        super().__init__(root = root, track_imm_regret = track_imm_regret)
+
+    def _init_tables(self, root):
+        self.tables = self.tree.tables
+        self.nash_equilibrium_table = None
+        self.node_values = None
+        self._compiled_tree = self.tree
+
+    def run(self, round = 0, iterations = 1):
+        self.iterations = iterations
+        for i in range(0, iterations):
+            self._run_iteration()
+
+    def _run_iteration(self):
+        self._start_iteration()
+        self.nodes_touched += self.tree.num_nodes
+        value = self._cfr_iteration()
+        self._end_iteration()
+        return value
+
+    def _cfr_iteration(self):
+        tree = self.tree
+        tables = self.tables
+        sigma = tables.sigma
+        edge = tree.edge_weights(sigma)
+        values = tree.values(edge)
+        reach_attacker = tree.reach_probabilities(edge, ATTACKER)
+        reach_defender = tree.reach_probabilities(edge, DEFENDER)
+
+        edges = tree.player_edges
+        parents = tree.parent[edges]
+        to_move = tree.player[parents]
+        attacker_moves = to_move == ATTACKER
+        cfr_reach = numpy.where(attacker_moves, reach_defender[parents], reach_attacker[parents])
+        reach = numpy.where(attacker_moves, reach_attacker[parents], reach_defender[parents])
+        slots = tree.slot[edges]
+        regrets = to_move * cfr_reach * (values[edges] - values[parents])
+
+        tables.cumulative_regrets += numpy.bincount(slots, weights=regrets, minlength=tables.size)
+        tables.cumulative_sigma += numpy.bincount(slots, weights=reach * sigma[slots], minlength=tables.size)
+        if self.track_imm_regret:
+            max_pos_regret = numpy.zeros(tree.num_nodes)
+            numpy.maximum.at(max_pos_regret, parents, regrets)
+            tables.cumulative_immediate_pos_regret += numpy.bincount(tree.inf_set, weights=max_pos_regret,
+                                                                     minlength=tables.num_inf_sets)
+        tables.update_sigma()
+        return values[0]
+
+    def value_of_the_game(self):
+        self.node_values = self.tree.values(self.tree.edge_weights(self.nash_equilibrium_table))
+        if self.tree.nodes:
+            for node, value in zip(self.tree.nodes, self.node_values):
+                node.set_value(value)
+        return self.node_values[0]
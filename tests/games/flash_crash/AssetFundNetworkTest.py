@@ -1,3 +1,6 @@
+import copy
+import os
+import tempfile
 import unittest
 from unittest.mock import MagicMock, call
 
@@ -33,6 +36,29 @@ class TestAssetFundsNetwork  (unittest.TestCase):
                                                            ExponentialMarketImpactCalculator(1))
         self.assertEqual(network, decoded_network)
 
+    def test_snapshot(self):
+        network = AssetFundsNetwork.generate_random_network(0.5, 5, 3, [1]*5, [2]*5, [1, 2, 3], [2]*5, [100]*3,
+                                                            [1.5]*3, ExponentialMarketImpactCalculator(1))
+        network.funds['f_empty'] = Fund('f_empty', {}, 1, 2, 1.5)
+        network.set_asset_price('a1', 2.5)
+        list(network.funds.values())[0].compute_curr_leverage(network.assets)
+        with tempfile.TemporaryDirectory() as dirname:
+            file_name = os.path.join(dirname, 'network.npz')
+            network.save_snapshot(file_name)
+            for mmap in [False, True]:
+                decoded_network = AssetFundsNetwork.load_snapshot(file_name, ExponentialMarketImpactCalculator(1),
+                                                                  mmap)
+                self.assertEqual(network, decoded_network)
+                self.assertListEqual(list(network.funds), list(decoded_network.funds))
+                for sym, asset in network.assets.items():
+                    self.assertEqual(vars(asset), vars(decoded_network.assets[sym]))
+                for sym, fund in network.funds.items():
+                    self.assertEqual(vars(fund), vars(decoded_network.funds[sym]))
+                    self.assertListEqual(list(fund.portfolio), list(decoded_network.funds[sym].portfolio))
+            np.savez(file_name, version=np.array(AssetFundNetwork.SNAPSHOT_VERSION + 1))
+            with self.assertRaises(ValueError):
+                AssetFundsNetwork.load_snapshot(file_name, ExponentialMarketImpactCalculator(1))
+
     def test_generate_random_network(self):
         num_funds = 3
         num_assets = 2
@@ -395,6 +421,21 @@ class TestAssetFundsNetwork  (unittest.TestCase):
         mi_calc.get_updated_price.assert_called_once_with(1, a1, 1)
         self.assertEqual(network.buy_orders['a1'],1)
 
+    def test_simulate_trade_unknown_asset(self):
+        a1 = AssetFundNetwork.Asset(price=1, daily_volume=1000, symbol='a1')
+        f1 = Fund('f1', {'a1' : 10}, 100, 1, 1)
+        mi_calc = MarketImpactCalculator()
+        mi_calc.get_updated_price = MagicMock(return_value = 1.5)
+        network = AssetFundNetwork.AssetFundsNetwork(funds={'f1': f1}, assets={'a1': a1},
+                                                     mi_calc=mi_calc)
+        network.submit_sell_orders([Sell('zz', 5)])
+        with self.assertRaises(KeyError):
+            network.clear_order_book()
+        network.reset_order_books()
+        network.submit_sell_orders([Sell('', 5), Sell('a1', 2)])
+        self.assertDictEqual({'a1': '1->1.5'}, network.simulate_trade())
+        self.assertEqual(5, network.sell_orders[''])
+
     def test_read_two_assets_from_file(self):
         assets = AssetFundNetwork.read_assets_file('../../resources/assets.csv', 2)
         expected_assets = {'A1':Asset( price=145.6, daily_volume=605.3, symbol='A1'),
@@ -425,6 +466,213 @@ class TestAssetFundsNetwork  (unittest.TestCase):
         self.assertFalse(network.sell_orders)
         self.assertFalse(network.buy_orders)
 
+    def test_copy_on_write(self):
+        a1 = AssetFundNetwork.Asset(price=1, daily_volume=1, symbol='a1')
+        a2 = AssetFundNetwork.Asset(price=2, daily_volume=1, symbol='a2')
+        f1 = Fund('f1', {'a1': 10}, 100, 1, 1)
+        mi_calc = MarketImpactCalculator()
+        mi_calc.get_updated_price = MagicMock(return_value=0.5)
+        network = AssetFundNetwork.AssetFundsNetwork(funds={'f1': f1}, assets={'a1': a1, 'a2': a2},
+                                                     mi_calc=mi_calc, limit_trade_step=False)
+        network.submit_sell_orders([Sell('a1', 2)])
+        net2 = network.copy()
+        self.assertIs(network.funds, net2.funds)
+        self.assertIs(a1, net2.assets['a1'])
+        net2.simulate_trade()
+        self.assertEqual(0.5, net2.assets['a1'].price)
+        self.assertIs(a2, net2.assets['a2'])
+        self.assertEqual(1, a1.price)
+        self.assertDictEqual({'a1': 2}, network.sell_orders)
+        self.assertFalse(net2.sell_orders)
+
+    def test_apply_undo(self):
+        a1 = AssetFundNetwork.Asset(price=1, daily_volume=1, symbol='a1')
+        a2 = AssetFundNetwork.Asset(price=2, daily_volume=1, symbol='a2')
+        f1 = Fund('f1', {'a1': 10}, 100, 1, 1)
+        mi_calc = MarketImpactCalculator()
+        mi_calc.get_updated_price = MagicMock(return_value=0.5)
+        network = AssetFundNetwork.AssetFundsNetwork(funds={'f1': f1}, assets={'a1': a1, 'a2': a2},
+                                                     mi_calc=mi_calc, limit_trade_step=False)
+        network.submit_buy_orders([Buy('a2', 1)])
+        network.apply(sell_orders=[Sell('a1', 2)])
+        self.assertDictEqual({'a1': 2}, network.sell_orders)
+        log = network.apply(trade=True)
+        self.assertDictEqual({'a1': '1->0.5', 'a2': '2->0.5'}, log)
+        self.assertEqual(0.5, network.assets['a1'].price)
+        self.assertFalse(network.sell_orders)
+        network.undo()
+        self.assertEqual(1, network.assets['a1'].price)
+        self.assertEqual(2, network.assets['a2'].price)
+        self.assertDictEqual({'a1': 2}, network.sell_orders)
+        network.undo()
+        self.assertFalse(network.sell_orders)
+        self.assertDictEqual({'a2': 1}, network.buy_orders)
+        with self.assertRaises(TypeError):
+            network.apply(sell_orders=[Buy('a1', 2)])
+        self.assertFalse(network.sell_orders)
+
+    def test_holdings_matrix(self):
+        network = AssetFundsNetwork.generate_random_network(0.5, 10, 4, [1]*10, [2]*10, [1, 2, 3, 4], [1.5]*10,
+                                                            [100]*4, [1.5]*4, ExponentialMarketImpactCalculator(1))
+        f_broke = Fund('f_broke', {'a0': 1}, 10, 1, 1)
+        network.funds['f_broke'] = f_broke
+        network.reset_holdings()
+        for price in [0.5, 0.9, 1.1, 2]:
+            for sym, asset in network.assets.items():
+                network.set_asset_price(sym, asset.zero_time_price * price)
+            funds = list(network.funds.values())
+            np.testing.assert_allclose([f.compute_curr_leverage(network.assets) for f in funds],
+                                       network.fund_leverages())
+            expected = [f.symbol for f in funds if f.marginal_call(network.assets)]
+            self.assertListEqual(expected, network.get_funds_in_margin_calls())
+            self.assertEqual(len(expected), network.count_margin_calls())
+            self.assertEqual(bool(expected), network.margin_calls())
+        self.assertIn('f_broke', network.get_funds_in_margin_calls())
+
+        f_broke.marginal_call = MagicMock(return_value=False)
+        self.assertIs(network.holdings(), network.copy().holdings())
+        network.reset_holdings()
+        self.assertNotIn('f_broke', network.get_funds_in_margin_calls())
+        f_broke.marginal_call.assert_called_with(network.assets)
+
+    def test_margin_calls_without_capital(self):
+        a1 = AssetFundNetwork.Asset(price=10, daily_volume=100, symbol='a1')
+        f_empty = Fund('f_empty', {}, 0, 1, 1.5)
+        f1 = Fund('f1', {'a1': 10}, 50, 1, 3)
+        network = AssetFundsNetwork(funds={'f_empty': f_empty, 'f1': f1}, assets={'a1': a1},
+                                    mi_calc=MockMarketImpactTestCalculator())
+        self.assertTrue(f_empty.marginal_call(network.assets))
+        self.assertListEqual(['f_empty'], network.get_funds_in_margin_calls())
+        self.assertEqual(1, network.count_margin_calls())
+
+    def test_margin_calls_record_leverage(self):
+        a1 = AssetFundNetwork.Asset(price=10, daily_volume=100, symbol='a1')
+        f1 = Fund('f1', {'a1': 10}, 50, 1, 3)
+        network = AssetFundsNetwork(funds={'f1': f1}, assets={'a1': a1}, mi_calc=MockMarketImpactTestCalculator())
+        network.set_asset_price('a1', 7)
+        self.assertEqual(0, network.count_margin_calls())
+        self.assertEqual(2.5, f1.leverage)
+        network.set_asset_price('a1', 6)
+        network.get_funds_in_margin_calls()
+        self.assertEqual(f1.compute_curr_leverage(network.assets), f1.leverage)
+        # without capital the last finite leverage is kept
+        network.set_asset_price('a1', 4)
+        leverage = f1.leverage
+        self.assertTrue(network.margin_calls())
+        self.assertEqual(leverage, f1.leverage)
+
+    def test_incremental_fund_valuation(self):
+        network = AssetFundsNetwork.generate_random_network(0.5, 10, 4, [1]*10, [2]*10, [1, 2, 3, 4], [1.5]*10,
+                                                            [100]*4, [1.5]*4, ExponentialMarketImpactCalculator(1))
+        funds = list(network.funds.values())
+
+        def assert_valuation(net):
+            np.testing.assert_allclose([f.compute_curr_leverage(net.assets) for f in funds], net.fund_leverages())
+            self.assertListEqual([f.symbol for f in funds if f.marginal_call(net.assets)],
+                                 net.get_funds_in_margin_calls())
+
+        assert_valuation(network)
+        net2 = network.copy()
+        net2.apply(sell_orders=[Sell('a0', 30), Sell('a2', 60)], trade=True)
+        net2.simulate_trade()
+        assert_valuation(net2)
+        assert_valuation(network)
+        net3 = net2.copy()
+        net3.clear_order_book()
+        assert_valuation(net3)
+        assert_valuation(net2)
+        net2.undo()
+        assert_valuation(net2)
+        for sym, asset in network.assets.items():
+            self.assertEqual(asset.price, net2.assets[sym].price)
+        net3.run_intraday_simulation_2(1.5)
+        assert_valuation(net3)
+
+    def test_undo_restores_fund_valuation(self):
+        a1 = AssetFundNetwork.Asset(price=1, daily_volume=100, symbol='a1')
+        a2 = AssetFundNetwork.Asset(price=0.1, daily_volume=100, symbol='a2')
+        f1 = Fund('f1', {'a1': 1, 'a2': 1}, 0.5, 1, 10)
+        mi_calc = MarketImpactCalculator()
+        # the value of f1 at the new prices has no room for the 0.1 of a2, adding the price changes back loses it
+        mi_calc.get_updated_price = MagicMock(side_effect=lambda num_shares, asset, sign: {'a1': 1e17,
+                                                                                           'a2': 0.2}[asset.symbol])
+        network = AssetFundsNetwork(funds={'f1': f1}, assets={'a1': a1, 'a2': a2}, mi_calc=mi_calc,
+                                    limit_trade_step=False)
+        leverages = network.fund_leverages()
+        network.apply(sell_orders=[Sell('a1', 1), Sell('a2', 1)], trade=True)
+        network.undo()
+        np.testing.assert_array_equal(leverages, network.fund_leverages())
+        self.assertEqual(f1.compute_curr_leverage(network.assets), network.fund_leverages()[0])
+
+    def test_fund_valuation_direct_price_change(self):
+        a1 = AssetFundNetwork.Asset(price=10, daily_volume=100, symbol='a1')
+        f1 = Fund('f1', {'a1': 10}, 50, 1, 1.5)
+        network = AssetFundsNetwork(funds={'f1': f1}, assets={'a1': a1}, mi_calc=MockMarketImpactTestCalculator())
+        net2 = network.copy()
+        self.assertEqual(0, network.count_margin_calls())
+        self.assertEqual(0, net2.count_margin_calls())
+        network.assets['a1'].set_price(6)
+        self.assertTrue(f1.marginal_call(network.assets))
+        self.assertEqual(1, network.count_margin_calls())
+        # the copy shares the asset
+        self.assertEqual(1, net2.count_margin_calls())
+        network.assets['a1'].set_price(10)
+        self.assertEqual(0, network.count_margin_calls())
+
+
+    def test_sparse_holdings(self):
+        network = AssetFundsNetwork.generate_random_network(0.3, 20, 8, [1]*20, [2]*20, list(range(1, 9)),
+                                                            [1.5]*20, [100]*8, [1.5]*8,
+                                                            ExponentialMarketImpactCalculator(1))
+        network.funds['f_empty'] = Fund('f_empty', {}, 1, 2, 1.5)
+        dense = AssetFundNetwork.HoldingsMatrix(network.funds, network.assets)
+        sparse = AssetFundNetwork.HoldingsMatrix(network.funds, network.assets, sparse=True)
+        np.testing.assert_array_equal(dense.shares, sparse.shares.toarray())
+        prices = np.random.rand(5, 8) * 2
+        np.testing.assert_allclose(dense.portfolio_values(prices), sparse.portfolio_values(prices))
+        np.testing.assert_array_equal(dense.margin_calls(prices), sparse.margin_calls(prices))
+        for j, (funds, shares) in enumerate(sparse.holders):
+            np.testing.assert_array_equal(np.flatnonzero(dense.shares[:, j]), funds[shares != 0])
+            np.testing.assert_array_equal(dense.shares[funds, j], shares)
+
+        min_size = SysConfig.get('SPARSE_HOLDINGS_MIN_SIZE')
+        SysConfig.set('SPARSE_HOLDINGS_MIN_SIZE', 0)
+        try:
+            network.reset_holdings()
+            self.assertTrue(network.holdings().sparse)
+            net2 = network.copy()
+            net2.submit_sell_orders([Sell('a1', 300), Sell('a5', 200)])
+            net2.clear_order_book()
+            funds = list(network.funds.values())
+            self.assertListEqual([f.symbol for f in funds if f.marginal_call(net2.assets)],
+                                 net2.get_funds_in_margin_calls())
+        finally:
+            SysConfig.set('SPARSE_HOLDINGS_MIN_SIZE', min_size)
+
+    def test_get_liquidation_orders(self):
+        network = AssetFundsNetwork.generate_random_network(0.5, 10, 4, [1e6]*10, [2]*10, [1, 2, 3, 4], [1.5]*10,
+                                                            [1e6, 1e7, 1e5, 1e6], [1.5]*4,
+                                                            ExponentialMarketImpactCalculator(1))
+        for fund in list(network.funds.values())[::2]:
+            fund.liquidate()
+        funds = copy.deepcopy(network.funds)
+        expected = [fund.get_orders(network.assets) for fund in funds.values()]
+        self.assertTrue(any(expected))
+        self.assertListEqual(expected, network.get_liquidation_orders())
+        self.assertDictEqual({sym: f.portfolio for sym, f in funds.items()},
+                             {sym: f.portfolio for sym, f in network.funds.items()})
+
+    def test_holdings_after_fund_liquidation(self):
+        a1 = AssetFundNetwork.Asset(price=10, daily_volume=1e6, symbol='a1')
+        f1 = Fund('f1', {'a1': 10}, 50, 1, 1.5)
+        network = AssetFundsNetwork(funds={'f1': f1}, assets={'a1': a1}, mi_calc=MockMarketImpactTestCalculator())
+        self.assertEqual(0, network.count_margin_calls())
+        f1.liquidate()
+        self.assertListEqual([Sell('a1', 10)], f1.get_orders(network.assets))
+        self.assertFalse(f1.portfolio)
+        self.assertTrue(f1.marginal_call(network.assets))
+        self.assertEqual(1, network.count_margin_calls())
+        np.testing.assert_array_equal([[0]], network.holdings().shares)
 
 
 if __name__ == '__main__':
@@ -1,4 +1,6 @@
 import unittest
+
+import numpy as np
 import numpy.testing as npt
 
 from AssetFundNetwork import Asset
@@ -63,6 +65,27 @@ class TestMarketImpactCalculator  (unittest.TestCase):
         mi = calc.get_updated_price(order.num_shares, a, -1)
         npt.assert_almost_equal(1.925, mi, decimal=4)
 
+    def cmp_updated_prices(self, calc):
+        num_shares = np.array([[10, 200, 3], [1, 50, 400]])
+        prices = np.array([[2, 1.5, 30], [2.5, 1, 28]])
+        signs = np.array([[1, -1, -1], [-1, 1, 1]])
+        assets = [Asset(price=1, daily_volume=v, volatility=vol, symbol='a' + str(j))
+                  for j, (v, vol) in enumerate([(1000, 1.5), (500, 2), (10000, 0.5)])]
+        updated_prices = calc.get_updated_prices(num_shares, np.array([a.daily_volume for a in assets]), prices,
+                                                 np.array([a.volatility for a in assets]), signs)
+        self.assertEqual((2, 3), updated_prices.shape)
+        for k in range(2):
+            for j, a in enumerate(assets):
+                a.price = prices[k, j]
+                npt.assert_almost_equal(calc.get_updated_price(num_shares[k, j], a, signs[k, j]),
+                                        updated_prices[k, j])
+
+    def test_updated_prices_exp(self):
+        self.cmp_updated_prices(ExponentialMarketImpactCalculator(2))
+
+    def test_updated_prices_sqrt(self):
+        self.cmp_updated_prices(SqrtMarketImpactCalculator(0.5))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+import numpy
+
+from ActionsManager import ActionsManager
+from AssetFundNetwork import AssetFundsNetwork
+from MarketImpactCalculator import ExponentialMarketImpactCalculator, SqrtMarketImpactCalculator
+from Orders import Buy
+from batch_simulation import ScenarioBatch
+
+
+class TestScenarioBatch(unittest.TestCase):
+
+    def setUp(self):
+        numpy.random.seed(0)
+        self.network = AssetFundsNetwork.generate_random_network(0.5, 6, 3, [1000]*6, [2]*6, [10, 20, 30], [1.05]*6,
+                                                                 [1000]*3, [1.5]*3,
+                                                                 ExponentialMarketImpactCalculator(1))
+        self.attacks = ActionsManager(self.network.assets, 0.1, 2).get_possible_attacks()
+
+    def cmp_networks(self, batch):
+        batch.clear_order_books()
+        self.assertTrue(batch.order_books_empty().all())
+        funds = batch.get_funds_in_margin_calls()
+        self.assertTrue(any(funds))
+        for k, (order_set, _) in enumerate(self.attacks):
+            net2 = self.network.copy()
+            net2.submit_sell_orders(order_set)
+            net2.clear_order_book()
+            self.assertListEqual([net2.assets[sym].price for sym in batch.asset_symbols], list(batch.prices[k]))
+            self.assertListEqual(net2.get_funds_in_margin_calls(), funds[k])
+            self.assertEqual(net2.count_margin_calls(), batch.count_margin_calls()[k])
+
+    def test_attacks(self):
+        self.cmp_networks(ScenarioBatch.from_attacks(self.network, self.attacks))
+
+    def test_attacks_unlimited_trade_step(self):
+        self.network.limit_trade_step = False
+        self.cmp_networks(ScenarioBatch.from_attacks(self.network, self.attacks))
+
+    def test_sqrt_impact(self):
+        self.network.mi_calc = SqrtMarketImpactCalculator(0.5)
+        self.cmp_networks(ScenarioBatch.from_attacks(self.network, self.attacks))
+
+    def test_trade_logs(self):
+        batch = ScenarioBatch.from_attacks(self.network, self.attacks)
+        networks = []
+        for order_set, _ in self.attacks:
+            net2 = self.network.copy()
+            net2.submit_sell_orders(order_set)
+            networks.append(net2)
+        while not batch.order_books_empty().all():
+            logs = batch.trade_step(log=True)
+            for net2, log in zip(networks, logs):
+                self.assertEqual(str(net2.simulate_trade()), str(log))
+        self.assertTrue(all(net2.order_books_empty() for net2 in networks))
+
+    def test_network_books(self):
+        self.network.submit_buy_orders([Buy('a1', 150)])
+        batch = ScenarioBatch.from_attacks(self.network, self.attacks)
+        self.assertFalse(batch.order_books_empty().any())
+        self.cmp_networks(batch)
+        self.assertDictEqual({'a1': 150}, self.network.buy_orders)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from exp.count_game_nodes_cmp_exp import measure_bytes_per_node
+from constants import BUY, SELL, SIM_TRADE
+from flash_crash_players_cfr import FlashCrashRootChanceGameState
+from games.bases import History
+from mocks import three_assets_root_factory
+
+
+class TestCompactFlashCrashPlayers(unittest.TestCase):
+
+    def setUp(self):
+        self.gen_root = three_assets_root_factory(FlashCrashRootChanceGameState)
+
+    def test_history(self):
+        empty = History()
+        h1 = empty.append('a')
+        h2 = h1.append('b')
+        h3 = h1.append('c')
+        self.assertListEqual([], empty.to_list())
+        self.assertListEqual(['a', 'b'], h2.to_list())
+        self.assertListEqual(['a', 'c'], h3.to_list())
+        self.assertIs(h2.parent, h3.parent)
+        self.assertEqual(2, len(h3))
+        self.assertEqual(str(['a', 'b']), str(h2))
+
+    def check_node(self, node, expected_history, labels):
+        self.assertFalse(hasattr(node, '__dict__'))
+        self.assertDictEqual(expected_history, node.actions_history)
+        # equal action lists and information sets are a single object
+        self.assertIs(labels.setdefault(tuple(node.actions), node.actions), node.actions)
+        self.assertIs(labels.setdefault(node.inf_set(), node.inf_set()), node.inf_set())
+        for action in node.actions:
+            history = {k: list(v) for k, v in expected_history.items()}
+            if node.is_market():
+                for k in [BUY, SELL, SIM_TRADE]:
+                    history[k].append(action)
+            else:
+                history[BUY if node.to_move > 0 else SELL].append(action)
+            child = node.play(action)
+            for label in child.actions:
+                self.assertIs(labels.setdefault(label, label), label)
+            self.check_node(child, history, labels)
+
+    def test_compact_nodes(self):
+        root = self.gen_root()
+        labels = {}
+        for action in root.actions:
+            self.check_node(root.play(action), {BUY: [], SELL: [], SIM_TRADE: []}, labels)
+
+    def test_bytes_per_node(self):
+        tree_size, bytes_per_node = measure_bytes_per_node(self.gen_root)
+        self.assertEqual(self.gen_root().tree_size, tree_size)
+        self.assertGreater(bytes_per_node, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
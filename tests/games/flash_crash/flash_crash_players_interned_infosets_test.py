@@ -0,0 +1,53 @@
+import unittest
+
+from cfr import VanillaCFR
+from flash_crash_players_portfolio_per_attacker_cfr import PPAFlashCrashRootChanceGameState
+from mocks import assert_same_tree, three_assets_root_factory
+
+
+class TestPPAInternedInfoSets(unittest.TestCase):
+
+    def setUp(self):
+        self.gen_root = three_assets_root_factory(PPAFlashCrashRootChanceGameState, actions_mgr_budgets=True)
+
+    def test_same_infosets(self):
+        root = self.gen_root()
+        interned_root = self.gen_root(interned_infosets=True)
+        keys = {}
+
+        def describe(key):
+            self.assertIsInstance(key, int)
+            inf_set = interned_root.infosets.describe(key)
+            # the same information set always gets the same key
+            self.assertEqual(keys.setdefault(inf_set, key), key)
+            return inf_set
+
+        assert_same_tree(self, root, interned_root, describe=describe)
+        self.assertEqual(len(keys), len(set(keys.values())))
+        self.assertEqual(len(keys), interned_root.infosets.num_keys())
+
+    def test_same_actions_history(self):
+        nodes = [(self.gen_root(), self.gen_root(interned_infosets=True))]
+        num_histories = 0
+        while nodes:
+            node, interned_node = nodes.pop()
+            if hasattr(node, 'actions_history'):
+                # the interned nodes keep only the history ids
+                self.assertIsNone(interned_node._actions_history)
+                self.assertDictEqual(node.actions_history, interned_node.actions_history)
+                num_histories += 1
+            nodes.extend((node.play(action), interned_node.play(action)) for action in node.actions)
+        self.assertTrue(num_histories)
+
+    def test_same_strategy(self):
+        cfr = VanillaCFR(self.gen_root())
+        cfr.run(iterations=5)
+        interned_root = self.gen_root(interned_infosets=True)
+        interned_cfr = VanillaCFR(interned_root)
+        interned_cfr.run(iterations=5)
+        described = {interned_root.infosets.describe(k): v for k, v in interned_cfr.cumulative_sigma.items()}
+        self.assertDictEqual(cfr.cumulative_sigma, described)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from flash_crash_players_cfr import FlashCrashRootChanceGameState
+from mccfr import ExternalSamplingMCCFR
+from minimax import game_state_minimax
+from mocks import assert_same_tree, three_assets_root_factory
+
+
+class TestLazyFlashCrashPlayers(unittest.TestCase):
+
+    def setUp(self):
+        self.gen_root = three_assets_root_factory(FlashCrashRootChanceGameState)
+
+    def count_inner_nodes(self, node):
+        if node.is_terminal():
+            return 0
+        return 1 + sum([self.count_inner_nodes(child) for child in node.children.values()])
+
+    def test_same_tree(self):
+        root = self.gen_root()
+        lazy_root = self.gen_root(lazy=True)
+        self.assertIsNone(lazy_root.tree_size)
+        self.assertEqual(0, lazy_root.expansion.expansions)
+        assert_same_tree(self, root, lazy_root, tree_size=False)
+        # every non terminal node below the root was expanded once
+        self.assertEqual(self.count_inner_nodes(root) - 1, lazy_root.expansion.expansions)
+
+    def test_eviction(self):
+        lazy_root = self.gen_root(lazy=True, max_expanded=20)
+        self.assertEqual(game_state_minimax(self.gen_root()), game_state_minimax(lazy_root))
+        self.assertGreater(lazy_root.expansion.evictions, 0)
+        assert_same_tree(self, self.gen_root(), lazy_root, tree_size=False)
+
+    def test_sampling_solver(self):
+        cfr = ExternalSamplingMCCFR(self.gen_root(), seed=7)
+        cfr.run(iterations=10)
+        lazy_root = self.gen_root(lazy=True, max_expanded=50)
+        lazy_cfr = ExternalSamplingMCCFR(lazy_root, seed=7)
+        lazy_cfr.run(iterations=10)
+        self.assertGreater(lazy_root.expansion.evictions, 0)
+        self.assertDictEqual(cfr.cumulative_regrets, lazy_cfr.cumulative_regrets)
+        self.assertDictEqual(cfr.cumulative_sigma, lazy_cfr.cumulative_sigma)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from flash_crash_players_portfolio_per_attacker_cfr import PPAFlashCrashRootChanceGameState
+from mocks import assert_same_tree, three_assets_root_factory
+
+
+class TestPPATranspositions(unittest.TestCase):
+
+    def setUp(self):
+        self.gen_root = three_assets_root_factory(PPAFlashCrashRootChanceGameState, actions_mgr_budgets=True)
+
+    def networks(self, node, found):
+        found[id(node.af_network)] = node.af_network
+        for child in node.children.values():
+            self.networks(child, found)
+        return found
+
+    def test_same_tree(self):
+        root = self.gen_root()
+        shared_root = self.gen_root(transpositions=True)
+        self.assertIsNone(root.public_states)
+        assert_same_tree(self, root, shared_root)
+        self.assertGreater(shared_root.public_states.hits, 0)
+
+    def test_networks_shared(self):
+        shared_root = self.gen_root(transpositions=True)
+        networks = self.networks(shared_root, {})
+        self.assertEqual(shared_root.public_states.num_states(), len(networks))
+        self.assertEqual(len(networks), len({net.canonical_state() for net in networks.values()}))
+        self.assertLess(len(networks), len(self.networks(self.gen_root(), {})))
+
+
+if __name__ == '__main__':
+    unittest.main()
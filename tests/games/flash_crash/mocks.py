@@ -1,6 +1,11 @@
 import AssetFundNetwork
+from ActionsManager import ActionsManager
 from MarketImpactCalculator import MarketImpactCalculator
 from Orders import NoLimitOrder
+from exp.network_generators import get_network_from_dir
+
+DEFENDER_BUDGET = 1000000000
+ATTACKER_BUDGETS = [4000000000, 6000000000]
 
 
 class MockMarketImpactTestCalculator(MarketImpactCalculator):
@@ -20,3 +25,27 @@ class MockFund(AssetFundNetwork.Fund):
 
     def marginal_call(self, assets):
         return assets[self.my_asset.symbol].price <= self.margin_ratio*self.asset_initial_price
+
+
+def three_assets_root_factory(root_class, actions_mgr_budgets=False):
+    """ The game on resources/three_assets_net the flash crash player tests build in several variants: a
+        function of keyword arguments returning root_class(actions_mgr, network, DEFENDER_BUDGET,
+        ATTACKER_BUDGETS, **kwargs) """
+    network = get_network_from_dir('../../resources/three_assets_net')
+    network.limit_trade_step = True
+    actions_mgr = ActionsManager(assets=network.assets, step_order_size=0.015, max_order_num=1,
+                                 attacker_budgets=ATTACKER_BUDGETS if actions_mgr_budgets else None)
+    return lambda **kwargs: root_class(actions_mgr, network, DEFENDER_BUDGET, ATTACKER_BUDGETS, **kwargs)
+
+
+def assert_same_tree(test, expected, actual, tree_size=True, describe=None):
+    """ describe turns the information set keys of actual into those of expected """
+    test.assertEqual(expected.inf_set(), describe(actual.inf_set()) if describe else actual.inf_set())
+    test.assertListEqual(list(expected.actions), list(actual.actions))
+    if tree_size:
+        test.assertEqual(expected.tree_size, actual.tree_size)
+    test.assertEqual(expected.is_terminal(), actual.is_terminal())
+    if expected.is_terminal():
+        test.assertEqual(expected.evaluation(), actual.evaluation())
+    for action in expected.actions:
+        assert_same_tree(test, expected.play(action), actual.play(action), tree_size, describe)
@@ -0,0 +1,69 @@
+import random
+import unittest
+
+from ActionsManager import ActionsManager
+from constants import ATTACKER, DEFENDER
+from exp.network_generators import get_network_from_dir
+from flash_crash_players_portfolio_cfr import PortfolioFlashCrashRootChanceGameState
+from flash_crash_players_portfolio_per_attacker_cfr import PPAFlashCrashRootChanceGameState
+from tree_size_estimator import TreeSizeEstimator
+
+DEFENDER_BUDGET = 1000000000
+ATTACKER_BUDGETS = [4000000000, 6000000000]
+
+
+class TestTreeSizeEstimator(unittest.TestCase):
+
+    def setUp(self):
+        self.network = get_network_from_dir('../../../resources/three_assets_net')
+        self.network.limit_trade_step = True
+        self.actions_mgr = ActionsManager(assets=self.network.assets, step_order_size=0.015, max_order_num=1,
+                                          attacker_budgets=ATTACKER_BUDGETS)
+
+    @staticmethod
+    def tree_stats(root):
+        terminals = 0
+        inf_sets = set()
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.children.values())
+            if node.is_terminal():
+                terminals += 1
+            elif node.to_move in (ATTACKER, DEFENDER):
+                inf_sets.add(node.inf_set())
+        return root.tree_size, terminals, len(inf_sets)
+
+    def cmp_exact(self, root, estimator):
+        estimate = estimator.estimate()
+        self.assertTrue(estimate['exact'])
+        self.assertEqual(self.tree_stats(root), (estimate['nodes'], estimate['terminal'], estimate['inf_sets']))
+        return estimate
+
+    def test_complete_game(self):
+        root = PPAFlashCrashRootChanceGameState(self.actions_mgr, self.network, DEFENDER_BUDGET, ATTACKER_BUDGETS)
+        estimate = self.cmp_exact(root, TreeSizeEstimator(self.actions_mgr, self.network, DEFENDER_BUDGET,
+                                                          ATTACKER_BUDGETS))
+        self.assertEqual(estimate['defender'], estimate['market'])
+
+    def test_split_main_game(self):
+        root = PortfolioFlashCrashRootChanceGameState(self.actions_mgr, self.network, DEFENDER_BUDGET)
+        self.cmp_exact(root, TreeSizeEstimator(self.actions_mgr, self.network, DEFENDER_BUDGET))
+
+    def test_sampled(self):
+        estimate = TreeSizeEstimator(self.actions_mgr, self.network, DEFENDER_BUDGET, ATTACKER_BUDGETS,
+                                     max_states=0, probes=500, rng=random.Random(0)).estimate()
+        self.assertFalse(estimate['exact'])
+        self.assertIsNone(estimate['inf_sets'])
+        self.assertAlmostEqual(1., estimate['nodes'] / 1349, delta=0.2)
+
+    def test_inf_set_limit(self):
+        estimate = TreeSizeEstimator(self.actions_mgr, self.network, DEFENDER_BUDGET, ATTACKER_BUDGETS,
+                                     max_inf_set_nodes=1000).estimate()
+        self.assertTrue(estimate['exact'])
+        self.assertEqual(1349, estimate['nodes'])
+        self.assertIsNone(estimate['inf_sets'])
+
+
+if __name__ == '__main__':
+    unittest.main()
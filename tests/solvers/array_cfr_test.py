@@ -0,0 +1,49 @@
+import unittest
+
+import numpy
+
+from cfr import VanillaCFR, ArrayVanillaCFR
+from cfr_tables import InfoSetTables
+from games.kunh.constants import CARDS_DEALINGS
+from games.kunh.kuhn import KuhnRootChanceGameState
+
+
+class TestArrayVanillaCFR(unittest.TestCase):
+
+    def test_tables_layout(self):
+        root = KuhnRootChanceGameState(CARDS_DEALINGS)
+        tables = InfoSetTables(root)
+        self.assertEqual(tables.num_inf_sets, len(tables.inf_sets))
+        self.assertEqual(tables.size, sum(len(a) for a in tables.actions))
+        start, stop = tables.slots('.')
+        self.assertEqual(stop - start, len(CARDS_DEALINGS))
+        self.assertTrue(numpy.allclose(tables.average_strategy()[start:stop], 1. / len(CARDS_DEALINGS)))
+        for i, actions in enumerate(tables.actions):
+            for k, action in enumerate(actions):
+                self.assertEqual(tables.offsets[i] + k, tables.action_slot(tables.inf_sets[i], action))
+
+    def test_same_as_vanilla(self):
+        iterations = 50
+        vanilla_cfr = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        vanilla_cfr.run(iterations=iterations)
+        vanilla_cfr.compute_nash_equilibrium()
+        array_cfr = ArrayVanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        array_cfr.run(iterations=iterations)
+        array_cfr.compute_nash_equilibrium()
+
+        self.assertAlmostEqual(vanilla_cfr.value_of_the_game(), array_cfr.value_of_the_game())
+        self.assertAlmostEqual(vanilla_cfr.average_total_imm_regret(iterations),
+                               array_cfr.average_total_imm_regret(iterations))
+        self.assertAlmostEqual(vanilla_cfr.total_positive_regret(), array_cfr.total_positive_regret())
+        tables = array_cfr.export_tables()
+        for table_name in ['sigma', 'cumulative_regrets', 'cumulative_sigma', 'nash_equilibrium']:
+            expected = getattr(vanilla_cfr, table_name)
+            actual = tables[table_name]
+            self.assertCountEqual(expected.keys(), actual.keys())
+            for inf_set in expected:
+                for action, value in expected[inf_set].items():
+                    self.assertAlmostEqual(value, actual[inf_set][action])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+import numpy
+
+from best_response import best_response_value, nash_conv
+from cfr import VanillaCFR, ArrayVanillaCFR
+from compiled_tree import CompiledTree
+from constants import ATTACKER, DEFENDER
+from games.kunh.constants import CARDS_DEALINGS
+from games.kunh.kuhn import KuhnRootChanceGameState
+from vectorized_cfr import VectorizedCFR
+
+
+class TestBestResponse(unittest.TestCase):
+
+    def test_uniform_strategy_exploitable(self):
+        tree = CompiledTree.compile(KuhnRootChanceGameState(CARDS_DEALINGS))
+        uniform = tree.tables.average_strategy()
+        self.assertGreater(nash_conv(tree, uniform), 0.1)
+        value = tree.values(tree.edge_weights(uniform))[0]
+        self.assertGreaterEqual(best_response_value(tree, uniform, DEFENDER), DEFENDER * value - 1e-12)
+        self.assertGreaterEqual(best_response_value(tree, uniform, ATTACKER), ATTACKER * value - 1e-12)
+
+    def test_cfr_exploitability_decreases(self):
+        cfr = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS), track_imm_regret=False)
+        cfr.run(iterations=10)
+        early = cfr.exploitability()
+        cfr.run(iterations=300)
+        late = cfr.exploitability()
+        self.assertLess(late, early)
+        self.assertLess(late, 0.05)
+        self.assertGreaterEqual(late, -1e-12)
+        self.assertRaises(ValueError, cfr.average_total_imm_regret, 310)
+
+    def test_solvers_agree(self):
+        iterations = 30
+        vanilla_cfr = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        vanilla_cfr.run(iterations=iterations)
+        array_cfr = ArrayVanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS), track_imm_regret=False)
+        array_cfr.run(iterations=iterations)
+        vectorized_cfr = VectorizedCFR(KuhnRootChanceGameState(CARDS_DEALINGS), track_imm_regret=False)
+        vectorized_cfr.run(iterations=iterations)
+        expected = vanilla_cfr.exploitability()
+        self.assertAlmostEqual(expected, array_cfr.exploitability())
+        self.assertAlmostEqual(expected, vectorized_cfr.exploitability())
+        self.assertTrue(numpy.all(vectorized_cfr.tables.cumulative_immediate_pos_regret == 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from cfr import VanillaCFR
+from games.kunh.constants import CARDS_DEALINGS
+from games.kunh.kuhn import KuhnRootChanceGameState
+from mccfr import ExternalSamplingMCCFR
+from split_game_cfr import SplitGameCFR
+from vectorized_cfr import VectorizedCFR
+
+
+class TestBudgetedRun(unittest.TestCase):
+
+    def test_nodes_limit(self):
+        cfr = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        cfr.run(iterations=1)
+        nodes_per_iteration = cfr.nodes_touched
+        cfr = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        iterations = cfr.run_with_budget(nodes_limit=10 * nodes_per_iteration + 1)
+        self.assertEqual(11, iterations)
+        self.assertEqual(11, cfr.iterations)
+        self.assertEqual(11 * nodes_per_iteration, cfr.nodes_touched)
+
+    def test_time_limit(self):
+        cfr = VectorizedCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        iterations = cfr.run_with_time_limit(0.05)
+        self.assertGreater(iterations, 0)
+        self.assertGreaterEqual(cfr.elapsed, 0.05)
+        self.assertEqual(iterations * cfr.tree.num_nodes, cfr.nodes_touched)
+
+    def test_convergence_trace(self):
+        cfr = ExternalSamplingMCCFR(KuhnRootChanceGameState(CARDS_DEALINGS), seed=1)
+        iterations = cfr.run_with_budget(nodes_limit=20000, trace_interval=50)
+        trace = cfr.convergence_trace
+        self.assertEqual(iterations, trace[-1]['iteration'])
+        self.assertEqual(cfr.nodes_touched, trace[-1]['nodes_touched'])
+        self.assertEqual(-(-iterations // 50), len(trace))
+        for prev, point in zip(trace, trace[1:]):
+            self.assertLess(prev['iteration'], point['iteration'])
+            self.assertLessEqual(prev['time'], point['time'])
+        self.assertLess(trace[-1]['exploitability'], trace[0]['exploitability'])
+
+    def test_no_budget(self):
+        cfr = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        self.assertRaises(ValueError, cfr.run_with_budget)
+
+    def test_split_game(self):
+        root = KuhnRootChanceGameState(CARDS_DEALINGS)
+        main_game_results, selector_game_result = SplitGameCFR().run_with_budget(
+            main_game_root=root, attacker_types=[1], attacks_in_budget_dict={1: list(root.children)},
+            subgame_keys=list(root.children), nodes_limit=1000, trace_interval=5)
+        self.assertGreaterEqual(main_game_results['nodes_touched'], 1000)
+        self.assertEqual(main_game_results['iterations'], main_game_results['trace'][-1]['iteration'])
+        self.assertIn('time', selector_game_result)
+
+
+if __name__ == '__main__':
+    unittest.main()
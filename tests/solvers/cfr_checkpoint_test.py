@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from cfr import VanillaCFR, ArrayVanillaCFR, DiscountedCFR
+from games.kunh.constants import CARDS_DEALINGS
+from games.kunh.kuhn import KuhnRootChanceGameState
+from mccfr import OutcomeSamplingMCCFR
+from split_selector_game import SelectorRootChanceGameState
+from vectorized_cfr import VectorizedCFR
+
+
+class TestCFRCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'cfr.npz')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def cmp_resumed(self, cfr_cls, tables_getter, **kwargs):
+        uninterrupted = cfr_cls(KuhnRootChanceGameState(CARDS_DEALINGS), **kwargs)
+        uninterrupted.run(iterations=30)
+        cfr = cfr_cls(KuhnRootChanceGameState(CARDS_DEALINGS), **kwargs)
+        cfr.enable_checkpoints(self.path, every_iterations=10)
+        cfr.run(iterations=25)
+        resumed = cfr_cls.resume(self.path, KuhnRootChanceGameState(CARDS_DEALINGS), **kwargs)
+        self.assertEqual(20, resumed.iteration)
+        resumed.run(iterations=10)
+        self.assertEqual(30, resumed.iteration)
+        self.assertEqual(uninterrupted.nodes_touched, resumed.nodes_touched)
+        for expected, actual in zip(tables_getter(uninterrupted), tables_getter(resumed)):
+            self.assertTrue(numpy.allclose(expected, actual))
+
+    def test_vanilla(self):
+        def tables(cfr):
+            layout = cfr._table_layout()
+            return [layout.from_dict(cfr.cumulative_regrets), layout.from_dict(cfr.cumulative_sigma),
+                    layout.from_dict(cfr.sigma)]
+        self.cmp_resumed(VanillaCFR, tables)
+        self.cmp_resumed(DiscountedCFR, tables)
+        self.cmp_resumed(OutcomeSamplingMCCFR, tables, seed=3)
+
+    def test_arrays(self):
+        def tables(cfr):
+            return [cfr.tables.cumulative_regrets, cfr.tables.cumulative_sigma, cfr.tables.sigma,
+                    cfr.tables.cumulative_immediate_pos_regret]
+        self.cmp_resumed(ArrayVanillaCFR, tables)
+        self.cmp_resumed(VectorizedCFR, tables)
+
+    def test_time_interval(self):
+        cfr = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        cfr.enable_checkpoints(self.path, every_seconds=0)
+        cfr.run(iterations=1)
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_validation(self):
+        cfr = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        cfr.run(iterations=2)
+        cfr.save_checkpoint(self.path)
+        other_game = SelectorRootChanceGameState([10, 20], {'p1': 0, 'p2': -1}, {10: ['p1', 'p2'], 20: ['p1']})
+        self.assertRaises(ValueError, VanillaCFR.resume, self.path, other_game)
+        self.assertRaises(ValueError, DiscountedCFR.resume, self.path, KuhnRootChanceGameState(CARDS_DEALINGS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from cfr import CFRPlus, DiscountedCFR
+from games.kunh.constants import CARDS_DEALINGS
+from games.kunh.kuhn import KuhnRootChanceGameState
+from split_game_cfr import SplitGameCFR
+
+
+class TestCFRVariants(unittest.TestCase):
+
+    def run_kuhn(self, cfr_cls, iterations):
+        cfr = cfr_cls(KuhnRootChanceGameState(CARDS_DEALINGS))
+        cfr.run(iterations=iterations)
+        cfr.compute_nash_equilibrium()
+        return cfr
+
+    def test_cfr_plus_kuhn(self):
+        cfr = self.run_kuhn(CFRPlus, 300)
+        self.assertEqual(300, cfr.iteration)
+        self.assertAlmostEqual(-1./18, cfr.value_of_the_game(), places=3)
+        for actions_regret_dict in cfr.cumulative_regrets.values():
+            for regret in actions_regret_dict.values():
+                self.assertGreaterEqual(regret, 0)
+
+    def test_discounted_cfr_kuhn(self):
+        cfr = self.run_kuhn(DiscountedCFR, 300)
+        self.assertAlmostEqual(-1./18, cfr.value_of_the_game(), delta=1e-3)
+
+    def test_split_game_solver(self):
+        split_game_cfr = SplitGameCFR(CFRPlus)
+        result = split_game_cfr.compute_game_mixed_equilibrium(attacker_types=[10, 20],
+                                                              subgame_utilities={'p1': 0, 'p2': -1},
+                                                              iterations=50,
+                                                              attacks_in_budget_dict={10: ['p1'], 20: ['p1', 'p2']})
+        self.assertAlmostEqual(-0.5, result['defender'], places=3)
+        self.assertAlmostEqual(1., result['sigma'][20]['p2'])
+        self.assertAlmostEqual(0.5, result['portfolios_dist']['p2'], places=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
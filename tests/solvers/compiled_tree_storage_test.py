@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from compiled_tree import CompiledTree, NODE_ARRAYS
+from games.kunh.constants import CARDS_DEALINGS
+from games.kunh.kuhn import KuhnRootChanceGameState
+from split_selector_game import SelectorRootChanceGameState
+from vectorized_cfr import VectorizedCFR
+
+
+class TestCompiledTreeStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'tree')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def cmp_trees(self, expected, actual):
+        self.assertEqual(expected.num_nodes, actual.num_nodes)
+        for name in NODE_ARRAYS:
+            self.assertTrue(numpy.array_equal(getattr(expected, name), getattr(actual, name)), name)
+        self.assertListEqual(expected.tables.inf_sets, actual.tables.inf_sets)
+        self.assertListEqual(expected.tables.actions, actual.tables.actions)
+        self.assertTrue(numpy.array_equal(expected.tables.offsets, actual.tables.offsets))
+        self.assertTrue(numpy.array_equal(expected.tables.is_chance, actual.tables.is_chance))
+        self.assertTrue(numpy.array_equal(expected.tables.chance_probs, actual.tables.chance_probs))
+
+    def test_save_load(self):
+        tree = CompiledTree.compile(KuhnRootChanceGameState(CARDS_DEALINGS))
+        tree.save(self.path)
+        loaded = CompiledTree.load(self.path)
+        self.assertIsInstance(loaded.parent, numpy.memmap)
+        self.assertIsNone(loaded.nodes)
+        self.cmp_trees(tree, loaded)
+        self.cmp_trees(tree, CompiledTree.load(self.path, mmap=False))
+
+    def test_int_keys(self):
+        root = SelectorRootChanceGameState([10, 20], {'p1': 0, 'p2': -1}, {10: ['p1', 'p2'], 20: ['p1']})
+        tree = CompiledTree.compile(root)
+        tree.tables.inf_sets = list(range(tree.tables.num_inf_sets))
+        tree.save(self.path)
+        self.cmp_trees(tree, CompiledTree.load(self.path))
+
+    def test_solve_mapped_tree(self):
+        root = KuhnRootChanceGameState(CARDS_DEALINGS)
+        cfr = VectorizedCFR(root)
+        cfr.run(iterations=50)
+        CompiledTree.compile(root, keep_nodes=False).save(self.path)
+        mapped_cfr = VectorizedCFR(tree=CompiledTree.load(self.path))
+        mapped_cfr.run(iterations=50)
+        self.assertTrue(numpy.allclose(cfr.tables.cumulative_regrets, mapped_cfr.tables.cumulative_regrets))
+        self.assertTrue(numpy.allclose(cfr.tables.cumulative_sigma, mapped_cfr.tables.cumulative_sigma))
+        self.assertAlmostEqual(cfr.exploitability(), mapped_cfr.exploitability())
+        mapped_cfr.compute_nash_equilibrium()
+        self.assertAlmostEqual(-1. / 18, mapped_cfr.value_of_the_game(), delta=0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
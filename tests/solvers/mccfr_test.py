@@ -0,0 +1,43 @@
+import unittest
+
+from games.kunh.constants import CARDS_DEALINGS
+from games.kunh.kuhn import KuhnRootChanceGameState
+from mccfr import ExternalSamplingMCCFR, OutcomeSamplingMCCFR
+from split_selector_game import SelectorRootChanceGameState
+
+
+class TestMCCFR(unittest.TestCase):
+
+    def run_kuhn(self, cfr_cls, iterations, seed):
+        cfr = cfr_cls(KuhnRootChanceGameState(CARDS_DEALINGS), seed=seed)
+        cfr.run(iterations=iterations)
+        cfr.compute_nash_equilibrium()
+        return cfr
+
+    def test_external_sampling_kuhn(self):
+        cfr = self.run_kuhn(ExternalSamplingMCCFR, 5000, 1)
+        self.assertAlmostEqual(-1./18, cfr.value_of_the_game(), delta=0.01)
+
+    def test_outcome_sampling_kuhn(self):
+        cfr = self.run_kuhn(OutcomeSamplingMCCFR, 20000, 1)
+        self.assertAlmostEqual(-1./18, cfr.value_of_the_game(), delta=0.02)
+
+    def test_seed(self):
+        for cfr_cls in [ExternalSamplingMCCFR, OutcomeSamplingMCCFR]:
+            cfr1 = self.run_kuhn(cfr_cls, 100, 7)
+            cfr2 = self.run_kuhn(cfr_cls, 100, 7)
+            self.assertDictEqual(cfr1.cumulative_regrets, cfr2.cumulative_regrets)
+            self.assertDictEqual(cfr1.nash_equilibrium, cfr2.nash_equilibrium)
+            self.assertEqual(cfr1.nodes_touched, cfr2.nodes_touched)
+
+    def test_selector_game(self):
+        root = SelectorRootChanceGameState([10, 20], {'p1': 0, 'p2': -1}, {10: ['p1'], 20: ['p1', 'p2']})
+        cfr = ExternalSamplingMCCFR(root, seed=3)
+        cfr.run(iterations=200)
+        cfr.compute_nash_equilibrium()
+        self.assertAlmostEqual(1., cfr.nash_equilibrium['.20']['p2'], places=2)
+        self.assertAlmostEqual(-0.5, cfr.value_of_the_game(), places=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import patch
+
+from cfr import ArrayVanillaCFR
+from games.kunh.constants import CARDS_DEALINGS
+from games.kunh.kuhn import KuhnRootChanceGameState
+from parallel_cfr import ParallelCFR
+from split_selector_game import SelectorRootChanceGameState
+
+
+class TestParallelCFR(unittest.TestCase):
+
+    def cmp_solvers(self, root_generator, iterations, processes):
+        array_cfr = ArrayVanillaCFR(root_generator())
+        array_cfr.run(iterations=iterations)
+        array_cfr.compute_nash_equilibrium()
+        root = root_generator()
+        parallel_cfr = ParallelCFR(root, processes=processes)
+        parallel_cfr.run(iterations=iterations)
+        parallel_cfr.compute_nash_equilibrium()
+
+        self.assertAlmostEqual(array_cfr.value_of_the_game(), parallel_cfr.value_of_the_game())
+        for k, child in root.children.items():
+            self.assertAlmostEqual(array_cfr.root.children[k].get_value(), child.get_value())
+        self.assertAlmostEqual(array_cfr.average_total_imm_regret(iterations),
+                               parallel_cfr.average_total_imm_regret(iterations))
+        for i in range(array_cfr.tables.size):
+            self.assertAlmostEqual(array_cfr.tables.cumulative_regrets[i], parallel_cfr.tables.cumulative_regrets[i])
+            self.assertAlmostEqual(array_cfr.tables.cumulative_sigma[i], parallel_cfr.tables.cumulative_sigma[i])
+
+    def test_kuhn(self):
+        self.cmp_solvers(lambda: KuhnRootChanceGameState(CARDS_DEALINGS), 50, 4)
+
+    def test_selector_game(self):
+        self.cmp_solvers(lambda: SelectorRootChanceGameState([10, 20], {'p1': 0, 'p2': -1, 'p3': -2},
+                                                             {10: ['p1', 'p2'], 20: ['p1', 'p2', 'p3']}), 20, 2)
+
+    def test_run_with_budget(self):
+        parallel_cfr = ParallelCFR(KuhnRootChanceGameState(CARDS_DEALINGS), processes=2)
+        with patch.object(ParallelCFR, '_parallel_iteration', autospec=True,
+                          side_effect=ParallelCFR._parallel_iteration) as parallel_iteration:
+            iterations = parallel_cfr.run_with_budget(nodes_limit=2000, trace_interval=5)
+        self.assertGreater(iterations, 1)
+        self.assertEqual(iterations, parallel_iteration.call_count)
+        self.assertIsNone(parallel_cfr._pool)
+        self.assertTrue(parallel_cfr.convergence_trace)
+        array_cfr = ArrayVanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        array_cfr.run(iterations=iterations)
+        self.assertEqual(array_cfr.nodes_touched, parallel_cfr.nodes_touched)
+        for i in range(array_cfr.tables.size):
+            self.assertAlmostEqual(array_cfr.tables.cumulative_regrets[i], parallel_cfr.tables.cumulative_regrets[i])
+
+    def test_chunks(self):
+        parallel_cfr = ParallelCFR(KuhnRootChanceGameState(CARDS_DEALINGS), processes=4)
+        self.assertEqual(4, len(parallel_cfr.chunks))
+        self.assertCountEqual(CARDS_DEALINGS, [a for chunk in parallel_cfr.chunks for a in chunk])
+
+
+if __name__ == '__main__':
+    unittest.main()
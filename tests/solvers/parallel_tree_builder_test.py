@@ -0,0 +1,81 @@
+import functools
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from ActionsManager import ActionsManager
+from compiled_tree import CompiledTree
+from exp.network_generators import get_network_from_dir
+from flash_crash_players_cfr import FlashCrashRootChanceGameState
+from flash_crash_players_portfolio_cfr import PortfolioFlashCrashRootChanceGameState
+from flash_crash_players_portfolio_per_attacker_cfr import PPAFlashCrashRootChanceGameState
+from parallel_tree_builder import build_compiled_tree
+from vectorized_cfr import VectorizedCFR
+
+DEFENDER_BUDGET = 1000000000
+ATTACKER_BUDGETS = [4000000000, 6000000000]
+
+
+class TestParallelTreeBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.network = get_network_from_dir('../../resources/three_assets_net')
+        self.network.limit_trade_step = True
+        self.actions_mgr = ActionsManager(assets=self.network.assets, step_order_size=0.015, max_order_num=1,
+                                          attacker_budgets=ATTACKER_BUDGETS)
+
+    def cmp_trees(self, root_factory, processes=2):
+        expected = CompiledTree.compile(root_factory())
+        actual = build_compiled_tree(root_factory, processes=processes)
+        for name in ['parent', 'player', 'terminal', 'chance_prob', 'utility', 'level_offsets']:
+            numpy.testing.assert_array_equal(getattr(expected, name), getattr(actual, name))
+        self.assertListEqual([expected.tables.inf_sets[i] for i in expected.inf_set],
+                             [actual.tables.inf_sets[i] for i in actual.inf_set])
+        self.assertEqual(expected.tables.num_inf_sets, actual.tables.num_inf_sets)
+        for n in range(1, expected.num_nodes):
+            self.assertEqual(expected.tables.owner[expected.slot[n]], expected.inf_set[expected.parent[n]])
+            self.assertEqual(actual.tables.owner[actual.slot[n]], actual.inf_set[actual.parent[n]])
+            self.assertEqual(expected.slot[n] - expected.tables.offsets[expected.inf_set[expected.parent[n]]],
+                             actual.slot[n] - actual.tables.offsets[actual.inf_set[actual.parent[n]]])
+
+        expected_cfr = VectorizedCFR(tree=expected)
+        expected_cfr.run(iterations=20)
+        actual_cfr = VectorizedCFR(tree=actual)
+        actual_cfr.run(iterations=20)
+        for inf_set, actions in zip(expected.tables.inf_sets, expected.tables.actions):
+            start, _ = actual.tables.slots(inf_set)
+            self.assertListEqual(actions, actual.tables.actions[actual.tables.index[inf_set]])
+            numpy.testing.assert_allclose(expected_cfr.tables.cumulative_regrets[slice(*expected.tables.slots(inf_set))],
+                                          actual_cfr.tables.cumulative_regrets[start:start + len(actions)])
+        return actual
+
+    def test_flash_crash(self):
+        self.cmp_trees(functools.partial(FlashCrashRootChanceGameState, self.actions_mgr, self.network,
+                                         DEFENDER_BUDGET, ATTACKER_BUDGETS))
+
+    def test_portfolio_per_attacker(self):
+        self.cmp_trees(functools.partial(PPAFlashCrashRootChanceGameState, self.actions_mgr, self.network,
+                                         DEFENDER_BUDGET, ATTACKER_BUDGETS))
+
+    def test_portfolio(self):
+        self.cmp_trees(functools.partial(PortfolioFlashCrashRootChanceGameState, self.actions_mgr, self.network,
+                                         DEFENDER_BUDGET), processes=3)
+
+    def test_single_process_and_save(self):
+        root_factory = functools.partial(FlashCrashRootChanceGameState, self.actions_mgr, self.network,
+                                         DEFENDER_BUDGET, ATTACKER_BUDGETS)
+        with tempfile.TemporaryDirectory() as path:
+            tree = build_compiled_tree(root_factory, processes=1, path=path)
+            self.assertTrue(os.path.exists(os.path.join(path, 'layout.json')))
+            numpy.testing.assert_array_equal(tree.parent, CompiledTree.load(path).parent)
+
+    def test_interned_infosets(self):
+        with self.assertRaises(ValueError):
+            build_compiled_tree(functools.partial(PPAFlashCrashRootChanceGameState, self.actions_mgr, self.network,
+                                                  DEFENDER_BUDGET, ATTACKER_BUDGETS, interned_infosets=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
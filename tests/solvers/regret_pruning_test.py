@@ -0,0 +1,46 @@
+import unittest
+
+from cfr import VanillaCFR, ArrayVanillaCFR
+from games.kunh.constants import CARDS_DEALINGS
+from games.kunh.kuhn import KuhnRootChanceGameState
+
+
+class TestRegretPruning(unittest.TestCase):
+
+    def test_pruning_rates(self):
+        iterations = 100
+        cfr = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS), prune_interval=10)
+        cfr.run(iterations=iterations)
+        self.assertEqual(iterations, len(cfr.pruning_rates))
+        self.assertEqual(0, cfr.pruning_rates[0])
+        self.assertGreater(max(cfr.pruning_rates), 0)
+        for i in range(9, iterations, 10):
+            self.assertEqual(0, cfr.pruning_rates[i])
+
+    def test_no_pruning(self):
+        cfr = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        cfr.run(iterations=10)
+        self.assertListEqual([], cfr.pruning_rates)
+
+    def test_kuhn_value(self):
+        cfr = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS), track_imm_regret=False, prune_interval=5)
+        cfr.run(iterations=1000)
+        cfr.compute_nash_equilibrium()
+        self.assertAlmostEqual(-1./18, cfr.value_of_the_game(), places=2)
+        self.assertLess(cfr.exploitability(), 0.05)
+
+    def test_array_same_as_vanilla(self):
+        iterations = 50
+        vanilla_cfr = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS), prune_interval=4)
+        vanilla_cfr.run(iterations=iterations)
+        array_cfr = ArrayVanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS), prune_interval=4)
+        array_cfr.run(iterations=iterations)
+        self.assertListEqual(vanilla_cfr.pruning_rates, array_cfr.pruning_rates)
+        tables = array_cfr.export_tables()
+        for inf_set, regrets in vanilla_cfr.cumulative_regrets.items():
+            for action, regret in regrets.items():
+                self.assertAlmostEqual(regret, tables['cumulative_regrets'][inf_set][action])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+import numpy
+
+from cfr import VanillaCFR
+from compiled_tree import CompiledTree
+from games.kunh.constants import CARDS_DEALINGS
+from games.kunh.kuhn import KuhnRootChanceGameState
+from split_selector_game import SelectorRootChanceGameState
+from vectorized_cfr import VectorizedCFR
+
+
+class TestVectorizedCFR(unittest.TestCase):
+
+    def test_compile(self):
+        root = SelectorRootChanceGameState([10, 20], {'p1': 0, 'p2': -1}, {10: ['p1', 'p2'], 20: ['p1']})
+        tree = CompiledTree.compile(root)
+        self.assertEqual(root.tree_size, tree.num_nodes)
+        self.assertEqual(3, tree.num_levels)
+        self.assertTrue(numpy.all(tree.parent[1:] < numpy.arange(1, tree.num_nodes)))
+        self.assertListEqual([0, -1, 0], [tree.utility[n] for n in range(3, 6)])
+        self.assertTrue(numpy.allclose(tree.chance_prob[1:3], 0.5))
+        for n, node in enumerate(tree.nodes):
+            self.assertEqual(node.inf_set(), tree.tables.inf_sets[tree.inf_set[n]])
+            if n:
+                parent = tree.nodes[tree.parent[n]]
+                k = tree.slot[n] - tree.tables.offsets[tree.inf_set[tree.parent[n]]]
+                self.assertIs(node, parent.play(parent.actions[k]))
+
+    def cmp_solvers(self, root_generator, iterations):
+        vanilla_cfr = VanillaCFR(root_generator())
+        vanilla_cfr.run(iterations=iterations)
+        vanilla_cfr.compute_nash_equilibrium()
+        root = root_generator()
+        vectorized_cfr = VectorizedCFR(root)
+        vectorized_cfr.run(iterations=iterations)
+        vectorized_cfr.compute_nash_equilibrium()
+
+        self.assertAlmostEqual(vanilla_cfr.value_of_the_game(), vectorized_cfr.value_of_the_game())
+        for k, child in root.children.items():
+            self.assertAlmostEqual(vanilla_cfr.root.children[k].get_value(), child.get_value())
+        self.assertAlmostEqual(vanilla_cfr.average_total_imm_regret(iterations),
+                               vectorized_cfr.average_total_imm_regret(iterations))
+        tables = vectorized_cfr.export_tables()
+        for inf_set, regrets in vanilla_cfr.cumulative_regrets.items():
+            for action, regret in regrets.items():
+                self.assertAlmostEqual(regret, tables['cumulative_regrets'][inf_set][action])
+                self.assertAlmostEqual(vanilla_cfr.cumulative_sigma[inf_set][action],
+                                       tables['cumulative_sigma'][inf_set][action])
+
+    def test_kuhn(self):
+        self.cmp_solvers(lambda: KuhnRootChanceGameState(CARDS_DEALINGS), 100)
+
+    def test_selector_game(self):
+        self.cmp_solvers(lambda: SelectorRootChanceGameState([10, 20], {'p1': 0, 'p2': -1, 'p3': -2},
+                                                             {10: ['p1', 'p2'], 20: ['p1', 'p2', 'p3']}), 20)
+
+    def test_kuhn_value(self):
+        vectorized_cfr = VectorizedCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        vectorized_cfr.run(iterations=2000)
+        vectorized_cfr.compute_nash_equilibrium()
+        self.assertAlmostEqual(-1./18, vectorized_cfr.value_of_the_game(), places=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
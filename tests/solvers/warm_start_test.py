@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import patch
+
+import numpy
+
+from cfr import VanillaCFR, ArrayVanillaCFR
+from exp.network_generators import get_network_from_dir
+from games.kunh.constants import CARDS_DEALINGS
+from games.kunh.kuhn import KuhnRootChanceGameState
+from split_game_cfr import SplitGameCFR
+from split_selector_game import SelectorRootChanceGameState
+
+
+class TestWarmStart(unittest.TestCase):
+
+    def test_continues_solve(self):
+        uninterrupted = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        uninterrupted.run(iterations=30)
+        previous = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        previous.run(iterations=20)
+        cfr = ArrayVanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        cfr.warm_start(previous)
+        cfr.run(iterations=10)
+        tables = cfr.tables
+        self.assertTrue(numpy.allclose(tables.from_dict(uninterrupted.cumulative_regrets), tables.cumulative_regrets))
+        self.assertTrue(numpy.allclose(tables.from_dict(uninterrupted.cumulative_sigma), tables.cumulative_sigma))
+
+    def test_decay(self):
+        previous = ArrayVanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        previous.run(iterations=20)
+        cfr = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        cfr.warm_start(previous, decay=0.5)
+        regrets, sigma_sums = cfr.cumulative_tables()
+        tables = previous.tables
+        self.assertTrue(numpy.allclose(0.5 * tables.cumulative_regrets, tables.from_dict(regrets)))
+        self.assertTrue(numpy.allclose(0.5 * tables.cumulative_sigma, tables.from_dict(sigma_sums)))
+        self.assertTrue(numpy.allclose(tables.sigma, tables.from_dict(cfr.sigma)))
+
+    def test_changed_game(self):
+        previous = VanillaCFR(SelectorRootChanceGameState([10, 20], {'p1': 0, 'p2': -1},
+                                                          {10: ['p1', 'p2'], 20: ['p1', 'p2']}))
+        previous.run(iterations=10)
+        cfr = VanillaCFR(SelectorRootChanceGameState([10, 20], {'p1': 0, 'p2': -1, 'p3': -2},
+                                                     {10: ['p1', 'p2'], 20: ['p1', 'p2', 'p3']}))
+        cfr.warm_start(previous)
+        self.assertDictEqual(previous.cumulative_regrets['.10'], cfr.cumulative_regrets['.10'])
+        self.assertEqual(previous.cumulative_regrets['.20']['p2'], cfr.cumulative_regrets['.20']['p2'])
+        self.assertEqual(0, cfr.cumulative_regrets['.20']['p3'])
+
+    def test_faster_convergence(self):
+        previous = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS))
+        previous.run(iterations=200)
+        warm = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS), track_imm_regret=False)
+        warm.warm_start(previous, decay=0.5)
+        warm.run(iterations=20)
+        cold = VanillaCFR(KuhnRootChanceGameState(CARDS_DEALINGS), track_imm_regret=False)
+        cold.run(iterations=20)
+        self.assertLess(warm.exploitability(), cold.exploitability())
+
+    def test_split_game_iterate(self):
+        network = get_network_from_dir('../../resources/three_assets_net')
+        split_cfr = SplitGameCFR()
+        compute_main_game_utilities = split_cfr.compute_main_game_utilities
+        rounds = []
+
+        def main_game_round(*args, **kwargs):
+            rounds.append(compute_main_game_utilities(*args, **kwargs))
+            return rounds[-1]
+
+        with patch.object(split_cfr, 'compute_main_game_utilities', side_effect=main_game_round) as main_game:
+            main_game_results, selector_game_result = split_cfr.iterate(
+                network, 1000000000, [4000000000, 6000000000], game1_iterations=3, game2_iterations=5,
+                max_iterations=22, regret_epsilon=-1, warm_start_decay=0.5, warm_game1_iterations=2)
+        calls = main_game.call_args_list
+        # 3 + 5, then two warm rounds of 2 + 5
+        self.assertListEqual([3, 2, 2], [c[0][2] for c in calls])
+        self.assertIsNone(calls[0][1]['warm_start'])
+        for c, previous in zip(calls[1:], rounds):
+            self.assertIs(previous['cfr'], c[1]['warm_start'])
+            self.assertEqual(0.5, c[1]['warm_start_decay'])
+        self.assertEqual(2, main_game_results['iterations'])
+        portfolios_dist = selector_game_result['portfolios_dist']
+        self.assertSetEqual(set(main_game_results['utilities']), set(portfolios_dist))
+        self.assertTrue(all(p >= 0 for p in portfolios_dist.values()))
+        self.assertAlmostEqual(1, sum(portfolios_dist.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()